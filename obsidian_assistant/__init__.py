@@ -15,12 +15,13 @@ _DEEPAGENTS_ROOT = _HERE.parent / "deepagents_official" / "libs" / "deepagents"
 if _DEEPAGENTS_ROOT.exists() and str(_DEEPAGENTS_ROOT) not in sys.path:
     sys.path.insert(0, str(_DEEPAGENTS_ROOT))
 
-from .obsidian_assistant import create_obsidian_assistant_v2  # noqa: F401
+from .obsidian_assistant import create_obsidian_assistant_v2, retrieve_sources  # noqa: F401
 from .model_adapters import get_model_adapter  # noqa: F401
 from .smart_router import SmartRouter, create_smart_router  # noqa: F401
 
 __all__ = [
     "create_obsidian_assistant_v2",
+    "retrieve_sources",
     "get_model_adapter",
     "SmartRouter",
     "create_smart_router",
@@ -5,16 +5,18 @@ Provides HTTP REST API endpoints for the TypeScript plugin to communicate
 with the DeepAgents-powered Python backend.
 
 Endpoints:
-- GET  /health       - Health check
+- GET  /health       - Health check (includes local index build progress)
 - POST /query        - Process user queries
+- POST /search       - Ranked note sections from the local index (no model call)
 - GET  /models       - List available models
 """
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 import os
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -23,11 +25,24 @@ load_dotenv()
 
 # Import Obsidian Assistant
 try:
-    from obsidian_assistant import create_obsidian_assistant_v2
+    from obsidian_assistant import create_obsidian_assistant_v2, retrieve_sources
 except ImportError:
     import sys
     sys.path.insert(0, str(Path(__file__).parent))
-    from obsidian_assistant import create_obsidian_assistant_v2
+    from obsidian_assistant import create_obsidian_assistant_v2, retrieve_sources
+
+# Vault index watcher (keeps the local search index in sync with note edits)
+# (package import first, so the tool and the server share one index registry)
+try:
+    from obsidian_assistant.vault_search import (
+        ShardedSearch, SnapshotError, VaultWatcher, get_vault_index, import_snapshot
+    )
+    from obsidian_assistant.vault_search.index import INDEX_FILENAME, default_index_dir
+    from obsidian_assistant.vault_search.snapshot import SNAPSHOT_SUFFIX
+except ImportError:
+    from vault_search import ShardedSearch, SnapshotError, VaultWatcher, get_vault_index, import_snapshot
+    from vault_search.index import INDEX_FILENAME, default_index_dir
+    from vault_search.snapshot import SNAPSHOT_SUFFIX
 
 app = FastAPI(
     title="Obsidian AI Assistant API",
@@ -50,6 +65,20 @@ OBSIDIAN_PATH = os.getenv(
     "OBSIDIAN_PATH",
     "/Users/yf/Documents/obsidian agent"
 )
+# Several vaults: OBSIDIAN_VAULTS="personal=/path/a:team=/path/b" (one index shard each)
+VAULT_SHARDS = ShardedSearch.for_vaults(OBSIDIAN_PATH).shards
+# Retrieval-only engine for /search (the indexes themselves are shared with the assistant's search tool)
+search_engine = ShardedSearch(VAULT_SHARDS)
+# Set OBSIDIAN_INDEX_WATCH=0 to disable the background index watcher
+INDEX_WATCH_ENABLED = os.getenv("OBSIDIAN_INDEX_WATCH", "1").lower() not in {"0", "false", "no"}
+# Directory of index snapshots (<vault name>.snapshot.tar[.gz]) restored when a vault has no index yet
+INDEX_SNAPSHOT_DIR = os.getenv("OBSIDIAN_INDEX_SNAPSHOT_DIR")
+# Set OBSIDIAN_PREFETCH_CONTEXT=1 to inject local search results before the first model call by default
+PREFETCH_ENABLED = os.getenv("OBSIDIAN_PREFETCH_CONTEXT", "0").lower() not in {"0", "false", "no"}
+# Upper bound of /search max_results (each result is ranked and has its snippet read)
+SEARCH_MAX_RESULTS = 50
+index_watcher: Optional[VaultWatcher] = None
+index_watchers: Dict[str, VaultWatcher] = {}  # shard name -> watcher
 
 
 class QueryRequest(BaseModel):
@@ -58,6 +87,14 @@ class QueryRequest(BaseModel):
     enable_cache: Optional[bool] = True
     enable_smart_routing: Optional[bool] = True
     enable_model_adapter: Optional[bool] = True
+    prefetch: Optional[bool] = None  # true: inject local results before the first model call (default: server setting, off)
+
+
+class SearchRequest(BaseModel):
+    query: str
+    max_results: int = Field(10, ge=1, le=SEARCH_MAX_RESULTS)
+    mode: Optional[str] = None  # lexical / semantic / hybrid (default: $OBSIDIAN_SEARCH_MODE)
+    deadline_ms: Optional[int] = None
 
 
 class Source(BaseModel):
@@ -65,6 +102,11 @@ class Source(BaseModel):
     path: Optional[str] = None
     url: Optional[str] = None
     relevance: float = 0.0
+    heading: Optional[str] = None
+    snippet: Optional[str] = None
+    note_link: Optional[str] = None
+    score: Optional[float] = None
+    vault: Optional[str] = None
 
 
 class TokenUsage(BaseModel):
@@ -82,9 +124,19 @@ class QueryResponse(BaseModel):
     time_sensitive: Optional[bool] = None
     token_usage: Optional[TokenUsage] = None
     cache_hit: Optional[bool] = False
+    prefetched: Optional[bool] = False
     error: Optional[str] = None
 
 
+class SearchResponse(BaseModel):
+    query: str
+    sources: List[Source]
+    mode: str
+    elapsed_ms: float
+    partial: bool = False
+    coverage: float = 1.0
+
+
 def initialize_assistant(
     model: str = "qwen-turbo",
     enable_cache: bool = True,
@@ -99,6 +151,7 @@ def initialize_assistant(
     print(f"   - Cache: {enable_cache}")
     print(f"   - Smart Routing: {enable_smart_routing}")
     print(f"   - Model Adapter: {enable_model_adapter}")
+    print(f"   - Prefetch: {PREFETCH_ENABLED}")
     print(f"   - Obsidian Path: {OBSIDIAN_PATH}")
     
     assistant = create_obsidian_assistant_v2(
@@ -107,6 +160,7 @@ def initialize_assistant(
         enable_cache=enable_cache,
         enable_smart_routing=enable_smart_routing,
         enable_model_adapter=enable_model_adapter,
+        enable_prefetch=PREFETCH_ENABLED,
         verbose=False
     )
     
@@ -117,20 +171,98 @@ def initialize_assistant(
 async def startup_event():
     """Initialize assistant on server startup."""
     print("🚀 Starting Obsidian AI Assistant API Server...")
+    restore_index_snapshots()
     initialize_assistant()
+    start_index_services()
     print(f"📍 Server ready at http://localhost:8000")
     print(f"📖 API docs at http://localhost:8000/docs")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the index watchers and flush pending index changes."""
+    for watcher in index_watchers.values():
+        watcher.stop()
+
+
+def restore_index_snapshots():
+    """Install the snapshot of every vault that has no index yet (see vault_search.snapshot).
+
+    The watcher's warm-up then maps the restored index and re-reads only the
+    notes changed since the snapshot, instead of building from scratch.
+    """
+    if not INDEX_SNAPSHOT_DIR:
+        return
+    for shard in VAULT_SHARDS:
+        index_dir = Path(shard.index_dir) if shard.index_dir else default_index_dir(shard.docs_path)
+        if (index_dir / INDEX_FILENAME).exists():
+            continue
+        for src in (Path(INDEX_SNAPSHOT_DIR) / f"{shard.name}{SNAPSHOT_SUFFIX}{ext}" for ext in ("", ".gz")):
+            if not src.exists():
+                continue
+            try:
+                manifest = import_snapshot(src, shard.docs_path, shard.index_dir)
+                print(f"📦 Index snapshot restored ({shard.name}, {len(manifest.get('notes') or {})} notes)")
+            except (OSError, SnapshotError) as e:
+                print(f"⚠️  Index snapshot not restored ({shard.name}): {e}")
+            break
+
+
+def _warm_index():
+    for shard in VAULT_SHARDS:
+        try:
+            get_vault_index(shard.docs_path, shard.index_dir)
+        except Exception as e:
+            print(f"⚠️  Index warm-up failed ({shard.name}): {e}")
+
+
+def start_index_services():
+    """Warm the local search index in the background so startup is not blocked.
+
+    With the watcher enabled the watcher thread performs the warm-up (and then
+    keeps the index in sync); otherwise a one-shot thread does. Progress is
+    reported on /health while the (possibly parallel) cold build runs.
+    With several vaults every shard gets its own watcher.
+    """
+    global index_watcher
+
+    shards = [shard for shard in VAULT_SHARDS if Path(shard.docs_path).exists()]
+    if not shards:
+        return
+    if INDEX_WATCH_ENABLED:
+        for shard in shards:
+            index_watchers[shard.name] = VaultWatcher(shard.docs_path, shard.index_dir)
+            index_watchers[shard.name].start()
+        index_watcher = index_watchers[shards[0].name]
+        print(f"👀 Vault index watcher started ({len(index_watchers)} vaults)")
+    else:
+        threading.Thread(target=_warm_index, name="vault-index-warmup", daemon=True).start()
+    print("📇 Local search index warming in background")
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {
+    primary = VAULT_SHARDS[0]
+    index = primary.peek()
+    health = {
         "status": "healthy",
         "assistant_initialized": assistant is not None,
-        "obsidian_path": OBSIDIAN_PATH,
-        "obsidian_path_exists": Path(OBSIDIAN_PATH).exists()
+        "obsidian_path": primary.docs_path,
+        "obsidian_path_exists": Path(primary.docs_path).exists(),
+        "index": index.stats() if index else None,
+        "index_watcher": index_watcher.stats() if index_watcher else None
     }
+    if len(VAULT_SHARDS) > 1:
+        health["vaults"] = {
+            shard.name: {
+                "path": shard.docs_path,
+                "index": shard.peek().stats() if shard.peek() else None,
+                "index_watcher": index_watchers[shard.name].stats() if shard.name in index_watchers else None,
+            }
+            for shard in VAULT_SHARDS
+        }
+    return health
 
 
 @app.post("/query", response_model=QueryResponse)
@@ -150,7 +282,7 @@ async def process_query(request: QueryRequest):
         # Invoke the assistant
         result = assistant.invoke({
             "messages": [("user", request.query)]
-        })
+        }, prefetch=request.prefetch)
         
         # Extract answer
         answer = result.get("answer", "")
@@ -215,6 +347,8 @@ async def process_query(request: QueryRequest):
         # Log cache status
         if result.get("cache_hit"):
             print(f"⚡ 缓存命中: 是")
+        if result.get("prefetched"):
+            print(f"📥 预检索: 已注入本地搜索结果")
         
         # Log token usage
         if token_usage:
@@ -235,7 +369,8 @@ async def process_query(request: QueryRequest):
             route_coverage=result.get("route_coverage"),
             time_sensitive=result.get("time_sensitive"),
             token_usage=token_usage,
-            cache_hit=result.get("cache_hit", False)
+            cache_hit=result.get("cache_hit", False),
+            prefetched=result.get("prefetched", False)
         )
         
     except Exception as e:
@@ -250,6 +385,34 @@ async def process_query(request: QueryRequest):
         )
 
 
+@app.post("/search", response_model=SearchResponse)
+def search_notes(request: SearchRequest):
+    """Rank note sections for a query straight from the local index, without a model call.
+
+    ``relevance`` is the score relative to the best hit (1.0), ``score`` the raw
+    ranking score. While an index is still building the response is marked
+    ``partial`` with the searched share of notes in ``coverage``.
+    """
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Empty query")
+    result = retrieve_sources(
+        search_engine,
+        request.query,
+        max_results=request.max_results,
+        mode=request.mode,
+        deadline_ms=request.deadline_ms,
+    )
+    print(f"🔎 检索: {request.query[:100]} → {len(result['sources'])} 个来源（{result['elapsed_ms']:.1f} ms）")
+    return SearchResponse(
+        query=request.query,
+        sources=[Source(**source) for source in result["sources"]],  # extra keys (type, display) are ignored
+        mode=result["mode"],
+        elapsed_ms=result["elapsed_ms"],
+        partial=result["partial"],
+        coverage=result["coverage"],
+    )
+
+
 @app.get("/models")
 async def list_models():
     """List available AI models."""
@@ -1,14 +1,18 @@
 # 辅助函数：生成 Obsidian 内部链接格式
-def format_note_reference(note_path: str, note_title: str) -> str:
+def format_note_reference(note_path: str, note_title: str, section: str = "") -> str:
     """
     生成 Obsidian 内部链接格式
     Args:
         note_path: 笔记相对路径，如 "Obsidian_Knowledge/欢迎.md"
         note_title: 显示标题，如 "欢迎"
+        section: 可选的章节锚点（标题文本或 "^块ID"），如 "快速开始"
     Returns:
         格式化的内部链接，如 "[[Obsidian_Knowledge/欢迎|欢迎]]"
+        或 "[[Obsidian_Knowledge/欢迎#快速开始|欢迎]]"
     """
     clean_path = note_path.replace('.md', '')
+    if section:
+        return f"[[{clean_path}#{section}|{note_title}]]"
     return f"[[{clean_path}|{note_title}]]"
 
 """
@@ -17,7 +21,7 @@ Obsidian 智能助手 v2.0
 集成本地知识库搜索和网页搜索功能，支持引用来源追溯。
 
 功能特性：
-- 📚 本地 Obsidian 文档搜索（递归搜索 .md 文件）
+- 📚 本地 Obsidian 文档搜索（.md 笔记、.canvas 白板、.txt/.csv 附件）
 - 🌐 网页搜索补充最新信息（Tavily API）
 - 🔗 Obsidian 内部链接格式引用 [[路径|名称]]
 - 📊 引用来源可追溯性（重要性分级）
@@ -30,8 +34,10 @@ Obsidian 智能助手 v2.0
 import os
 import sys
 import json
+import uuid
 from pathlib import Path
-from typing import Literal, Optional, Dict, Any
+from typing import Literal, Optional, Dict, Any, List
+from langchain_core.messages import AIMessage, ToolMessage
 from langchain_core.tools import tool
 from langchain_community.chat_models import ChatTongyi
 from tavily import TavilyClient
@@ -53,16 +59,26 @@ except ImportError:
             def enhance_system_prompt(self, base: str, tool_descriptions: str) -> str: return base
             def enhance_user_message(self, msg: str, may_need_tools: bool) -> str: return msg
         return _Dummy()
+# 先按包内相对路径导入，避免同一进程中加载两份 vault_search（索引注册表与内容缓存各一份）
 try:
-    from smart_router import create_smart_router, SmartRouter
+    from .smart_router import create_smart_router, SmartRouter
 except ImportError:
-    SmartRouter = None
-    def create_smart_router(_path: str): return None
+    try:
+        from smart_router import create_smart_router, SmartRouter
+    except ImportError:
+        SmartRouter = None
+        def create_smart_router(_path: str, shards=None): return None
 try:
     from cache_layer import SimpleQueryCache, TextCompressor
 except ImportError:
     SimpleQueryCache = None  # type: ignore
     TextCompressor = None  # type: ignore
+try:
+    from .vault_search import (
+        SEARCH_MODES, CursorCache, ShardedSearch, covered, near_duplicate, pack_hits
+    )
+except ImportError:
+    from vault_search import SEARCH_MODES, CursorCache, ShardedSearch, covered, near_duplicate, pack_hits
 
 # ============================================================================
 # 配置常量
@@ -70,31 +86,89 @@ except ImportError:
 
 DEFAULT_DOCS_PATH = "/Users/yf/Documents/Obsidian Vault/我的知识库/Obsidian_Knowledge/obsidian-help-master"
 DEFAULT_MODEL = "qwen-turbo"
+# 本地搜索工具单次返回的 Token 预算（工具结果会在后续每轮模型调用中重复发送）
+DEFAULT_SEARCH_MAX_TOKENS = int(os.getenv("OBSIDIAN_SEARCH_MAX_TOKENS", "2000"))
+# 默认检索模式：lexical（BM25）/ semantic（离线 LSA 向量）/ hybrid（两者按排名融合）
+DEFAULT_SEARCH_MODE = os.getenv("OBSIDIAN_SEARCH_MODE", "lexical")
+# 单次本地搜索的时间预算（毫秒，0 表示不限）：超时返回已找到的最佳结果并标记 partial
+DEFAULT_SEARCH_DEADLINE_MS = int(os.getenv("OBSIDIAN_SEARCH_DEADLINE_MS", "3000"))
 
 
 # ============================================================================
 # 工具定义 v2.0
 # ============================================================================
 
-def create_search_tool_v2(docs_path: str = DEFAULT_DOCS_PATH):
+def create_search_tool_v2(
+    docs_path: str = DEFAULT_DOCS_PATH,
+    index_dir: Optional[str] = None,
+    vaults: Optional[Dict[str, str]] = None,
+    engine: Optional[ShardedSearch] = None,
+):
     """
     创建 v2.0 版本的本地搜索工具（支持路径返回）
     
+    首次调用时加载（或构建）磁盘上的倒排索引，之后的调用和服务重启都复用该索引，
+    不再逐个读取整个知识库。除 Markdown 笔记外还索引 .canvas 白板（卡片文字与连线）
+    和 .txt/.csv 附件（见 vault_search.extractors）。索引在进程内共享（见 vault_search.get_vault_index），
+    API 服务中的 VaultWatcher 会增量更新同一份索引。
+    
+    多个知识库（vaults 或 $OBSIDIAN_VAULTS）时每个知识库一个索引分片，查询在线程池中
+    并发分发到各分片（每个分片有独立的截止时间），按全局统一的 BM25 统计量合并排序。
+    
     Args:
         docs_path: Obsidian 文档根目录路径
+        index_dir: 索引存放目录（默认 $OBSIDIAN_INDEX_DIR 或 ~/.cache/obsidian_assistant；
+                   多个知识库时每个知识库使用其下以名称命名的子目录）
+        vaults: 知识库名称 -> 路径（可选，设置后忽略 docs_path）
+        engine: 已创建的检索引擎（可选，设置后忽略以上三个参数；助手与工具共用同一引擎）
         
     Returns:
         LangChain Tool 对象
     """
-    
+    if engine is None:
+        engine = ShardedSearch.for_vaults(docs_path, index_dir=index_dir, vaults=vaults)
+    cursor_cache = CursorCache()  # 游标 -> 剩余排序结果（短期有效）
+    multi_vault = len(engine.shards) > 1
+
     @tool
-    def search_obsidian_docs_v2(query: str, max_results: int = 5) -> str:
+    def search_obsidian_docs_v2(
+        query: str,
+        max_results: int = 5,
+        max_tokens: Optional[int] = None,
+        compact: bool = False,
+        expand_links: bool = False,
+        mode: Optional[str] = None,
+        deadline_ms: Optional[int] = None,
+        queries: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+        summaries: bool = False,
+    ) -> str:
         """
-        在本地 Obsidian 知识库中搜索相关文档，返回包含文件路径的结果
+        在本地 Obsidian 知识库中搜索相关章节，返回包含文件路径的结果（按 BM25 相关度排序）
+        
+        每条结果是笔记中的一个标题章节：snippet 为该章节内容（过长时截取命中附近），
+        note_link 直接指向章节（[[笔记#标题]]），tokens 为 snippet 的估算 Token 数。
         
         参数:
-            query: 搜索关键词或问题
+            query: 搜索关键词或问题；支持字段语法，如 `tag:项目 path:Work/ "精确短语" -草稿`
+                   （tag/path/alias/link 过滤，引号为必须出现的短语，减号排除）；
+                   `/正则/` 与通配符 `plug*` 匹配正文，`词~` 模糊匹配拼写相近的词
             max_results: 返回的最大结果数量（默认 5）
+            max_tokens: 结果内容的 Token 预算（默认 2000），按相关度依次装入，放不下时按「相关度/Token」填满剩余预算
+            compact: 紧凑模式，每条结果只保留 note_link 和 snippet
+            expand_links: 同时返回命中笔记的链接邻居（出链/反链）：related 列出相关笔记，
+                          via 标记经由链接补充进来的章节，无需再次搜索
+            mode: 检索模式：lexical 关键词匹配；semantic 按语义相似度（可命中换了说法的问题）；
+                  hybrid 两者融合（默认取 OBSIDIAN_SEARCH_MODE，未设置时为 lexical）
+            deadline_ms: 时间预算（毫秒，默认取 OBSIDIAN_SEARCH_DEADLINE_MS）；超时返回已找到的最佳结果，
+                         标记 partial=true，coverage 为已检索的知识库比例（索引仍在构建时为 0）
+            queries: 额外的相关查询（如 ["tag", "tags"]），与 query 一次检索完成；结果按查询分组返回
+                     （groups），前面查询已返回的章节不再重复，只在 duplicates 中列出链接
+            cursor: 上次结果中的 next_cursor，用于获取下一页（不重新检索；几分钟内有效，
+                    仅单个查询且未展开链接时返回 next_cursor）
+            summaries: 摘要模式：每条结果返回建索引时预先抽取的章节摘要（summary）与笔记摘要
+                       （note_summary），不读取笔记原文；适合先用较大的 max_results 浏览候选笔记，
+                       再对需要的笔记正常搜索
             
         返回:
             JSON 格式的搜索结果，包含状态、消息和文档列表
@@ -103,79 +177,263 @@ def create_search_tool_v2(docs_path: str = DEFAULT_DOCS_PATH):
         print(f"🔍 [search_obsidian_docs_v2] 工具被调用")
         print(f"   查询: '{query}'")
         print(f"   最大结果数: {max_results}")
+        budget = max_tokens or DEFAULT_SEARCH_MAX_TOKENS
+        if mode not in SEARCH_MODES:
+            mode = DEFAULT_SEARCH_MODE if DEFAULT_SEARCH_MODE in SEARCH_MODES else "lexical"
+        print(f"   检索模式: {mode}")
+        if deadline_ms is None:
+            deadline_ms = DEFAULT_SEARCH_DEADLINE_MS
         
-        docs_dir = Path(docs_path)
-        print(f"   搜索目录: {docs_dir}")
-        print(f"   目录存在: {docs_dir.exists()}")
+        missing = [s.docs_path for s in engine.shards if not Path(s.docs_path).exists()]
+        print(f"   搜索目录: {', '.join(s.docs_path for s in engine.shards)}")
+        print(f"   目录存在: {not missing}")
         
-        if not docs_dir.exists():
+        if len(missing) == len(engine.shards):
             return json.dumps({
                 "status": "error",
-                "message": f"❌ 错误：文档目录不存在 - {docs_path}",
+                "message": f"❌ 错误：文档目录不存在 - {', '.join(missing)}",
                 "results": []
             }, ensure_ascii=False)
         
-        results = []
-        query_lower = query.lower()
+        def section_link(hit) -> str:
+            # 使用 format_note_reference 生成指向章节的内部链接
+            display = f"{hit.title} > {hit.heading}" if hit.heading else hit.title
+            return format_note_reference(hit.path, display, hit.anchor or "")
         
-        # 🔍 调试日志：开始搜索
-        all_md_files = list(docs_dir.rglob("*.md"))
-        print(f"   📄 .md 文件总数: {len(all_md_files)}")
-        print(f"   🔎 搜索关键词: '{query_lower}'")
+        summarized = set()  # 已返回过笔记摘要的笔记
         
-        # 递归搜索所有 markdown 文件
-        searched_count = 0
-        for md_file in all_md_files:
-            searched_count += 1
-            try:
-                content = md_file.read_text(encoding='utf-8')
-                # 检查查询关键词是否在文件内容中
-                if query_lower in content.lower():
-                    # 获取相对路径（相对于根目录）
-                    relative_path = md_file.relative_to(docs_dir)
-                    obsidian_path = str(relative_path)
-                    # 查找包含关键词的上下文（前后各100个字符）
-                    content_lower = content.lower()
-                    pos = content_lower.find(query_lower)
-                    start = max(0, pos - 100)
-                    end = min(len(content), pos + len(query_lower) + 100)
-                    snippet = content[start:end].strip()
-                    # 使用 format_note_reference 生成内部链接
-                    note_link = format_note_reference(obsidian_path, md_file.stem)
-                    results.append({
-                        'file': md_file.name,
-                        'path': obsidian_path.replace('.md', ''),
-                        'snippet': snippet,
-                        'note_link': note_link
-                    })
-                    if len(results) >= max_results:
-                        break
-            except Exception:
-                continue
+        def to_result(hit) -> Dict[str, Any]:
+            note_link = section_link(hit)
+            via = format_note_reference(hit.via, Path(hit.via).stem) if hit.via else None
+            related = [format_note_reference(p, Path(p).stem) for p in hit.related]
+            # 内容几乎相同的章节（模板、复制的笔记）只返回一次，其余列在 copies 中
+            copies = [format_note_reference(p, Path(p).stem) for p in hit.copies]
+            if hit.note_summary is not None:
+                # 摘要模式：同一笔记的摘要只返回一次
+                key = (hit.shard, hit.path)
+                note_summary = {'note_summary': hit.note_summary} if key not in summarized and hit.note_summary else {}
+                summarized.add(key)
+                return {
+                    **({'vault': hit.shard} if multi_vault else {}),
+                    'note_link': note_link,
+                    'summary': hit.snippet,
+                    **note_summary,
+                    **({'via': via} if via else {}),
+                    **({'copies': copies} if copies else {}),
+                    **({} if compact else {'section_tokens': hit.section_tokens, 'score': round(hit.score, 4)}),
+                }
+            if compact:
+                return {
+                    'note_link': note_link,
+                    'snippet': hit.snippet,
+                    **({'vault': hit.shard} if multi_vault else {}),
+                    **({'via': via} if via else {}),
+                    **({'copies': copies} if copies else {}),
+                }
+            return {
+                **({'vault': hit.shard} if multi_vault else {}),
+                'file': Path(hit.path).name,
+                'path': hit.path.replace('.md', ''),
+                'heading': hit.heading,
+                'snippet': hit.snippet,
+                'note_link': note_link,
+                'tokens': hit.tokens,
+                'section_tokens': hit.section_tokens,
+                'score': round(hit.score, 4),
+                **({'via': via} if via else {}),
+                **({'related': related} if related else {}),
+                **({'copies': copies} if copies else {}),
+            }
+        
+        def next_page(result_cursor):
+            # 从游标按排名顺序取下一页（不做 MMR 重排，λ=1 只去掉近似重复的章节并列入 copies），
+            # 再按 Token 预算截取能放下的前缀，其余放回游标供下一页使用（各页依次拼接即为完整排序结果）
+            candidates = result_cursor.take(max_results, 1.0)
+            packed = pack_hits(candidates, budget, max_results=max_results, ordered=True)
+            result_cursor.push_back([hit for hit in candidates if not covered(hit, packed.hits)])
+            result_cursor.record(packed.hits)
+            return packed
+        
+        # 翻页：从服务端缓存的完整排序结果中取下一页，不再重新检索
+        if cursor:
+            result_cursor = cursor_cache.get(cursor)
+            if result_cursor is None:
+                return json.dumps({
+                    "status": "error",
+                    "message": "❌ 游标已过期或知识库已更新，请重新搜索",
+                    "cursor": cursor,
+                    "results": []
+                }, ensure_ascii=False)
+            offset = result_cursor.returned
+            packed = next_page(result_cursor)
+            if result_cursor.exhausted:
+                cursor_cache.discard(cursor)
+            print(f"   📄 游标翻页: 第 {offset + 1} 条起，返回 {len(packed.hits)} 个结果")
+            partial = {"partial": True, "coverage": round(result_cursor.coverage, 3)} if result_cursor.partial else {}
+            payload = {
+                "status": "success" if packed.hits else "no_results",
+                "query": result_cursor.query,
+                "offset": offset,
+                **partial,
+                "results": [to_result(hit) for hit in packed.hits],
+                **({"next_cursor": cursor} if not result_cursor.exhausted else {}),
+            }
+            return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        
+        # 批量查询：query 与 queries 去重后一次完成（共享索引遍历、笔记读取与词项得分）
+        query_list = list(dict.fromkeys(q.strip() for q in [query, *(queries or [])] if q and q.strip()))
+        batch = len(query_list) > 1
+        if batch:
+            print(f"   批量查询: {query_list}")
+        
+        # 单个查询：完整排序结果缓存在游标中，首页之后用 next_cursor 翻页；
+        # 批量查询 / 展开链接：多取一些候选，再按 Token 预算打包（合并同一笔记中相邻/重叠的片段），
+        # 展开链接时邻居章节附加在 max_results 个命中之后，只受 Token 预算限制
+        next_cursor = None
+        if batch or expand_links:
+            found = engine.search_many(
+                query_list,
+                max_results=max_results if expand_links else max_results * 2,
+                expand_links=expand_links,
+                mode=mode,
+                deadline_ms=deadline_ms,
+                summaries=summaries,
+            )
+        else:
+            found = engine.stream(query, mode=mode, deadline_ms=deadline_ms, summaries=summaries)
+        # 🔍 调试日志：查询索引
+        print(f"   📇 索引笔记数: {engine.note_count}（{len(found.searched)}/{len(engine.shards)} 个分片，{found.elapsed_ms:.1f} ms）")
+        skipped = found.timed_out + found.busy + sorted(found.failed)
+        if skipped:
+            print(f"   ⚠️ 未返回结果的分片: {', '.join(skipped)}")
+        partial = {"partial": True, "coverage": round(found.coverage, 3)} if found.partial else {}
+        if partial:
+            print(f"   ⏱️ 超出时间预算 {deadline_ms} ms，返回部分结果（覆盖 {found.coverage:.0%}）")
+        
+        # 每个查询分得相同的 Token 预算；前面的查询已返回的片段不再重复返回，
+        # 只在该查询的 duplicates 中列出链接
+        share = budget // len(query_list)
+        shown = []
+        groups = []
+        used = dropped = 0
+        for q, hits in zip(query_list, found.groups):
+            if found.cursor is not None:
+                packed = next_page(found.cursor)
+                if not found.cursor.exhausted:
+                    next_cursor = cursor_cache.put(found.cursor)
+                duplicates = []
+            else:
+                fresh, duplicates = [], []
+                for rank, hit in enumerate(hits):
+                    if covered(hit, shown) or near_duplicate(hit.signature, [h.signature for h in shown]):
+                        if rank < max_results:
+                            duplicates.append(section_link(hit))
+                    else:
+                        fresh.append(hit)
+                packed = pack_hits(fresh, share) if expand_links else pack_hits(fresh, share, max_results=max_results)
+            shown.extend(packed.hits)
+            groups.append({
+                "query": q,
+                "results": [to_result(hit) for hit in packed.hits],
+                **({"duplicates": list(dict.fromkeys(duplicates))} if duplicates else {}),
+            })
+            used += packed.tokens
+            dropped += packed.dropped
+        count = sum(len(g["results"]) for g in groups)
         
         # 🔍 调试日志：搜索完成
-        print(f"   ✅ 搜索完成: 检查了 {searched_count} 个文件，找到 {len(results)} 个结果")
+        print(f"   ✅ 搜索完成: 找到 {count} 个结果（约 {used}/{budget} tokens，省略 {dropped} 个）")
         
-        if not results:
+        asked = {"queries": query_list} if batch else {"query": query}
+        if not count:
             return json.dumps({
                 "status": "no_results",
-                "message": f"🔍 未找到与「{query}」相关的文档。建议：1) 尝试其他关键词 2) 使用网络搜索获取最新信息",
-                "query": query,
+                "message": f"🔍 未找到与「{'」「'.join(query_list)}」相关的文档。建议：1) 尝试其他关键词 2) 使用网络搜索获取最新信息",
+                **asked,
+                **partial,
                 "results": []
             }, ensure_ascii=False)
         
-        # 返回结构化结果
-        return json.dumps({
-            "status": "success",
-            "query": query,
-            "count": len(results),
-            "message": f"📚 找到 {len(results)} 个相关文档",
-            "results": results
-        }, ensure_ascii=False, indent=2)
+        # 返回结构化结果（不缩进：结果会在后续每轮调用中重复计入输入 Token）；
+        # 批量查询按查询分组返回 groups
+        found_results = {"groups": groups} if batch else {"results": groups[0]["results"]}
+        more = {"next_cursor": next_cursor} if next_cursor else {}
+        if compact:
+            payload = {"status": "success", **asked, **partial, **found_results, **more}
+        else:
+            payload = {
+                "status": "success",
+                **asked,
+                "count": count,
+                "message": f"📚 找到 {count} 个相关文档",
+                "tokens": used,
+                "omitted": dropped,
+                **({"skipped_vaults": skipped} if multi_vault and skipped else {}),
+                **partial,
+                **found_results,
+                **more
+            }
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
     
     return search_obsidian_docs_v2
 
 
+def retrieve_sources(
+    engine: ShardedSearch,
+    query: str,
+    max_results: int = 10,
+    mode: Optional[str] = None,
+    deadline_ms: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    仅检索：直接查询本地索引，返回排序后的来源列表（不调用模型）
+    
+    用于只需要定位笔记的场景（如「我在哪篇笔记里写过 X」），耗时为毫秒级。
+    每个来源是一个章节，格式与 structured_invoke 解析出的内部来源一致，另带
+    heading、snippet、note_link、score（BM25 / 语义得分）和 relevance
+    （相对第一名的得分，第一名为 1.0）。
+    
+    Args:
+        engine: 检索引擎（ShardedSearch）
+        query: 搜索关键词或问题（支持与搜索工具相同的字段语法）
+        max_results: 返回的最大来源数量
+        mode: 检索模式（lexical / semantic / hybrid，默认取 OBSIDIAN_SEARCH_MODE）
+        deadline_ms: 时间预算（毫秒，默认取 OBSIDIAN_SEARCH_DEADLINE_MS）
+        
+    Returns:
+        {"sources", "mode", "elapsed_ms", "partial", "coverage"}
+    """
+    if mode not in SEARCH_MODES:
+        mode = DEFAULT_SEARCH_MODE if DEFAULT_SEARCH_MODE in SEARCH_MODES else "lexical"
+    if deadline_ms is None:
+        deadline_ms = DEFAULT_SEARCH_DEADLINE_MS
+    found = engine.search(query, max_results=max_results, mode=mode, deadline_ms=deadline_ms)
+    multi_vault = len(engine.shards) > 1
+    best = max((hit.score for hit in found.hits), default=0.0)
+    sources = []
+    for hit in found.hits:
+        display = f"{hit.title} > {hit.heading}" if hit.heading else hit.title
+        sources.append({
+            "type": "internal",
+            "path": hit.path.replace('.md', ''),
+            "display": display,
+            "title": display,
+            "heading": hit.heading,
+            "note_link": format_note_reference(hit.path, display, hit.anchor or ""),
+            "snippet": hit.snippet,
+            "score": round(hit.score, 4),
+            "relevance": round(hit.score / best, 4) if best > 0 else 0.0,
+            **({"vault": hit.shard} if multi_vault else {}),
+        })
+    return {
+        "sources": sources,
+        "mode": mode,
+        "elapsed_ms": round(found.elapsed_ms, 1),
+        "partial": found.partial,
+        "coverage": round(found.coverage, 3),
+    }
+
+
 def create_internet_search_tool_v2():
     """
     创建 v2.0 版本的网页搜索工具（使用 Tavily API）
@@ -290,7 +548,7 @@ OBSIDIAN_ASSISTANT_PROMPT_V2 = """你是一个专业的 Obsidian 使用助手。
    - 只有在用户同意或明确需要最新信息时，才使用 internet_search_v2
 
 3. **引用格式严格要求**：
-   - 本地文档：`[[工具返回的完整路径|显示名称]]`
+   - 本地文档：`[[工具返回的完整路径|显示名称]]`；结果带 note_link 时直接使用它（可能包含 `#章节`）
    - 网页来源：`[标题](工具返回的完整URL)`
    - 每个引用必须对应工具的实际返回结果
 
@@ -378,6 +636,9 @@ def create_obsidian_assistant_v2(
     cache_max_items: int = 256,
     enable_compression: bool = False,
     verbose: Optional[bool] = None,
+    index_dir: Optional[str] = None,
+    vaults: Optional[Dict[str, str]] = None,
+    enable_prefetch: bool = False,
 ):
     """
     创建 Obsidian 智能助手 v2.0
@@ -388,6 +649,11 @@ def create_obsidian_assistant_v2(
         docs_path: Obsidian 文档根目录路径
         model_name: 使用的模型名称（默认 qwen-turbo）
         api_key: API Key（如果未设置则从环境变量读取）
+        index_dir: 本地搜索索引目录（默认见 vault_search.default_index_dir）
+        vaults: 多个知识库（名称 -> 路径），每个知识库一个索引分片并发检索（默认读取 $OBSIDIAN_VAULTS）
+        enable_prefetch: 预检索：调用模型前先在本地检索，把结果作为一次已完成的
+                         search_obsidian_docs_v2 调用注入对话（web_first 路由除外），
+                         模型可直接作答，省去一次只为发出工具调用的模型请求
         
     Returns:
         CompiledStateGraph: 可以直接调用的助手代理
@@ -420,9 +686,10 @@ def create_obsidian_assistant_v2(
     if not tavily_key:
         raise ValueError("❌ 错误：未设置 TAVILY_API_KEY 环境变量")
     
-    # 验证文档路径
-    if not Path(docs_path).exists():
-        raise ValueError(f"❌ 错误：文档路径不存在 - {docs_path}")
+    # 验证文档路径（按解析后的知识库分片检查：vaults / $OBSIDIAN_VAULTS / docs_path）
+    search_engine = ShardedSearch.for_vaults(docs_path, index_dir=index_dir, vaults=vaults)
+    if not any(Path(shard.docs_path).exists() for shard in search_engine.shards):
+        raise ValueError(f"❌ 错误：文档路径不存在 - {', '.join(s.docs_path for s in search_engine.shards)}")
     
     # 精简日志输出
     if verbose is None:
@@ -438,7 +705,7 @@ def create_obsidian_assistant_v2(
     
     # 2. 创建工具
     # 创建工具（省略详细日志）
-    search_tool_v2 = create_search_tool_v2(docs_path)
+    search_tool_v2 = create_search_tool_v2(engine=search_engine)
     internet_search_tool_v2 = create_internet_search_tool_v2()
     
     # 3. 创建子代理
@@ -458,7 +725,7 @@ def create_obsidian_assistant_v2(
     router = None
     routing_note = ""
     if enable_smart_routing:
-        router = create_smart_router(docs_path)
+        router = create_smart_router(docs_path, shards=search_engine.shards)  # 词表覆盖所有知识库
         routing_note = (
             "\n\n## 智能路由策略 (启用)\n"
             "- local_only: 高覆盖率时仅本地搜索\n"
@@ -468,6 +735,13 @@ def create_obsidian_assistant_v2(
         )
         system_prompt_final += routing_note
 
+    if enable_prefetch:
+        system_prompt_final += (
+            "\n\n## 预检索 (启用)\n"
+            "- 对话中已有的 search_obsidian_docs_v2 结果即为本次问题的本地搜索结果，无需重复搜索\n"
+            "- 结果足够时直接作答；不足时可换关键词再次搜索或使用网页搜索"
+        )
+
     assistant = create_deep_agent(
         model=model,
         tools=[search_tool_v2],
@@ -496,11 +770,59 @@ def create_obsidian_assistant_v2(
                     return getattr(m, "content", None) or (isinstance(m, dict) and m.get("content"))
         return None
 
-    def structured_invoke(state: Dict[str, Any]) -> Dict[str, Any]:
-        """统一返回结构: {answer, raw, route_strategy, adapter_used, token_usage, messages}"""
+    def retrieval_only_invoke(user_content: Optional[str], max_results: int) -> Dict[str, Any]:
+        # 仅检索：不调用模型、不路由、不读写查询缓存，sources 为按相关度排序的章节（含 snippet 与得分）
+        retrieval = retrieve_sources(search_engine, user_content or "", max_results=max_results)
+        sources = retrieval.pop("sources")
+        return {
+            "answer": "",
+            "raw": None,
+            "route_strategy": None,
+            "route_coverage": None,
+            "time_sensitive": None,
+            "adapter_used": None,
+            "token_usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cost": 0.0},
+            "sources": sources,
+            "messages": None,
+            "cache_hit": False,
+            "compression": None,
+            "prefetched": False,
+            "retrieval": retrieval,
+        }
+
+    def prefetch_messages(user_content: str) -> List[Any]:
+        # 以搜索工具本身完成检索（结果格式与模型自己调用时一致），构造一对工具调用 / 工具结果消息
+        args = {"query": user_content}
+        try:
+            content = search_tool_v2.invoke(args)
+            if json.loads(content).get("status") == "error":
+                return []
+        except Exception as e:
+            print(f"⚠️ 预检索失败，回退为由模型调用搜索工具: {e}")
+            return []
+        call_id = f"prefetch_{uuid.uuid4().hex[:12]}"
+        return [
+            AIMessage(content="", tool_calls=[{"name": search_tool_v2.name, "args": args, "id": call_id}]),
+            ToolMessage(content=content, tool_call_id=call_id, name=search_tool_v2.name),
+        ]
+
+    def structured_invoke(
+        state: Dict[str, Any],
+        retrieval_only: bool = False,
+        max_results: int = 10,
+        prefetch: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """统一返回结构: {answer, raw, route_strategy, adapter_used, token_usage, messages}
+
+        retrieval_only=True 时只查询本地索引（毫秒级，不调用模型）：answer 为空，
+        sources 为最多 max_results 个排序后的章节，retrieval 中为检索模式、耗时与覆盖率。
+        prefetch 覆盖 enable_prefetch（None 表示沿用创建时的设置）；prefetched 标记是否注入了预检索结果。
+        """
         token_counter.start_counting()
         msgs = state.get("messages", [])
         user_content = _extract_user_content(msgs)
+        if retrieval_only:
+            return retrieval_only_invoke(user_content if isinstance(user_content, str) else None, max_results)
         route_strategy = None
         route_coverage = None
         time_sensitive = None
@@ -550,6 +872,15 @@ def create_obsidian_assistant_v2(
                             break
                     mutated_state["messages"] = state_msgs
 
+        # 预检索：本地结果作为已完成的工具调用追加在用户消息之后；web_first（时效性问题）仍交给模型决定
+        prefetched = False
+        use_prefetch = enable_prefetch if prefetch is None else prefetch
+        if use_prefetch and isinstance(user_content, str) and user_content.strip() and route_strategy != "web_first":
+            injected = prefetch_messages(user_content)
+            if injected:
+                mutated_state["messages"] = [*mutated_state.get("messages", []), *injected]
+                prefetched = True
+
         # === 执行底层调用 ===
         raw_result = original_invoke(mutated_state)
         # Token usage 统计
@@ -615,6 +946,7 @@ def create_obsidian_assistant_v2(
             "messages": raw_result.get("messages") if isinstance(raw_result, dict) else None,
             "cache_hit": cache_hit,
             "compression": compression_meta,
+            "prefetched": prefetched,
         }
         if query_cache and isinstance(user_content, str):
             try:
@@ -624,6 +956,7 @@ def create_obsidian_assistant_v2(
         return final_payload
 
     assistant.invoke = structured_invoke  # type: ignore
+    assistant.search_engine = search_engine  # type: ignore
 
     return assistant
 
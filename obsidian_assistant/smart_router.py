@@ -7,16 +7,50 @@ Responsibilities:
 
 Notes:
 - Actual semantic indexing / vector search not implemented in this skeleton.
-- Coverage heuristic uses naive keyword frequency presence.
+- Tokenization reuses vault_search.TextPipeline (NFKC, case folding, CJK
+  bigrams), so Chinese queries are not treated as one giant "word".
+- Coverage = share of query units (words / CJK characters) covered by a
+  query term that exists in the local keyword index.
 - Time sensitivity keywords list can be extended from configuration.
+- Note text is read through the content cache shared with the search tool
+  (vault_search.get_content_cache), so building the keyword index after a
+  search (or again) does not re-read unchanged notes.
+- With ``vocabulary_path`` the keyword index is persisted per file
+  (mtime, size, terms) and reloaded on the next start: only files whose
+  mtime or size changed are read again.  The file lives in the vault's
+  index directory, so index snapshots (vault_search.snapshot) carry it.
+- Several vaults (``extra_vaults``, create_smart_router(shards=...)) share
+  one keyword index; each vault keeps its vocabulary file in its own index
+  directory and ``max_files`` applies per vault.
 """
 from __future__ import annotations
+import json
 from pathlib import Path
-from typing import Set, Dict, Tuple
-import re
+from typing import List, Optional, Sequence, Set, Dict, Tuple
+
+# package-relative first, so one process never loads two copies of vault_search
+try:
+    from .vault_search.content import ContentCache, get_content_cache
+    from .vault_search.extractors import is_indexed
+    from .vault_search.index import default_index_dir
+    from .vault_search.segment import replacing
+    from .vault_search.sharded import VaultShard
+    from .vault_search.snapshot import ROUTER_VOCAB_FILENAME
+    from .vault_search.tokenizer import TextPipeline, is_cjk
+except ImportError:
+    from vault_search.content import ContentCache, get_content_cache
+    from vault_search.extractors import is_indexed
+    from vault_search.index import default_index_dir
+    from vault_search.segment import replacing
+    from vault_search.sharded import VaultShard
+    from vault_search.snapshot import ROUTER_VOCAB_FILENAME
+    from vault_search.tokenizer import TextPipeline, is_cjk
 
 DEFAULT_TIME_KEYWORDS = ["最新", "推荐", "现在", "今年", "2025", "2024", "update", "recent", "trend"]
 STOPWORDS = {"的", "是", "在", "和", "了", "有", "就", "不", "the", "is", "a", "an", "to", "of"}
+VOCABULARY_VERSION = 1
+
+FileTerms = Dict[str, Tuple[float, int, List[str]]]  # rel path -> (mtime, size, terms)
 
 class SmartRouter:
     """Heuristic routing engine.
@@ -25,6 +59,10 @@ class SmartRouter:
         docs_path: Root path of Obsidian vault subset to index.
         time_keywords: List of words/phrases indicating need for fresh info.
         coverage_thresholds: Tuple (high, mid) for routing decision splits.
+        pipeline: Text analysis pipeline (defaults to one using STOPWORDS).
+        content_cache: Note text cache (defaults to the process-wide one).
+        vocabulary_path: JSON file persisting the keyword index (None = rebuilt per process).
+        extra_vaults: Further (docs_path, vocabulary_path) pairs indexed into the same keyword index.
     """
 
     def __init__(
@@ -33,11 +71,21 @@ class SmartRouter:
         time_keywords=None,
         coverage_thresholds: Tuple[float, float] = (0.8, 0.4),
         max_files: int = 2000,
+        pipeline: Optional[TextPipeline] = None,
+        content_cache: Optional[ContentCache] = None,
+        vocabulary_path: Optional[str] = None,
+        extra_vaults: Sequence[Tuple[str, Optional[str]]] = (),
     ) -> None:
         self.docs_path = Path(docs_path)
         self.time_keywords = time_keywords or DEFAULT_TIME_KEYWORDS
         self.coverage_high, self.coverage_mid = coverage_thresholds
         self.max_files = max_files
+        self.pipeline = pipeline or TextPipeline(stopwords=STOPWORDS)
+        self.content = content_cache or get_content_cache()
+        self.vocabulary_path = Path(vocabulary_path) if vocabulary_path else None
+        self.vaults: List[Tuple[Path, Optional[Path]]] = [(self.docs_path, self.vocabulary_path)] + [
+            (Path(path), Path(vocab) if vocab else None) for path, vocab in extra_vaults
+        ]
         self._index: Set[str] = set()
         self._stats: Dict[str, int] = {"queries": 0, "local_only": 0, "web_first": 0, "hybrid": 0}
 
@@ -89,38 +137,98 @@ class SmartRouter:
         return any(kw.lower() in lowered for kw in self.time_keywords)
 
     def _tokenize(self, text: str) -> Set[str]:
-        words = re.findall(r"[\w\-]+", text.lower())
-        return {w for w in words if w not in STOPWORDS and len(w) > 1}
+        return set(self.pipeline.terms(text))
 
     def _build_local_index(self) -> Set[str]:
-        if not self.docs_path.exists():
-            return set()
         collected: Set[str] = set()
-        md_files = list(self.docs_path.rglob("*.md"))[: self.max_files]
+        for docs_path, vocabulary_path in self.vaults:
+            for _, _, terms in self._vault_terms(docs_path, vocabulary_path).values():
+                collected.update(terms)
+        return collected
+
+    def _vault_terms(self, docs_path: Path, vocabulary_path: Optional[Path]) -> FileTerms:
+        if not docs_path.exists():
+            return {}
+        stored = self._load_vocabulary(vocabulary_path)
+        files: FileTerms = {}
+        # same file types as the search index (notes, canvases, text attachments)
+        md_files = [p for p in docs_path.rglob("*") if is_indexed(p)][: self.max_files]
         for f in md_files:
+            rel = f.relative_to(docs_path).as_posix()
             try:
-                content = f.read_text(encoding="utf-8", errors="ignore")
-            except Exception:
+                st = f.stat()
+            except OSError:
+                continue
+            known = stored.get(rel)
+            if known is not None and known[:2] == (st.st_mtime, st.st_size):
+                files[rel] = known
+                continue
+            content = self.content.text(f)
+            if content is None:
                 continue
             # Simple: include tokens from title (filename) and first 400 chars
             snippet = f.name + "\n" + content[:400]
-            tokens = self._tokenize(snippet)
-            collected.update(tokens)
-        return collected
+            files[rel] = (st.st_mtime, st.st_size, sorted(self._tokenize(snippet)))
+        if vocabulary_path is not None and files != stored:
+            self._save_vocabulary(vocabulary_path, files)
+        return files
+
+    def _vocabulary_signature(self) -> str:
+        return f"{self.pipeline.signature()}|{self.max_files}"
+
+    def _load_vocabulary(self, vocabulary_path: Optional[Path]) -> FileTerms:
+        if vocabulary_path is None:
+            return {}
+        try:
+            data = json.loads(vocabulary_path.read_text(encoding="utf-8"))
+            if data.get("version") != VOCABULARY_VERSION or data.get("signature") != self._vocabulary_signature():
+                return {}
+            return {rel: (mtime, size, terms) for rel, (mtime, size, terms) in data["files"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return {}
+
+    def _save_vocabulary(self, vocabulary_path: Path, files: FileTerms) -> None:
+        data = {"version": VOCABULARY_VERSION, "signature": self._vocabulary_signature(), "files": files}
+        try:
+            vocabulary_path.parent.mkdir(parents=True, exist_ok=True)
+            with replacing(vocabulary_path) as tmp:
+                tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        except OSError:
+            pass  # persistence is an optimisation; routing works without it
 
     def _check_local_coverage(self, query: str) -> float:
         self.ensure_index()
         if not self._index:
             return 0.0
-        keywords = list(self._tokenize(query))
-        if not keywords:
+        tokens = self.pipeline.tokens(query, query=True)
+        if not tokens:
             return 0.0
-        matched = sum(1 for k in keywords if k in self._index)
-        return matched / len(keywords)
+        # Units are query positions (one per word / CJK character); a unit is
+        # covered when any indexed query term spans it.
+        units: Set[int] = set()
+        covered: Set[int] = set()
+        for tok in tokens:
+            width = len(tok.term) if is_cjk(tok.term) else 1
+            span = range(tok.position, tok.position + width)
+            units.update(span)
+            if tok.term in self._index:
+                covered.update(span)
+        return len(covered) / len(units)
 
 # Convenience factory (future: support config object)
 
-def create_smart_router(docs_path: str) -> SmartRouter:
-    return SmartRouter(docs_path=docs_path)
+def create_smart_router(docs_path: str, shards: Optional[Sequence[VaultShard]] = None) -> SmartRouter:
+    """Router whose vocabulary is persisted next to the vault's search index.
+
+    With ``shards`` the keyword index covers every shard's vault (each
+    vocabulary file lives in that shard's index directory) and ``docs_path``
+    is ignored.
+    """
+    vaults = [
+        (shard.docs_path, str(Path(shard.index_dir or default_index_dir(shard.docs_path)) / ROUTER_VOCAB_FILENAME))
+        for shard in shards or [VaultShard("vault", docs_path)]
+    ]
+    (first_path, first_vocab), *extra = vaults
+    return SmartRouter(docs_path=first_path, vocabulary_path=first_vocab, extra_vaults=extra)
 
 __all__ = ["SmartRouter", "create_smart_router"]
@@ -0,0 +1,51 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from obsidian_assistant.vault_search import VaultIndex  # noqa: E402
+from obsidian_assistant.vault_search.ann import IVFIndex, _synthetic, benchmark, exact_search  # noqa: E402
+
+
+def test_ivf_recall_against_exact_search():
+    data = _synthetic(5050, 32, 40)
+    report = benchmark(data[50:], data[:50], k=10, nprobes=(4, 16))
+    assert report["runs"][-1]["recall"] >= 0.9
+    assert report["runs"][0]["recall"] <= report["runs"][-1]["recall"]
+
+
+def test_ivf_insert_delete_and_reload(tmp_path):
+    data = _synthetic(2000, 16, 10, seed=1)
+    keys = np.arange(2000, dtype=np.int64)
+    ivf = IVFIndex.train(keys, data, nlist=20)
+    query = data[7]
+    assert ivf.search(query, 1, nprobe=20)[0][0] == 7
+
+    ivf.remove(7)
+    assert 7 not in {k for k, _ in ivf.search(query, 5, nprobe=20)}
+    ivf.add(7, -query)  # an edit moves the vector
+    assert ivf.search(-query, 1, nprobe=20)[0][0] == 7
+    ivf.add(5000, query)
+    assert ivf.search(query, 1, nprobe=20)[0][0] == 5000
+    assert len(ivf) == 2001
+
+    ivf.save(tmp_path)
+    loaded = IVFIndex.load(tmp_path)
+    assert len(loaded) == 2001
+    exact = exact_search(keys, data, data[3], 5)
+    assert loaded.search(data[3], 5, nprobe=20)[0][0] == exact[0][0]
+
+
+def test_semantic_mode_uses_ivf_for_large_vaults(tmp_path, monkeypatch):
+    monkeypatch.setenv("OBSIDIAN_SEMANTIC_DIMS", "0")
+    monkeypatch.setenv("OBSIDIAN_ANN_MIN_ROWS", "0")
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "Canvas.md").write_text("Canvas boards hold cards and arrows.", encoding="utf-8")
+    (vault / "Sync.md").write_text("Sync keeps the vault on every device.", encoding="utf-8")
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    assert index.search("arrows", mode="semantic")[0].path == "Canvas.md"
+    assert index.semantic().ann is not None
+
+    (vault / "Sync.md").write_text("Arrows, arrows and more arrows.", encoding="utf-8")
+    index.update_paths([str(vault / "Sync.md")])
+    assert index.search("arrows", mode="semantic")[0].path == "Sync.md"
@@ -0,0 +1,40 @@
+import json
+from pathlib import Path
+
+from obsidian_assistant.obsidian_assistant import create_search_tool_v2
+from obsidian_assistant.vault_search import VaultIndex
+
+
+def _vault(root):
+    root.mkdir()
+    (root / "Tags.md").write_text("# Tags\nA tag groups notes. Nested tags use slashes.", encoding="utf-8")
+    (root / "标签.md").write_text("# 标签\n标签 tag 用于分类笔记。", encoding="utf-8")
+    (root / "Links.md").write_text("# Links\nInternal links connect notes.", encoding="utf-8")
+    return str(root)
+
+
+def test_search_many_matches_single_searches_and_reads_notes_once(tmp_path, monkeypatch):
+    index = VaultIndex.open(_vault(tmp_path / "vault"), str(tmp_path / "index"))
+    queries = ["tag", "tags", "标签", "tag notes"]
+    expected = [[(h.path, round(h.score, 9)) for h in index.search(q)] for q in queries]
+
+    reads = []
+    original = Path.read_text
+    monkeypatch.setattr(Path, "read_text", lambda self, *a, **kw: reads.append(self.name) or original(self, *a, **kw))
+    groups = index.search_many(queries)
+    assert [[(h.path, round(h.score, 9)) for h in hits] for hits in groups] == expected
+    assert sorted(reads) == sorted(set(reads))  # every note read at most once
+
+
+def test_search_tool_groups_and_deduplicates(tmp_path):
+    search = create_search_tool_v2(_vault(tmp_path / "vault"), index_dir=str(tmp_path / "index"))
+    payload = json.loads(search.invoke({"query": "tag", "queries": ["标签", "tag", "links"]}))
+    assert payload["queries"] == ["tag", "标签", "links"]
+    first, cjk, links = payload["groups"]
+    assert {r["file"] for r in first["results"]} == {"Tags.md", "标签.md"}
+    assert cjk["results"] == [] and cjk["duplicates"] == ["[[标签#标签|标签 > 标签]]"]
+    assert [r["file"] for r in links["results"]] == ["Links.md"]
+    assert payload["count"] == 3
+
+    single = json.loads(search.invoke({"query": "links", "queries": ["links"]}))
+    assert "groups" not in single and single["results"][0]["file"] == "Links.md"
@@ -0,0 +1,42 @@
+from obsidian_assistant.vault_search import BM25FScorer, VaultIndex
+
+
+def test_title_and_heading_matches_rank_first(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "a-mention.md").write_text("Daily log. Also touched canvas briefly.\n" + "filler text " * 50, encoding="utf-8")
+    (vault / "Canvas.md").write_text("Boards for visual thinking.\nA canvas holds cards.", encoding="utf-8")
+    (vault / "b-heading.md").write_text("# Canvas tips\nSome notes about canvas usage.", encoding="utf-8")
+
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    hits = index.search("canvas", max_results=3)
+    assert {h.path for h in hits[:2]} == {"Canvas.md", "b-heading.md"}
+    assert hits[2].path == "a-mention.md"
+    assert hits[1].score > hits[2].score
+
+
+def test_top_k_is_bounded_and_ordered():
+    scores = {i: float(i % 7) for i in range(100)}
+    top = BM25FScorer.top_k(scores, 3)
+    assert [s for _, s in top] == [6.0, 6.0, 6.0]
+    assert [nid for nid, _ in top] == [6, 13, 20]
+    assert BM25FScorer.top_k(scores, 0) == []
+
+
+def test_collection_totals_are_cached_until_the_index_changes(tmp_path, monkeypatch):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "a.md").write_text("# Sync\nsync the vault daily.", encoding="utf-8")
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    walks = []
+    live_chunks = index.live_chunks
+    monkeypatch.setattr(index, "live_chunks", lambda: walks.append(1) or live_chunks())
+
+    first = index.collection_stats("sync")
+    assert index.collection_stats("vault daily").df == {"vault": 1, "daily": 1}
+    assert len(walks) == 1 and first.df == {"sync": 1}
+
+    (vault / "b.md").write_text("# Backup\nsync backups weekly.", encoding="utf-8")
+    index.update_paths([str(vault / "b.md")])
+    stats = index.collection_stats("sync")
+    assert len(walks) == 2 and (stats.chunks, stats.df) == (2, {"sync": 2})
@@ -0,0 +1,65 @@
+import os
+from pathlib import Path
+
+from obsidian_assistant.smart_router import SmartRouter
+from obsidian_assistant.vault_search import ContentCache, VaultIndex, content, documents
+
+
+def _count_reads(monkeypatch):
+    reads = []
+    for module in (content, documents):
+
+        def spy(path, original=module.read_document):
+            reads.append(Path(path).name)
+            return original(path)
+
+        monkeypatch.setattr(module, "read_document", spy)
+    return reads
+
+
+def test_cache_validates_by_stat_and_bounds_bytes(tmp_path, monkeypatch):
+    note = tmp_path / "Note.md"
+    note.write_text("Straße und Sync", encoding="utf-8")
+    cache = ContentCache()
+    reads = _count_reads(monkeypatch)
+    assert cache.text(note) == "Straße und Sync"
+    assert cache.normalized(note) == cache.normalized(note)
+    assert cache.normalized(note)[0] == "strasse und sync"
+    assert reads == ["Note.md"]  # one read, normalised once
+
+    note.write_text("Changed text, longer", encoding="utf-8")
+    os.utime(note, ns=(1, 1))
+    assert cache.text(note) == "Changed text, longer"
+    assert cache.stats()["misses"] == 2
+
+    (tmp_path / "Latin1.md").write_bytes("caf\xe9".encode("latin-1"))
+    assert cache.text(tmp_path / "Latin1.md") is None
+    assert cache.text(tmp_path / "Missing.md") is None
+
+    small = ContentCache(max_bytes=cache.stats()["bytes"])
+    for i in range(3):
+        (tmp_path / f"n{i}.md").write_text("x" * 100, encoding="utf-8")
+        small.text(tmp_path / f"n{i}.md")
+    assert small.stats()["bytes"] <= small.max_bytes
+    assert small.stats()["entries"] < 3
+
+
+def test_repeated_searches_and_router_share_reads(tmp_path, monkeypatch):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "Sync.md").write_text("# Setup\nsync the vault daily.\n# Conflicts\nsync conflicts.", encoding="utf-8")
+    (vault / "Other.md").write_text("# Plugins\nplugin list.", encoding="utf-8")
+    cache = ContentCache()
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    monkeypatch.setattr(index, "content", cache)
+    reads = _count_reads(monkeypatch)
+
+    first = index.search("sync", max_results=2)
+    assert first and reads == ["Sync.md"]
+    assert index.search("sync", max_results=2)[0].snippet == first[0].snippet
+    assert index.search("/sync.*daily/", max_results=2)
+    assert reads == ["Sync.md"]  # unchanged notes are not read again
+
+    router = SmartRouter(docs_path=str(vault), content_cache=cache)
+    router.ensure_index()
+    assert sorted(reads) == ["Other.md", "Sync.md"]
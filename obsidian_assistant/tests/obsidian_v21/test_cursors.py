@@ -0,0 +1,87 @@
+import json
+import time
+
+from obsidian_assistant.obsidian_assistant import create_search_tool_v2
+from obsidian_assistant.vault_search import CursorCache, ShardedSearch, VaultShard, get_vault_index
+
+
+def _vault(root, n=12):
+    root.mkdir()
+    for i in range(n):
+        (root / f"Note {i}.md").write_text(f"# Note {i}\n" + "sync " * (i + 1) + " ".join(f"w{i}x{j}" for j in range(8)), encoding="utf-8")
+    return str(root)
+
+
+def test_cursor_pages_match_one_full_search(tmp_path):
+    shards = [
+        VaultShard("a", _vault(tmp_path / "a"), str(tmp_path / "index-a")),
+        VaultShard("b", _vault(tmp_path / "b", n=5), str(tmp_path / "index-b")),
+    ]
+    engine = ShardedSearch(shards)
+    full = engine.search("sync", max_results=100, deadline_ms=5000, mmr_lambda=None).hits
+    cursor = engine.stream("sync", deadline_ms=5000).cursor
+    pages = [cursor.take(5) for _ in range(4)]
+    assert [len(page) for page in pages] == [5, 5, 5, 2] and cursor.exhausted
+    assert [(h.shard, h.chunk_id) for page in pages for h in page] == [(h.shard, h.chunk_id) for h in full]
+
+    cursor = engine.stream("sync", deadline_ms=5000).cursor
+    first = cursor.take(3)
+    cursor.push_back(first[1:])
+    assert cursor.take(2) == first[1:]
+    engine.close()
+
+
+def test_cursor_goes_stale_when_index_changes(tmp_path):
+    vault = tmp_path / "vault"
+    shard = VaultShard("vault", _vault(vault), str(tmp_path / "index"))
+    engine = ShardedSearch([shard])
+    cache = CursorCache()
+    cursor_id = cache.put(engine.stream("sync", deadline_ms=5000).cursor)
+    assert cache.get(cursor_id) is not None
+    (vault / "Note 0.md").write_text("# Note 0\nrewritten sync", encoding="utf-8")
+    shard.index().refresh()
+    assert cache.get(cursor_id) is None
+    engine.close()
+
+
+def test_cursor_cache_expires_and_evicts(tmp_path):
+    engine = ShardedSearch([VaultShard("vault", _vault(tmp_path / "vault"), str(tmp_path / "index"))])
+    cursor = engine.stream("sync", deadline_ms=5000).cursor
+    cache = CursorCache(ttl=0.05, max_entries=2)
+    expiring = cache.put(cursor)
+    time.sleep(0.1)
+    assert cache.get(expiring) is None
+    ids = [cache.put(cursor) for _ in range(3)]
+    assert cache.get(ids[0]) is None and cache.get(ids[2]) is cursor and len(cache) == 2
+    engine.close()
+
+
+def test_search_tool_pages_with_next_cursor(tmp_path):
+    vault = _vault(tmp_path / "vault")
+    get_vault_index(vault, str(tmp_path / "index"))
+    search = create_search_tool_v2(vault, index_dir=str(tmp_path / "index"))
+    first = json.loads(search.invoke({"query": "sync", "max_results": 5}))
+    assert len(first["results"]) == 5 and first["next_cursor"]
+    paths = [r["path"] for r in first["results"]]
+    while "next_cursor" in first:
+        first = json.loads(search.invoke({"query": "sync", "max_results": 5, "cursor": first["next_cursor"]}))
+        paths += [r["path"] for r in first["results"]]
+    assert first["offset"] == 10 and len(paths) == len(set(paths)) == 12
+
+    expired = json.loads(search.invoke({"query": "sync", "cursor": "unknown"}))
+    assert expired["status"] == "error"
+
+
+def test_tool_pages_follow_the_ranking_under_a_token_budget(tmp_path):
+    vault = _vault(tmp_path / "vault")
+    index_dir = str(tmp_path / "index")
+    engine = ShardedSearch.for_vaults(vault, index_dir=index_dir)
+    ranking = [h.path.replace(".md", "") for h in engine.search("sync", max_results=12, mmr_lambda=None).hits]
+    search = create_search_tool_v2(vault, index_dir=index_dir)
+
+    page1 = json.loads(search.invoke({"query": "sync", "max_results": 5, "max_tokens": 150}))
+    assert 0 < len(page1["results"]) < 5  # the budget, not max_results, ends the page
+    page2 = json.loads(search.invoke({"query": "sync", "max_results": 5, "max_tokens": 150, "cursor": page1["next_cursor"]}))
+    assert page2["offset"] == len(page1["results"])
+    paths = [r["path"] for r in page1["results"] + page2["results"]]
+    assert paths == ranking[:len(paths)]
@@ -0,0 +1,56 @@
+import json
+import time
+
+from obsidian_assistant.obsidian_assistant import create_search_tool_v2
+from obsidian_assistant.vault_search import SearchDeadline, ShardedSearch, VaultIndex, VaultShard, bm25
+
+
+def _vault(root, n=6):
+    root.mkdir()
+    for i in range(n):
+        (root / f"Note {i}.md").write_text(f"# Note {i}\nSync details part {i}.", encoding="utf-8")
+    return str(root)
+
+
+def test_expired_deadline_returns_best_hits_of_covered_prefix(tmp_path, monkeypatch):
+    index = VaultIndex.open(_vault(tmp_path / "vault"), str(tmp_path / "index"))
+    monkeypatch.setattr(bm25, "SCORE_BLOCK", 2)
+    deadline = SearchDeadline(time.perf_counter() - 1)
+    hits = index.search("sync", max_results=10, deadline=deadline)
+    assert deadline.partial and deadline.coverage == 2 / len(index.chunks)
+    assert {h.chunk_id for h in hits} <= {0, 1} and hits
+
+    unlimited = SearchDeadline.after(None)
+    assert len(index.search("sync", max_results=10, deadline=unlimited)) == 6
+    assert not unlimited.partial and unlimited.coverage == 1.0
+
+
+class _ColdShard(VaultShard):
+    def index(self):
+        time.sleep(0.5)
+        return super().index()
+
+
+def test_cold_shard_returns_partial_within_deadline(tmp_path):
+    shard = _ColdShard("vault", _vault(tmp_path / "vault"), str(tmp_path / "index"))
+    engine = ShardedSearch([shard])
+    started = time.perf_counter()
+    found = engine.search("sync", deadline_ms=100)
+    assert time.perf_counter() - started < 0.4
+    assert found.partial and found.coverage == 0.0 and found.hits == []
+    assert found.timed_out == ["vault"]
+    engine.close()
+
+
+def test_search_tool_reports_partial_results(tmp_path):
+    vault = _vault(tmp_path / "vault")
+    engine = ShardedSearch.for_vaults(vault, index_dir=str(tmp_path / "index"))
+    search = create_search_tool_v2(vault, engine=engine)
+    payload = json.loads(search.invoke({"query": "sync", "deadline_ms": 1}))  # cold build is still running
+    assert payload["partial"] is True and payload["coverage"] == 0.0
+    waited = time.perf_counter() + 10
+    while not (engine.indexes()[0] and engine.indexes()[0].ready) and time.perf_counter() < waited:
+        time.sleep(0.01)  # wait for the tool's own background build
+    payload = json.loads(search.invoke({"query": "sync", "deadline_ms": 5000}))
+    assert "partial" not in payload and payload["count"] == 5
+    engine.close()
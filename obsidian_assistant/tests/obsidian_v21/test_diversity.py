@@ -0,0 +1,74 @@
+import json
+
+from obsidian_assistant.obsidian_assistant import create_search_tool_v2
+from obsidian_assistant.vault_search import ShardedSearch, SearchHit, VaultShard, diversify, get_vault_index, simhash
+from obsidian_assistant.vault_search.diversity import NEAR_DUPLICATE_BITS, hamming
+
+TEMPLATE = (
+    "Weekly sync notes for the plugin team. We reviewed the release checklist, "
+    "triaged the open issues about vault indexing and agreed to ship the sync fix on Friday. {extra}"
+)
+
+
+def _terms(text):
+    return text.lower().replace(",", "").replace(".", "").split()
+
+
+def test_simhash_separates_copies_from_different_text():
+    original = simhash(_terms(TEMPLATE.format(extra="Owner: Ann.")))
+    assert simhash(_terms(TEMPLATE.format(extra="Owner: Ann."))) == original
+    assert hamming(simhash(_terms(TEMPLATE.format(extra="Owner: Bob."))), original) <= NEAR_DUPLICATE_BITS
+    other = simhash(_terms("Grocery list: apples, bread, coffee beans, oat milk and two lemons for the cake."))
+    assert hamming(other, original) > NEAR_DUPLICATE_BITS
+    assert simhash([]) == 0
+
+
+def _hit(chunk_id, score, signature, path=None):
+    return SearchHit(0, chunk_id, path or f"n{chunk_id}.md", "", None, None, "", score=score, signature=signature)
+
+
+def test_mmr_drops_copies_and_prefers_new_information():
+    copy, near, fresh = 0b1111 << 40, (0b1111 << 40) | 1, 0xF0F0F0F0F0F0F0F0
+    related = copy ^ 0xFFFF  # 16 bits away: similar but not a copy
+    hits = [_hit(0, 10.0, copy), _hit(1, 9.5, near), _hit(2, 9.0, related), _hit(3, 8.0, fresh)]
+    picked, rest = diversify(hits, 2, lam=0.7)
+    assert [h.chunk_id for h in picked] == [0, 3] and [h.chunk_id for h in rest] == [2]
+    assert picked[0].copies == ["n1.md"]
+
+    plain, _ = diversify([_hit(0, 10.0, copy), _hit(2, 9.0, related), _hit(3, 8.0, fresh)], 2, lam=1.0)
+    assert [h.chunk_id for h in plain] == [0, 2]
+    again, _ = diversify([_hit(1, 9.5, near), _hit(3, 8.0, fresh)], 2, seen=[copy])
+    assert [h.chunk_id for h in again] == [3]
+
+
+def _vault(root, copies=3):
+    root.mkdir()
+    for i in range(copies):
+        (root / f"Daily {i}.md").write_text(f"# Daily {i}\n" + TEMPLATE.format(extra=""), encoding="utf-8")
+    (root / "Release.md").write_text("# Release\nThe sync fix ships on Friday after review.", encoding="utf-8")
+    return str(root)
+
+
+def test_sharded_search_collapses_copies_across_vaults(tmp_path):
+    engine = ShardedSearch([
+        VaultShard("a", _vault(tmp_path / "a"), str(tmp_path / "index-a")),
+        VaultShard("b", _vault(tmp_path / "b", copies=1), str(tmp_path / "index-b")),
+    ])
+    hits = engine.search("sync fix friday", max_results=5, deadline_ms=5000).hits
+    assert len(hits) == 2  # one daily note and one release note, the copies listed on them
+    daily = next(h for h in hits if h.title.startswith("Daily"))
+    release = next(h for h in hits if h.title == "Release")
+    assert len(daily.copies) == 3 and release.copies == ["Release.md"]
+    plain = engine.search("sync fix friday", max_results=5, deadline_ms=5000, mmr_lambda=None).hits
+    assert len(plain) == 5
+    engine.close()
+
+
+def test_search_tool_lists_copies(tmp_path):
+    vault = _vault(tmp_path / "vault")
+    get_vault_index(vault, str(tmp_path / "index"))
+    search = create_search_tool_v2(vault, index_dir=str(tmp_path / "index"))
+    payload = json.loads(search.invoke({"query": "sync fix friday", "max_results": 5}))
+    assert len(payload["results"]) == 2 and "next_cursor" not in payload
+    daily = next(r for r in payload["results"] if "copies" in r)
+    assert len(daily["copies"]) == 2
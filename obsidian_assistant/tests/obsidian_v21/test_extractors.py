@@ -0,0 +1,62 @@
+import json
+
+from obsidian_assistant.vault_search import VaultIndex, extractors
+from obsidian_assistant.vault_search.extractors import Extractor, extract_canvas, extract_csv, read_document
+
+CANVAS = {
+    "nodes": [
+        {"id": "g", "type": "group", "label": "Release plan", "x": 0, "y": 0, "width": 800, "height": 400},
+        {"id": "a", "type": "text", "text": "## Freeze\nCode freeze on Friday.", "x": 20, "y": 20},
+        {"id": "b", "type": "file", "file": "Notes/Checklist.md", "x": 400, "y": 20},
+        {"id": "c", "type": "link", "url": "https://example.com/changelog", "x": 20, "y": 600},
+    ],
+    "edges": [{"id": "e", "fromNode": "a", "toNode": "b", "label": "then"}],
+}
+
+
+def test_canvas_and_csv_extraction():
+    text = extract_canvas(json.dumps(CANVAS))
+    assert text.index("https://example.com/changelog") < text.index("# Release plan")  # loose cards first
+    assert "## Freeze\nCode freeze on Friday.\n→ Notes/Checklist.md (then)" in text
+    assert "[[Notes/Checklist]]" in text
+
+    assert extract_csv("name;owner\nsync;Ana\n;Bo\n") == "name | owner\nname: sync | owner: Ana\nowner: Bo\n"
+
+
+def test_binary_and_oversized_files_are_skipped(tmp_path, monkeypatch):
+    (tmp_path / "scan.txt").write_bytes(b"%PDF-1.7\n" + b"x" * 100)
+    (tmp_path / "utf16.txt").write_text("hello", encoding="utf-16")
+    (tmp_path / "bom.csv").write_bytes("\ufeffa,b\r\n1,2\r\n".encode("utf-8"))
+    assert read_document(tmp_path / "scan.txt") is None
+    assert read_document(tmp_path / "utf16.txt") is None  # NUL bytes
+    assert read_document(tmp_path / "bom.csv") == "a | b\na: 1 | b: 2\n"
+    assert read_document(tmp_path / "image.png") is None  # no extractor
+
+    monkeypatch.setitem(extractors.EXTRACTORS, ".txt", Extractor(lambda text: text, max_bytes=10))
+    (tmp_path / "big.txt").write_text("x" * 11, encoding="utf-8")
+    assert read_document(tmp_path / "big.txt") is None
+
+
+def test_canvas_and_attachments_feed_the_index(tmp_path):
+    vault = tmp_path / "vault"
+    (vault / "Notes").mkdir(parents=True)
+    (vault / "Notes" / "Checklist.md").write_text("# Checklist\nrun the tests, see [[Board.canvas]].", encoding="utf-8")
+    (vault / "Board.canvas").write_text(json.dumps(CANVAS), encoding="utf-8")
+    (vault / "owners.csv").write_text("component,owner\nsync engine,Ana\n", encoding="utf-8")
+    (vault / "blob.txt").write_bytes(b"\x89PNG\r\n\x1a\n freeze")
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    assert sorted(note.path for _, note in index.live_notes()) == ["Board.canvas", "Notes/Checklist.md", "owners.csv"]
+
+    hit = index.search("code freeze")[0]
+    assert (hit.path, hit.heading) == ("Board.canvas", "Freeze")
+    assert "Code freeze on Friday." in hit.snippet
+    assert index.search("sync engine owner")[0].path == "owners.csv"
+    board = index._path_ids["Board.canvas"]
+    checklist = index._path_ids["Notes/Checklist.md"]
+    assert index.link_graph().backlinks(checklist) == [board]
+    assert index.link_graph().backlinks(board) == [checklist]  # links to a canvas resolve like note links
+
+    (vault / "Board.canvas").write_text(json.dumps({"nodes": [{"id": "x", "type": "text", "text": "Launch"}]}))
+    report = index.update_paths([str(vault / "Board.canvas")])
+    assert report.modified == ["Board.canvas"]
+    assert index.search("launch")[0].path == "Board.canvas"
@@ -0,0 +1,88 @@
+import os
+import time
+
+from obsidian_assistant.vault_search import VaultIndex, VaultWatcher, get_vault_index
+
+
+def _touch(path, text):
+    path.write_text(text, encoding="utf-8")
+    st = path.stat()
+    os.utime(path, (st.st_atime, st.st_mtime + 5))
+
+
+def test_refresh_reindexes_only_changed_notes(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "keep.md").write_text("stable note", encoding="utf-8")
+    (vault / "edit.md").write_text("old wording", encoding="utf-8")
+    (vault / "gone.md").write_text("soon deleted", encoding="utf-8")
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+
+    _touch(vault / "edit.md", "new wording")
+    (vault / "gone.md").unlink()
+    (vault / "added.md").write_text("fresh note", encoding="utf-8")
+
+    report = index.refresh()
+    assert report.added == ["added.md"]
+    assert report.modified == ["edit.md"]
+    assert report.removed == ["gone.md"]
+    assert index.search("old") == []
+    assert [h.path for h in index.search("new wording")] == ["edit.md"]
+    assert "deleted" not in index.postings["body"]
+    assert not index.refresh().changed
+
+    index.save()
+    reopened = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    assert reopened.note_count == 3
+
+
+def test_update_paths_and_polling_watcher(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "a.md").write_text("alpha", encoding="utf-8")
+    index = get_vault_index(str(vault), str(tmp_path / "index"))
+
+    _touch(vault / "a.md", "beta")
+    report = index.update_paths([str(vault / "a.md")])
+    assert report.modified == ["a.md"]
+
+    watcher = VaultWatcher(str(vault), str(tmp_path / "index"), use_inotify=False, poll_interval=0.05)
+    watcher.start()
+    try:
+        (vault / "b.md").write_text("gamma", encoding="utf-8")
+        deadline = time.time() + 5
+        while time.time() < deadline and not index.search("gamma"):
+            time.sleep(0.05)
+        assert [h.path for h in index.search("gamma")] == ["b.md"]
+        assert watcher.stats()["backend"] == "polling"
+    finally:
+        watcher.stop()
+
+
+def test_watcher_survives_a_failed_update(tmp_path, monkeypatch):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "a.md").write_text("alpha", encoding="utf-8")
+    index = get_vault_index(str(vault), str(tmp_path / "index"))
+    refresh = index.refresh
+    calls = []
+
+    def flaky_refresh():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("transient failure")
+        return refresh()
+
+    monkeypatch.setattr(index, "refresh", flaky_refresh)
+    watcher = VaultWatcher(str(vault), str(tmp_path / "index"), use_inotify=False, poll_interval=0.05)
+    watcher.start()
+    try:
+        (vault / "b.md").write_text("gamma", encoding="utf-8")
+        deadline = time.time() + 5
+        while time.time() < deadline and not index.search("gamma"):
+            time.sleep(0.05)
+        assert [h.path for h in index.search("gamma")] == ["b.md"]
+        stats = watcher.stats()
+        assert stats["running"] and stats["last_error"] == "update_failed: transient failure"
+    finally:
+        watcher.stop()
@@ -0,0 +1,55 @@
+import json
+
+from obsidian_assistant.obsidian_assistant import create_search_tool_v2
+from obsidian_assistant.vault_search import VaultIndex
+
+
+def _vault(root):
+    (root / "Hub.md").write_text("Index of topics: [[Sync]], [[Plugins]], [[Missing note]], ![[diagram.png]]", encoding="utf-8")
+    (root / "Sync.md").write_text("Sync keeps vaults aligned. Related: [[Plugins]]", encoding="utf-8")
+    (root / "Plugins.md").write_text("Community plugins extend the app. Back to [[Hub]].", encoding="utf-8")
+    (root / "Lonely.md").write_text("Plugins are mentioned here without links.", encoding="utf-8")
+
+
+def test_graph_edges_backlinks_and_unresolved(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    _vault(vault)
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    graph = index.link_graph()
+    ids = {n.title: nid for nid, n in index.live_notes()}
+
+    assert graph.outgoing(ids["Hub"]) == [ids["Sync"], ids["Plugins"]]
+    assert graph.backlinks(ids["Plugins"]) == sorted([ids["Hub"], ids["Sync"]])
+    assert graph.unresolved == {"missing note": [ids["Hub"]]}
+    rank = graph.pagerank()
+    assert rank[ids["Plugins"]] > rank[ids["Lonely"]]
+
+    # an in-place edit only touches the overlay; an added note rebuilds the graph
+    (vault / "Sync.md").write_text("Sync keeps vaults aligned. See [[Lonely]].", encoding="utf-8")
+    index.update_paths([str(vault / "Sync.md")])
+    assert not index.graph.stale
+    assert index.link_graph().backlinks(ids["Lonely"]) == [ids["Sync"]]
+    assert index.link_graph().backlinks(ids["Plugins"]) == [ids["Hub"]]
+    (vault / "Missing note.md").write_text("now it exists", encoding="utf-8")
+    index.update_paths([str(vault / "Missing note.md")])
+    assert index.graph.stale and index.link_graph().unresolved == {}
+
+
+def test_pagerank_boost_and_expansion(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    _vault(vault)
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    hits = index.search("plugins")
+    assert hits[0].path == "Plugins.md"
+
+    expanded = index.search("vaults", expand_links=True)
+    assert expanded[0].path == "Sync.md"
+    assert expanded[0].related == ["Plugins.md", "Hub.md"]
+
+    search = create_search_tool_v2(str(vault), index_dir=str(tmp_path / "index"))
+    payload = json.loads(search.invoke({"query": "plugins", "max_results": 1, "expand_links": True}))
+    first, *rest = payload["results"]
+    assert first["path"] == "Plugins" and "[[Hub|Hub]]" in first["related"]
+    assert any(r.get("via") == "[[Plugins|Plugins]]" for r in rest)
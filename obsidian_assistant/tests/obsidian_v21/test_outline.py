@@ -0,0 +1,67 @@
+from obsidian_assistant.vault_search import VaultIndex, bm25
+from obsidian_assistant.vault_search import index as index_module
+from obsidian_assistant.vault_search.outline import OutlineIndex
+
+
+def _vault(root):
+    root.mkdir()
+    (root / "Sync.md").write_text("# Setup\nsync once.\n# Conflicts\nsync conflicts.", encoding="utf-8")
+    (root / "Guide.md").write_text("---\naliases: [Sync guide]\n---\n# Intro\nsync here too.", encoding="utf-8")
+    (root / "Plugins.md").write_text("# Sync plugins\nplugins that sync.", encoding="utf-8")
+    for i in range(3):
+        (root / f"Daily {i}.md").write_text(f"# Log\nsync sync sync, daily {i}.", encoding="utf-8")
+    return str(root)
+
+
+def test_outline_ranks_titles_and_aliases_above_headings(tmp_path):
+    index = VaultIndex.open(_vault(tmp_path / "vault"), str(tmp_path / "index"))
+    outline = index.outline()
+    ids = {note.title: nid for nid, note in index.live_notes()}
+    assert outline.candidates(["sync"], 10) == [ids["Guide"], ids["Sync"], ids["Plugins"]]
+    assert outline.candidates(["sync"], 1, notes={ids["Plugins"]}) == [ids["Plugins"]]
+
+    (tmp_path / "vault" / "Sync.md").unlink()
+    (tmp_path / "vault" / "Sync notes.md").write_text("# Todo\nnothing", encoding="utf-8")
+    index.refresh()
+    rebuilt = OutlineIndex.build(index.postings, [c.note_id if c else None for c in index.chunks])
+    assert outline.postings == rebuilt.postings  # maintained incrementally like a fresh build
+    assert ids["Sync"] not in outline.candidates(["sync"], 10)
+
+
+def test_two_phase_search_scores_only_outline_candidates(tmp_path, monkeypatch):
+    index = VaultIndex.open(_vault(tmp_path / "vault"), str(tmp_path / "index"))
+    full = {h.chunk_id: h.score for h in index.search("sync", max_results=10, per_note=5)}
+
+    scored = []
+    original = bm25.BM25FScorer.score
+
+    def spy(self, index, terms, candidates=None, *args, **kwargs):
+        scored.append(candidates)
+        return original(self, index, terms, candidates, *args, **kwargs)
+
+    monkeypatch.setattr(bm25.BM25FScorer, "score", spy)
+    monkeypatch.setattr(index_module, "OUTLINE_MIN_POSTINGS", 0)
+    monkeypatch.setattr(index_module, "OUTLINE_NOTES", 3)
+    monkeypatch.setattr(index_module, "OUTLINE_PAD_POSTINGS", 2)  # "sync" is a common term here
+    hits = index.search("sync", max_results=1, per_note=2)
+    assert {index.notes[h.note_id].title for h in hits} <= {"Guide", "Sync", "Plugins"}
+    assert scored[-1] is not None and len(scored[-1]) == 4  # sections of the three outline matches
+    assert all(abs(full[h.chunk_id] - h.score) < 1e-9 for h in hits)  # same scores as one phase
+
+    # the outline matches fewer notes than the requested sections: rank everything
+    hits = index.search("sync", max_results=10, per_note=5)
+    assert scored[-1] is None and {h.chunk_id: h.score for h in hits} == full
+
+
+def test_body_only_answers_survive_the_coarse_phase(tmp_path, monkeypatch):
+    vault = _vault(tmp_path / "vault")
+    (tmp_path / "vault" / "Merging.md").write_text("# Notes\nsync conflicts are resolved with mergetool.", encoding="utf-8")
+    index = VaultIndex.open(vault, str(tmp_path / "index"))
+    full = index.search("sync mergetool", max_results=3)
+    assert index.notes[full[0].note_id].title == "Merging"  # the answer is only in a body
+
+    monkeypatch.setattr(index_module, "OUTLINE_MIN_POSTINGS", 0)
+    monkeypatch.setattr(index_module, "OUTLINE_NOTES", 3)
+    monkeypatch.setattr(index_module, "OUTLINE_PAD_POSTINGS", 2)
+    two_phase = index.search("sync mergetool", max_results=1, per_note=1)
+    assert [(h.chunk_id, h.score) for h in two_phase] == [(full[0].chunk_id, full[0].score)]
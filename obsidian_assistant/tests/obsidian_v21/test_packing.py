@@ -0,0 +1,56 @@
+import json
+
+from obsidian_assistant.obsidian_assistant import create_search_tool_v2
+from obsidian_assistant.vault_search import SearchHit, pack_hits
+from obsidian_assistant.vault_search.packing import merge_hits, squeeze
+
+
+def _hit(note_id, chunk_id, start, text, score):
+    return SearchHit(note_id, chunk_id, f"n{note_id}.md", f"n{note_id}", None, None, text, score,
+                     tokens=len(text.split()), start=start, end=start + len(text))
+
+
+def test_touching_passages_of_one_note_are_merged():
+    text = "# A\nalpha beta\n\n# B\ngamma delta"
+    a = _hit(0, 0, 0, text[:14], 1.0)
+    b = _hit(0, 1, 16, text[16:], 2.0)
+    other = _hit(1, 2, 0, "unrelated", 1.5)
+    merged = merge_hits([b, other, a])
+    assert [h.chunk_id for h in merged] == [1, 2]
+    assert merged[0].snippet == text and merged[0].score == 2.0
+
+
+def test_budget_prefers_score_per_token_and_truncates_when_nothing_fits():
+    long = _hit(0, 0, 0, "word " * 200, 3.0)
+    short = _hit(1, 1, 0, "precise answer here", 2.0)
+    packed = pack_hits([long, short], max_tokens=100, overhead=10)
+    assert [h.chunk_id for h in packed.hits] == [1]
+    assert packed.dropped == 1 and packed.tokens <= 100
+
+    only = pack_hits([long], max_tokens=60, overhead=10)
+    assert only.hits[0].snippet.endswith("…") and only.hits[0].tokens <= 50
+    assert squeeze("a  \n\n\n\nb\n") == "a\n\nb"
+
+
+def test_best_hit_is_kept_whenever_it_fits():
+    long = _hit(0, 0, 0, " ".join(["word"] * 40), 3.0)
+    shorts = [_hit(i, i, 0, "tiny hit text", 1.0) for i in range(1, 5)]
+    packed = pack_hits([*shorts, long], max_tokens=100, max_results=2, overhead=10)
+    assert [h.chunk_id for h in packed.hits] == [0, 1]  # short hits only fill what is left
+    assert packed.tokens == (40 + 10) + (3 + 10)
+
+
+def test_tool_budget_and_compact_mode(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    for i in range(6):
+        (vault / f"note{i}.md").write_text(f"# Topic {i}\nsync settings " + f"filler{i} words " * (40 * i), encoding="utf-8")
+    search = create_search_tool_v2(str(vault), index_dir=str(tmp_path / "index"))
+
+    full = json.loads(search.invoke({"query": "sync", "max_results": 6, "max_tokens": 300}))
+    assert full["tokens"] <= 300 and full["omitted"] > 0
+
+    raw = search.invoke({"query": "sync", "compact": True})
+    assert "\n  " not in raw
+    compact = json.loads(raw)
+    assert set(compact["results"][0]) == {"note_link", "snippet"}
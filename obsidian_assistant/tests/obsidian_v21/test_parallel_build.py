@@ -0,0 +1,31 @@
+from obsidian_assistant.vault_search import VaultIndex
+
+
+def test_parallel_build_matches_serial(tmp_path):
+    vault = tmp_path / "vault"
+    (vault / "sub").mkdir(parents=True)
+    for i in range(12):
+        folder = vault / "sub" if i % 2 else vault
+        (folder / f"note{i:02d}.md").write_text(f"# Topic {i}\nshared words 共享 笔记 item{i}", encoding="utf-8")
+
+    serial = VaultIndex(str(vault), str(tmp_path / "serial"))
+    serial.build(workers=1)
+    parallel = VaultIndex(str(vault), str(tmp_path / "parallel"))
+    parallel.build(workers=2)
+
+    assert parallel.progress.done == parallel.progress.total == 12
+    assert [n.path for _, n in parallel.live_notes()] == [n.path for _, n in serial.live_notes()]
+    for field in ("title", "headings", "body"):
+        assert {t: dict(p) for t, p in parallel.postings[field].items()} == serial.postings[field]
+    assert [h.path for h in parallel.search("item7 共享")] == [h.path for h in serial.search("item7 共享")]
+
+
+def test_warm_reports_ready(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "a.md").write_text("alpha", encoding="utf-8")
+    index = VaultIndex(str(vault), str(tmp_path / "index"))
+    assert index.progress.state == "idle"
+    index.warm()
+    status = index.stats()["progress"]
+    assert status["state"] == "ready" and status["percent"] == 100.0
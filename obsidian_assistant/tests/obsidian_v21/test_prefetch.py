@@ -0,0 +1,74 @@
+import json
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from obsidian_assistant import obsidian_assistant as oa
+
+
+class RecordingAgent:
+    def __init__(self):
+        self.states = []
+
+    def invoke(self, state):
+        self.states.append(state)
+        return {"messages": [*state["messages"], ("assistant", "See [[Tags|Tags]].")]}
+
+
+def _fake_model(tmp_path, monkeypatch):
+    agent = RecordingAgent()
+    monkeypatch.setenv("DASHSCOPE_API_KEY", "test")
+    monkeypatch.setenv("TAVILY_API_KEY", "test")
+    monkeypatch.setenv("OBSIDIAN_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(oa, "ChatTongyi", lambda model: None)
+    monkeypatch.setattr(oa, "create_internet_search_tool_v2", lambda: None)
+    monkeypatch.setattr(oa, "create_web_search_agent_v2", lambda tool: None)
+    monkeypatch.setattr(oa, "create_deep_agent", lambda **kw: agent)
+    return agent
+
+
+def _assistant(tmp_path, monkeypatch, **kwargs):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "Tags.md").write_text("# Tags\nTags organize notes; open the tag pane to browse them.", encoding="utf-8")
+    agent = _fake_model(tmp_path, monkeypatch)
+    assistant = oa.create_obsidian_assistant_v2(
+        docs_path=str(vault), enable_model_adapter=False, **kwargs
+    )
+    return assistant, agent
+
+
+def test_prefetch_injects_a_completed_search_call(tmp_path, monkeypatch):
+    assistant, agent = _assistant(tmp_path, monkeypatch, enable_prefetch=True, enable_smart_routing=True)
+    result = assistant.invoke({"messages": [("user", "tag pane")]})
+    assert result["prefetched"] and result["route_strategy"] == "local_only"
+
+    *_, user, call, tool_result = agent.states[-1]["messages"]
+    assert user == ("user", "tag pane")
+    assert isinstance(call, AIMessage) and call.tool_calls[0]["name"] == "search_obsidian_docs_v2"
+    assert call.tool_calls[0]["args"] == {"query": "tag pane"}
+    assert isinstance(tool_result, ToolMessage) and tool_result.tool_call_id == call.tool_calls[0]["id"]
+    assert json.loads(tool_result.content)["results"][0]["path"] == "Tags"
+
+    # time-sensitive questions (web_first) and explicit opt-out are left to the model
+    assert not assistant.invoke({"messages": [("user", "recent tag trend")]})["prefetched"]
+    assert not assistant.invoke({"messages": [("user", "tag pane")]}, prefetch=False)["prefetched"]
+    assert len(agent.states[-1]["messages"]) == 2  # routing note + user message only
+
+
+def test_prefetch_is_off_by_default(tmp_path, monkeypatch):
+    assistant, agent = _assistant(tmp_path, monkeypatch)
+    assert not assistant.invoke({"messages": [("user", "tag pane")]})["prefetched"]
+    assert agent.states[-1]["messages"] == [("user", "tag pane")]
+    assert assistant.invoke({"messages": [("user", "tag pane")]}, prefetch=True)["prefetched"]
+
+
+def test_vaults_from_the_environment_need_no_docs_path(tmp_path, monkeypatch):
+    for name in ("personal", "team"):
+        (tmp_path / name).mkdir()
+    (tmp_path / "team" / "Release.md").write_text("# Release\nrelease checklist", encoding="utf-8")
+    monkeypatch.setenv("OBSIDIAN_VAULTS", f"personal={tmp_path / 'personal'}:team={tmp_path / 'team'}")
+    _fake_model(tmp_path, monkeypatch)
+    assistant = oa.create_obsidian_assistant_v2(
+        docs_path=str(tmp_path / "missing"), enable_model_adapter=False, enable_smart_routing=True
+    )
+    assert assistant.invoke({"messages": [("user", "release checklist")]})["route_strategy"] == "local_only"
@@ -0,0 +1,46 @@
+from obsidian_assistant.vault_search import VaultIndex, parse_query
+from obsidian_assistant.vault_search.metadata import extract_metadata
+
+
+def _vault(root):
+    (root / "Work").mkdir()
+    (root / "Work" / "plan.md").write_text(
+        "---\ntags: [project/alpha, planning]\naliases:\n  - Roadmap 2024\n---\n"
+        "# Goals\nShip the sync engine. See [[Notes/Sync#Setup|sync]].\n",
+        encoding="utf-8",
+    )
+    (root / "Work" / "draft.md").write_text("#project draft of the sync engine rewrite", encoding="utf-8")
+    (root / "home.md").write_text("#project garden sync engine ideas", encoding="utf-8")
+
+
+def test_parse_query_clauses():
+    parsed = parse_query('tag:project path:Work/ "exact phrase" -draft -tag:old http://x.io')
+    assert parsed.filters == {"tag": ["project"], "path": ["Work/"]}
+    assert parsed.negated == {"tag": ["old"]}
+    assert parsed.phrases == ["exact phrase"] and parsed.excluded == ["draft"]
+    assert parsed.terms == ["http://x.io"]
+
+
+def test_extract_metadata():
+    meta = extract_metadata("---\ntags: a, b\nalias: My Note\n---\nText #c/d `#code` ![[img.png]] [[X/Y.md#h|y]]")
+    assert meta.tags == ["a", "b", "c/d"]
+    assert meta.aliases == ["My Note"]
+    assert meta.links == ["img.png", "x/y"]
+
+
+def test_fielded_filters(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    _vault(vault)
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+
+    paths = lambda q: sorted(h.path for h in index.search(q))
+    assert paths("sync engine") == ["Work/draft.md", "Work/plan.md", "home.md"]
+    assert paths("tag:project sync") == ["Work/draft.md", "Work/plan.md", "home.md"]
+    assert paths("tag:project path:Work/ sync -draft") == ["Work/plan.md"]
+    assert paths("-tag:planning sync engine") == ["Work/draft.md", "home.md"]
+    assert paths('"engine rewrite"') == ["Work/draft.md"]
+    assert paths("link:Sync") == ["Work/plan.md"]
+    assert paths("roadmap") == ["Work/plan.md"]  # aliases are searchable as title
+    hit = index.search("tag:planning")[0]
+    assert hit.heading == "Goals" and "tags:" not in hit.snippet
@@ -0,0 +1,57 @@
+from fastapi.testclient import TestClient
+
+from obsidian_assistant import api_server
+from obsidian_assistant import obsidian_assistant as oa
+from obsidian_assistant.vault_search import ShardedSearch
+
+
+def _vault(root):
+    (root / "Links").mkdir(parents=True)
+    (root / "Links" / "Internal links.md").write_text(
+        "# Internal links\n## Wikilinks\nUse double brackets to link notes, e.g. [[My note]].", encoding="utf-8"
+    )
+    (root / "Tags.md").write_text("# Tags\nTags organize notes; link tags from the tag pane.", encoding="utf-8")
+    return root
+
+
+def test_retrieve_sources_ranks_sections_with_scores(tmp_path):
+    engine = ShardedSearch.for_vaults(str(_vault(tmp_path / "vault")), index_dir=str(tmp_path / "index"))
+    result = oa.retrieve_sources(engine, "link notes brackets", max_results=5)
+    sources = result["sources"]
+    assert [s["path"] for s in sources] == ["Links/Internal links", "Tags"]
+    top = sources[0]
+    assert (top["heading"], top["relevance"]) == ("Wikilinks", 1.0)
+    assert top["note_link"] == "[[Links/Internal links#Wikilinks|Internal links > Wikilinks]]"
+    assert "double brackets" in top["snippet"]
+    assert top["score"] > sources[1]["score"] > 0 and 0 < sources[1]["relevance"] < 1
+    assert result["mode"] == "lexical" and not result["partial"]
+
+
+def test_retrieval_only_invoke_skips_the_model(tmp_path, monkeypatch):
+    class Agent:
+        def invoke(self, state):
+            raise AssertionError("the model must not be called")
+
+    monkeypatch.setenv("DASHSCOPE_API_KEY", "test")
+    monkeypatch.setenv("TAVILY_API_KEY", "test")
+    monkeypatch.setattr(oa, "ChatTongyi", lambda model: None)
+    monkeypatch.setattr(oa, "create_internet_search_tool_v2", lambda: None)
+    monkeypatch.setattr(oa, "create_web_search_agent_v2", lambda tool: None)
+    monkeypatch.setattr(oa, "create_deep_agent", lambda **kwargs: Agent())
+    vault = _vault(tmp_path / "vault")
+    assistant = oa.create_obsidian_assistant_v2(docs_path=str(vault), index_dir=str(tmp_path / "index"), enable_cache=True)
+
+    result = assistant.invoke({"messages": [("user", "tag pane")]}, retrieval_only=True)
+    assert result["answer"] == "" and result["token_usage"]["total_tokens"] == 0
+    assert [s["path"] for s in result["sources"]] == ["Tags"]
+    assert result["retrieval"]["elapsed_ms"] >= 0
+
+    monkeypatch.setattr(api_server, "search_engine", assistant.search_engine)
+    response = TestClient(api_server.app).post("/search", json={"query": "double brackets", "max_results": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["sources"][0]["path"] == "Links/Internal links"
+    assert body["sources"][0]["relevance"] == 1.0 and body["sources"][0]["snippet"]
+    assert TestClient(api_server.app).post("/search", json={"query": " "}).status_code == 400
+    for max_results in (0, api_server.SEARCH_MAX_RESULTS + 1):
+        assert TestClient(api_server.app).post("/search", json={"query": "tags", "max_results": max_results}).status_code == 422
@@ -1,5 +1,7 @@
 import pytest
-from obsidian_assistant.smart_router import SmartRouter
+from obsidian_assistant.smart_router import SmartRouter, create_smart_router
+from obsidian_assistant.vault_search import VaultShard
+from obsidian_assistant.vault_search.snapshot import ROUTER_VOCAB_FILENAME
 
 # 使用临时目录构建一个最小 markdown 索引
 
@@ -20,3 +22,14 @@ def test_router_basic_decisions(tmp_path):
     decision = router.route("飞行汽车量子笔记结构")
     assert decision in {"web_first", "hybrid"}
 
+
+
+def test_router_vocabulary_covers_every_shard(tmp_path):
+    for name, text in (("personal", "garden journal"), ("team", "release checklist")):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "note.md").write_text(text, encoding="utf-8")
+    shards = [VaultShard(n, str(tmp_path / n), str(tmp_path / "index" / n)) for n in ("personal", "team")]
+    router = create_smart_router(str(tmp_path / "missing"), shards=shards)
+    assert router.route("garden journal") == "local_only"
+    assert router.route("release checklist") == "local_only"
+    assert (tmp_path / "index" / "team" / ROUTER_VOCAB_FILENAME).exists()
@@ -0,0 +1,76 @@
+import json
+
+from obsidian_assistant.obsidian_assistant import create_search_tool_v2
+from obsidian_assistant.vault_search import VaultIndex, split_sections
+
+NOTE = """intro text
+
+# Sync
+Overview of sync.
+
+## Setup
+Enable end-to-end encryption in settings.
+
+```
+# not a heading
+```
+
+## Conflicts
+Merge conflicts are resolved per file.
+- Keep the newer version ^keep-newer
+
+# Publish
+Publishing is separate.
+"""
+
+
+def test_split_sections_follows_heading_hierarchy():
+    sections = split_sections(NOTE)
+    assert [s.heading for s in sections] == [None, "Sync", "Setup", "Conflicts", "Publish"]
+    assert sections[2].heading_path == ["Sync", "Setup"]
+    assert sections[4].heading_path == ["Publish"]
+    assert "# not a heading" in NOTE[sections[2].start:sections[2].end]
+    (block_id, start, end), = sections[3].blocks
+    assert block_id == "keep-newer" and NOTE[start:end].startswith("- Keep the newer")
+
+
+def test_long_sections_are_split_at_blank_lines():
+    text = "# Big\n" + "\n\n".join(f"paragraph {i} " * 20 for i in range(30))
+    sections = split_sections(text, max_chars=1000)
+    assert len(sections) > 1
+    assert all(s.heading == "Big" and s.end - s.start <= 1000 for s in sections)
+    assert sections[-1].end == len(text)
+
+
+def test_search_returns_sections_with_links(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "Sync.md").write_text(NOTE, encoding="utf-8")
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    assert index.stats()["sections"] == 5
+
+    hit = index.search("encryption")[0]
+    assert hit.heading == "Setup" and hit.anchor == "Setup"
+    assert hit.snippet.startswith("## Setup") and "Publishing" not in hit.snippet
+    assert hit.tokens > 0
+
+    assert index.search("newer version")[0].anchor == "^keep-newer"
+
+    search = create_search_tool_v2(str(vault), index_dir=str(tmp_path / "index"))
+    result = json.loads(search.invoke({"query": "encryption"}))["results"][0]
+    assert result["note_link"] == "[[Sync#Setup|Sync > Setup]]"
+    assert result["tokens"] == hit.tokens
+
+
+def test_edits_reuse_chunk_slots(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    note = vault / "Sync.md"
+    note.write_text(NOTE, encoding="utf-8")
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    size = len(index.chunks)
+    note.write_text(NOTE.replace("separate", "optional"), encoding="utf-8")
+    index.update_paths([str(note)])
+    assert len(index.chunks) == size
+    assert index.search("optional")[0].heading == "Publish"
+    assert index.search("separate") == []
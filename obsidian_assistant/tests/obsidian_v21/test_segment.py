@@ -0,0 +1,106 @@
+from obsidian_assistant.vault_search import INDEX_FORMAT_VERSION, VaultIndex
+from obsidian_assistant.vault_search.segment import (
+    ChunkRecords,
+    FieldPostings,
+    SegmentReader,
+    decode_postings,
+    encode_postings,
+    replacing,
+)
+
+
+def _vault(root):
+    (root / "Sync.md").write_text("# Sync\nSync keeps vaults aligned.\n# 设置\n同步 设置 sync", encoding="utf-8")
+    (root / "Plugins.md").write_text("Community plugins extend the app. Sync plugins too.", encoding="utf-8")
+
+
+def _dump(index):
+    return {f: {t: dict(p) for t, p in index.postings[f].items()} for f in index.postings}
+
+
+def test_varint_postings_roundtrip():
+    plist = {3: [0, 5, 300], 200: [1], 70000: [2, 129, 20000]}
+    encoded = encode_postings(plist)
+    assert decode_postings(encoded) == plist
+    assert len(encoded) == 20
+
+
+def test_mapped_index_matches_fresh_build_after_updates(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    _vault(vault)
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    assert isinstance(index.postings["body"], FieldPostings)
+    assert index.postings["body"].delta == {}
+    old_reader = index._reader
+
+    (vault / "Sync.md").write_text("# Sync\nSync now uses end to end encryption.", encoding="utf-8")
+    (vault / "Canvas.md").write_text("Canvas boards.", encoding="utf-8")
+    index.refresh()
+    assert [h.path for h in index.search("encryption")] == ["Sync.md"]
+    assert "aligned" not in index.postings["body"]
+    index.save()  # atomic swap; the old mapping stays readable
+    assert old_reader.vocab.find("aligned") is not None
+    assert index.postings["body"].delta == {}
+
+    fresh = VaultIndex(str(vault), str(tmp_path / "fresh"))
+    fresh.build()
+    reloaded = VaultIndex(str(vault), str(tmp_path / "index"))
+    assert reloaded.load()
+    ids = {n.path: nid for nid, n in reloaded.live_notes()}
+    fresh_ids = {n.path: nid for nid, n in fresh.live_notes()}
+    assert reloaded.search("encryption")[0].path == "Sync.md"
+    assert len(reloaded.postings["body"]) == len(fresh.postings["body"])
+    for path in ids:
+        terms = {t for c in reloaded.notes[ids[path]].chunks for t in reloaded.chunk_terms[c]}
+        assert terms == {t for c in fresh.notes[fresh_ids[path]].chunks for t in fresh.chunk_terms[c]}
+
+
+def test_section_records_are_decoded_on_access(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    _vault(vault)
+    VaultIndex.open(str(vault), str(tmp_path / "index"))
+    index = VaultIndex(str(vault), str(tmp_path / "index"))
+    assert index.load()
+    assert isinstance(index.chunks, ChunkRecords) and index.chunks._decoded == {}
+    assert index.search("plugins")[0].path == "Plugins.md"
+    assert index.chunks._decoded  # only the sections the search touched
+
+    (vault / "Canvas.md").write_text("Canvas boards.", encoding="utf-8")
+    index.refresh()
+    untouched = [cid for cid in range(len(index.chunks)) if index.chunks.raw(cid) is not None]
+    before = {cid: bytes(index.chunks.raw(cid)) for cid in untouched}
+    index.save()  # untouched records are copied as raw bytes
+    assert {cid: bytes(index.chunks.raw(cid)) for cid in untouched} == before
+    assert [h.path for h in index.search("canvas")] == ["Canvas.md"]
+    assert index.chunks.free_ids() == [cid for cid, c in enumerate(index.chunks) if c is None]
+
+
+def test_corrupt_index_file_triggers_rebuild(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    _vault(vault)
+    index_dir = tmp_path / "index"
+    VaultIndex.open(str(vault), str(index_dir))
+    assert SegmentReader(index_dir / "vault_index.bin").meta["version"] == INDEX_FORMAT_VERSION
+    (index_dir / "vault_index.bin").write_bytes(b"not an index")
+    assert not VaultIndex(str(vault), str(index_dir)).load()
+    assert VaultIndex.open(str(vault), str(index_dir)).search("plugins")
+
+
+def test_concurrent_writers_use_their_own_temporary_files(tmp_path):
+    target = tmp_path / "vault_index.bin"
+    with replacing(target) as first, replacing(target) as second:
+        assert first != second and first.parent == second.parent == tmp_path
+        first.write_bytes(b"first")
+        second.write_bytes(b"second")
+    assert target.read_bytes() == b"first"  # each swap publishes one complete file
+
+    try:
+        with replacing(target) as failed:
+            failed.write_bytes(b"partial")
+            raise OSError("disk full")
+    except OSError:
+        pass
+    assert target.read_bytes() == b"first" and sorted(p.name for p in tmp_path.iterdir()) == ["vault_index.bin"]
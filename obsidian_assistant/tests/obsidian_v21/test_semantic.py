@@ -0,0 +1,60 @@
+import pytest
+
+from obsidian_assistant.vault_search import VaultIndex
+
+np = pytest.importorskip("numpy")
+
+
+def _vault(root):
+    notes = {
+        "Sync.md": "Sync keeps the vault on every device with end to end encryption.",
+        "Backup.md": "Sync the vault to a remote device as a backup.",
+        "Canvas.md": "Canvas boards hold cards, shapes and colored arrows.",
+        "Whiteboard.md": "Draw shapes and arrows on a canvas board.",
+    }
+    for name, text in notes.items():
+        (root / name).write_text(text, encoding="utf-8")
+
+
+def test_semantic_mode_finds_related_sections(tmp_path, monkeypatch):
+    monkeypatch.setenv("OBSIDIAN_SEMANTIC_DIMS", "2")
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    _vault(vault)
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+
+    assert [h.path for h in index.search("encryption")] == ["Sync.md"]
+    semantic = [h.path for h in index.search("encryption", mode="semantic")]
+    assert set(semantic[:2]) == {"Sync.md", "Backup.md"}
+    hybrid = [h.path for h in index.search("encryption", mode="hybrid")]
+    assert hybrid[0] == "Sync.md" and "Backup.md" in hybrid
+    assert index.search("encryption tag:missing", mode="semantic") == []
+
+    sem = index.semantic()
+    assert sem.vectors.dtype == np.int8 and isinstance(sem.vectors, np.memmap)
+    assert (tmp_path / "index" / "semantic" / "meta.json").exists()
+    assert isinstance(sem.signatures, np.memmap) and sem.signatures.shape == (sem.rows, 4)
+    assert "signatures" not in (tmp_path / "index" / "semantic" / "meta.json").read_text(encoding="utf-8")
+    sem.sync(index)  # stored signatures match the unchanged sections: nothing is folded in
+    assert not sem._extra and not sem._masked
+
+
+def test_semantic_vectors_follow_edits(tmp_path, monkeypatch):
+    monkeypatch.setenv("OBSIDIAN_SEMANTIC_DIMS", "0")
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    _vault(vault)
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    assert index.search("arrows", mode="semantic")[0].path in {"Canvas.md", "Whiteboard.md"}
+
+    (vault / "Backup.md").write_text("Arrows everywhere: arrows and more arrows.", encoding="utf-8")
+    index.update_paths([str(vault / "Backup.md")])
+    assert index.search("arrows", mode="semantic")[0].path == "Backup.md"
+    (vault / "Backup.md").unlink()
+    index.update_paths([str(vault / "Backup.md")])
+    assert "Backup.md" not in [h.path for h in index.search("arrows", mode="semantic")]
+
+    # a reopened index reuses the stored vectors
+    reopened = VaultIndex(str(vault), str(tmp_path / "index"))
+    reopened.warm()
+    assert reopened.semantic().load(reopened.pipeline.signature())
@@ -0,0 +1,70 @@
+import json
+import time
+
+import pytest
+
+from obsidian_assistant.obsidian_assistant import create_search_tool_v2
+from obsidian_assistant.vault_search import ShardedSearch, VaultIndex, VaultShard, parse_vaults
+
+PERSONAL = {
+    "Sync.md": "# Sync\nSync keeps vaults aligned across devices.",
+    "Journal.md": "# Journal\nDaily notes about sync conflicts and sync logs.",
+}
+TEAM = {
+    "Plugins.md": "# Plugins\nCommunity plugins extend the app.",
+    "Sync setup.md": "# Setup\nTeam sync uses a shared remote.",
+}
+
+
+def _write(root, notes):
+    root.mkdir()
+    for name, text in notes.items():
+        (root / name).write_text(text, encoding="utf-8")
+    return str(root)
+
+
+def test_sharded_scores_match_a_single_index(tmp_path):
+    personal = _write(tmp_path / "personal", PERSONAL)
+    team = _write(tmp_path / "team", TEAM)
+    combined = VaultIndex.open(_write(tmp_path / "all", {**PERSONAL, **TEAM}), str(tmp_path / "idx-all"))
+    engine = ShardedSearch.for_vaults("", str(tmp_path / "idx"), vaults={"personal": personal, "team": team})
+
+    found = engine.search("sync remote", max_results=4)
+    expected = combined.search("sync remote", max_results=4)
+    assert sorted(found.searched) == ["personal", "team"] and not found.timed_out
+    assert [(h.path, round(h.score, 6)) for h in found.hits] == [(h.path, round(h.score, 6)) for h in expected]
+    assert {h.shard for h in found.hits} == {"personal", "team"}
+    engine.close()
+
+
+class _SlowShard(VaultShard):
+    def index(self):
+        time.sleep(1.0)
+        return super().index()
+
+
+def test_slow_shard_misses_its_deadline(tmp_path):
+    personal = _write(tmp_path / "personal", PERSONAL)
+    team = _write(tmp_path / "team", TEAM)
+    fast = VaultShard("personal", personal, str(tmp_path / "p"))
+    fast.index()  # warmed; the slow shard behaves like a cold build
+    engine = ShardedSearch([fast, _SlowShard("team", team, str(tmp_path / "t"))], shard_timeout_ms=400)
+    found = engine.search("sync")
+    assert found.searched == ["personal"] and found.timed_out == ["team"]
+    assert {h.path for h in found.hits} == {"Sync.md", "Journal.md"}
+    assert engine.search("sync").busy == ["team"]  # the late task is still running
+    engine.close()
+
+
+def test_search_tool_labels_vaults(tmp_path, monkeypatch):
+    personal = _write(tmp_path / "personal", PERSONAL)
+    team = _write(tmp_path / "team", TEAM)
+    monkeypatch.setenv("OBSIDIAN_VAULTS", f"{personal}:work={team}:{tmp_path / 'missing'}")
+    assert [s.name for s in parse_vaults(f"{personal}:work={team}")] == ["personal", "work"]
+
+    search = create_search_tool_v2("unused", index_dir=str(tmp_path / "idx"))
+    payload = json.loads(search.invoke({"query": "plugins"}))
+    assert payload["results"][0]["vault"] == "work"
+    assert payload["skipped_vaults"] == ["missing"]
+    with pytest.raises(ValueError):
+        ShardedSearch([VaultShard("a", personal), VaultShard("a", team)])
@@ -0,0 +1,98 @@
+import shutil
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from obsidian_assistant.smart_router import SmartRouter
+from obsidian_assistant.vault_search import (
+    ContentCache,
+    SnapshotError,
+    VaultIndex,
+    content,
+    documents,
+    export_snapshot,
+    get_vault_index,
+    import_snapshot,
+    read_manifest,
+)
+from obsidian_assistant.vault_search.snapshot import ROUTER_VOCAB_FILENAME
+
+
+def _vault(root):
+    root.mkdir()
+    (root / "Sync.md").write_text("# Setup\nsync the vault daily.", encoding="utf-8")
+    (root / "Plugins.md").write_text("# Plugins\nplugin list.", encoding="utf-8")
+    (root / "Tags.md").write_text("# Tags\n#project tags.", encoding="utf-8")
+    return root
+
+
+def _count_reads(monkeypatch):
+    reads = []
+    for module in (content, documents):
+
+        def spy(path, original=module.read_document):
+            reads.append(Path(path).name)
+            return original(path)
+
+        monkeypatch.setattr(module, "read_document", spy)
+    return reads
+
+
+def test_snapshot_restores_index_and_router_and_reconciles_changes(tmp_path, monkeypatch):
+    vault = _vault(tmp_path / "vault")
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+    router = SmartRouter(str(vault), vocabulary_path=str(tmp_path / "index" / ROUTER_VOCAB_FILENAME))
+    router.ensure_index()
+    manifest = export_snapshot(index, tmp_path / "vault.snapshot.tar.gz")
+    assert set(manifest["files"]) == {"vault_index.bin", ROUTER_VOCAB_FILENAME}
+    assert read_manifest(tmp_path / "vault.snapshot.tar.gz")["notes"] == manifest["notes"]
+
+    # a new machine: the vault is copied (mtimes kept) to another path, one note changes
+    moved = tmp_path / "moved"
+    shutil.copytree(vault, moved)
+    (moved / "Plugins.md").write_text("# Plugins\nplugin list, now with calendar.", encoding="utf-8")
+    import_snapshot(tmp_path / "vault.snapshot.tar.gz", str(moved), str(tmp_path / "restored"))
+
+    reads = _count_reads(monkeypatch)
+    restored = VaultIndex.open(str(moved), str(tmp_path / "restored"))
+    assert reads == ["Plugins.md"]  # only the note changed since the snapshot is re-read
+    assert [h.title for h in restored.search("calendar")] == ["Plugins"]
+    assert all(note.inode for _, note in restored.live_notes())  # inodes adopted from this file system
+    assert not restored.dirty
+
+    restored_router = SmartRouter(
+        str(moved), vocabulary_path=str(tmp_path / "restored" / ROUTER_VOCAB_FILENAME), content_cache=ContentCache()
+    )
+    reads.clear()
+    restored_router.ensure_index()
+    assert reads == ["Plugins.md"]
+    assert restored_router.route("calendar plugin") == "local_only"
+
+
+def test_corrupt_or_mismatched_snapshot_leaves_index_untouched(tmp_path):
+    vault = _vault(tmp_path / "vault")
+    index = get_vault_index(str(vault), str(tmp_path / "index"))
+    snapshot = tmp_path / "vault.snapshot.tar"
+    export_snapshot(index, snapshot)
+
+    target = tmp_path / "target"
+    target.mkdir()
+    (target / "vault_index.bin").write_bytes(b"existing")
+    with tarfile.open(snapshot) as tar:
+        offset = tar.getmember("vault_index.bin").offset_data
+    data = bytearray(snapshot.read_bytes())
+    data[offset + 100] ^= 0xFF  # inside the index file payload
+    (tmp_path / "bad.tar").write_bytes(bytes(data))
+    with pytest.raises(SnapshotError):
+        import_snapshot(tmp_path / "bad.tar", str(vault), str(target))
+    assert (target / "vault_index.bin").read_bytes() == b"existing"
+    assert not (tmp_path / "target.import").exists()
+
+    with tarfile.open(tmp_path / "evil.tar", "w") as tar:
+        tar.add(str(snapshot), arcname="manifest.json")
+    with pytest.raises(SnapshotError):
+        import_snapshot(tmp_path / "evil.tar", str(vault), str(target))
+
+    with pytest.raises(SnapshotError):  # the index of this vault is open
+        import_snapshot(snapshot, str(vault), str(tmp_path / "index"))
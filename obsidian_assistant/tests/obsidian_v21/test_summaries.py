@@ -0,0 +1,66 @@
+import json
+
+from obsidian_assistant.obsidian_assistant import create_search_tool_v2
+from obsidian_assistant.vault_search import TextPipeline, VaultIndex, get_vault_index, summarize_note
+from obsidian_assistant.vault_search.summaries import clean_sentence
+
+SYNC_NOTE = """# Sync
+Obsidian Sync keeps your vault identical on every device. See [[Sync settings|the settings]].
+The weather was nice today.
+- Sync uses **end-to-end encryption** for your vault.
+
+```
+sync --all --vault notes
+```
+
+# Version history
+Sync keeps the version history of every note for one year.
+"""
+
+
+def _summaries(text):
+    pipeline = TextPipeline()
+    return summarize_note([(text, pipeline.tokens(text))])
+
+
+def test_summary_picks_central_sentences_without_markup():
+    (section,), note = _summaries(SYNC_NOTE)
+    assert "weather" not in note and "--all" not in note and "# " not in note
+    assert "Sync uses end-to-end encryption for your vault." in note and "**" not in note
+    assert note.startswith("Obsidian Sync keeps your vault identical")
+    assert section == note or len(section) <= len(note)
+    assert _summaries("# Only a heading\n") == ([""], "")
+    assert clean_sentence("- [ ] Read [[Sync settings|the settings]] and [docs](https://x) ^ab1") == (
+        "Read the settings and docs"
+    )
+
+
+def test_index_stores_summaries_and_returns_them_without_reading(tmp_path, monkeypatch):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "Sync.md").write_text(SYNC_NOTE, encoding="utf-8")
+    (vault / "Plugins.md").write_text("# Plugins\nCommunity plugins extend the app with new views.", encoding="utf-8")
+    VaultIndex.open(str(vault), str(tmp_path / "index"))
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))  # loaded from the index file
+    note = index.notes[index._path_ids["Sync.md"]]
+    history = index.chunks[note.chunks[1]]
+    assert history.summary == "Sync keeps the version history of every note for one year."
+    assert "Obsidian Sync keeps" in note.summary
+
+    monkeypatch.setattr(VaultIndex, "_note_text", lambda *args: (_ for _ in ()).throw(AssertionError("read")))
+    hits = index.search("version history", summaries=True)
+    assert hits[0].snippet == history.summary and hits[0].note_summary == note.summary
+    assert hits[0].anchor == "Version history"
+
+
+def test_search_tool_summary_mode(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "Sync.md").write_text(SYNC_NOTE, encoding="utf-8")
+    get_vault_index(str(vault), str(tmp_path / "index"))
+    search = create_search_tool_v2(str(vault), index_dir=str(tmp_path / "index"))
+    payload = json.loads(search.invoke({"query": "sync", "summaries": True, "compact": True}))
+    results = payload["results"]
+    assert len(results) == 2 and all("snippet" not in r for r in results)
+    assert [("note_summary" in r) for r in results] == [True, False]
+    assert results[0]["summary"] and results[1]["note_link"].startswith("[[Sync")
@@ -0,0 +1,38 @@
+from obsidian_assistant.vault_search import TextPipeline, VaultIndex
+
+
+def test_nfkc_casefold_and_offsets():
+    pipeline = TextPipeline()
+    text = "ＯＢＳＩＤＩＡＮ　１２３ 插件"
+    tokens = pipeline.tokens(text)
+    assert [t.term for t in tokens[:2]] == ["obsidian", "123"]
+    first = tokens[0]
+    assert text[first.start:first.end] == "ＯＢＳＩＤＩＡＮ"
+
+
+def test_cjk_unigrams_bigrams_and_query_mode():
+    pipeline = TextPipeline()
+    assert pipeline.terms("双向链接") == ["双", "双向", "向", "向链", "链", "链接", "接"]
+    assert pipeline.terms("双向链接", query=True) == ["双向", "向链", "链接"]
+    assert pipeline.terms("链", query=True) == ["链"]
+
+
+def test_stopwords_are_configurable_and_keep_positions():
+    pipeline = TextPipeline(stopwords={"how", "to"})
+    tokens = pipeline.tokens("how to use tags")
+    assert [(t.term, t.position) for t in tokens] == [("use", 2), ("tags", 3)]
+    assert TextPipeline(stopwords=set()).signature() != pipeline.signature()
+
+
+def test_partial_chinese_phrase_matches(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "链接.md").write_text("在 Obsidian 中，可以使用双向链接把笔记连接起来。", encoding="utf-8")
+    (vault / "其他.md").write_text("向量检索与链条无关。", encoding="utf-8")
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+
+    hits = index.search("双向链接")
+    assert hits[0].path == "链接.md"
+    assert "使用双向链接" in hits[0].snippet
+    assert [cid for cid, _ in index.match("双向链接")] == [hits[0].chunk_id]
+    assert index.match("链接笔记") == []
@@ -0,0 +1,48 @@
+from obsidian_assistant.vault_search import VaultIndex
+from obsidian_assistant.vault_search.query import parse_query
+from obsidian_assistant.vault_search.trigram import (
+    TermTrigrams,
+    edit_distance,
+    required_literals,
+)
+
+
+def _vault(root):
+    (root / "Dataview.md").write_text("# Dataview\nThe dataview plugin queries notes.\nVersion v2.4 released.", encoding="utf-8")
+    (root / "Templater.md").write_text("# Templater\nTemplater plugins run scripts on note creation.", encoding="utf-8")
+    (root / "Sync.md").write_text("# Sync\nSynchronization keeps vaults aligned.", encoding="utf-8")
+
+
+def test_trigram_lookups():
+    grams = TermTrigrams.build(["dataview", "templater", "synchronization", "sync"])
+    assert sorted(grams.containing("ync")) == ["sync", "synchronization"]
+    assert [t for t, _ in grams.similar("datavew", 1)] == ["dataview"]
+    assert edit_distance("plugni", "plugin", 2) == 1  # transposition
+    assert required_literals(r"v\d+\.\d+") == ["v", "."]
+    assert required_literals(r"(sync|link)ing") == ["ing"]
+
+
+def test_parse_regex_wildcard_and_fuzzy():
+    parsed = parse_query(r"/v\d+/ plug* -/draft/ datavew~2")
+    assert parsed.regexes[0] == r"v\d+"
+    assert parsed.excluded_regexes == ["draft"]
+    assert parsed.terms == ["datavew"] and parsed.fuzzy == {"datavew": 2}
+
+
+def test_regex_wildcard_and_fuzzy_search(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    _vault(vault)
+    index = VaultIndex.open(str(vault), str(tmp_path / "index"))
+
+    hits = index.search(r"/v\d+\.\d+/")
+    assert [h.path for h in hits] == ["Dataview.md"]
+    assert "v2.4" in hits[0].snippet
+    assert [h.path for h in index.search("synchro*")] == ["Sync.md"]
+    assert {h.path for h in index.search("plugin* -/script/")} == {"Dataview.md"}
+    assert [h.path for h in index.search("datavew")] == ["Dataview.md"]  # auto-corrected
+    assert index.search("templatr~")[0].path == "Templater.md"
+
+    (vault / "Canvas.md").write_text("Canvasboard layouts.", encoding="utf-8")
+    index.refresh()
+    assert [h.path for h in index.search("*board*")] == ["Canvas.md"]
@@ -0,0 +1,41 @@
+import json
+
+from obsidian_assistant.obsidian_assistant import create_search_tool_v2
+from obsidian_assistant.vault_search import VaultIndex
+
+
+def _make_vault(root):
+    (root / "Links").mkdir()
+    (root / "Links" / "Internal links.md").write_text("使用双方括号创建内部链接，例如 [[我的笔记]]。", encoding="utf-8")
+    (root / "tags.md").write_text("Tags help you organize notes. 标签 管理", encoding="utf-8")
+
+
+def test_index_persists_and_reloads(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    _make_vault(vault)
+    index_dir = tmp_path / "index"
+
+    index = VaultIndex.open(str(vault), str(index_dir))
+    assert (index_dir / "vault_index.bin").exists()
+    assert [h.path for h in index.search("内部链接")] == ["Links/Internal links.md"]
+
+    reloaded = VaultIndex(str(vault), str(index_dir))
+    assert reloaded.load()
+    assert reloaded.stats()["notes"] == 2
+    hits = reloaded.search("organize NOTES")
+    assert hits and "organize notes" in hits[0].snippet
+
+
+def test_search_tool_contract(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    _make_vault(vault)
+    search = create_search_tool_v2(str(vault), index_dir=str(tmp_path / "index"))
+
+    payload = json.loads(search.invoke({"query": "双方括号"}))
+    assert payload["status"] == "success"
+    assert payload["results"][0]["note_link"] == "[[Links/Internal links|Internal links]]"
+
+    missing = json.loads(search.invoke({"query": "飞行汽车"}))
+    assert missing["status"] == "no_results"
@@ -0,0 +1,137 @@
+"""Vault search engine for the Obsidian assistant.
+
+Backs the ``search_obsidian_docs_v2`` tool with an on-disk index so tool
+calls no longer rescan the whole vault.
+
+Modules:
+    tokenizer: TextPipeline (NFKC, case folding, CJK uni/bigrams, stopwords).
+    index: persistent inverted index over heading sections (VaultIndex).
+    sharded: concurrent multi-vault search with globally comparable scores.
+    segment: binary memory-mapped index file (varint postings, term dictionary).
+    snapshot: checksummed export / import of a whole index directory (fast cold start).
+    cursors: short-lived cursors over ranked results (pagination).
+    chunker: heading / ^block-id section splitting.
+    content: stat-validated, byte-bounded LRU of note text (shared with SmartRouter).
+    documents: per-section field analysis (title / headings / body).
+    extractors: per file type text extraction (.md, .canvas, .txt, .csv), binary and size guards.
+    summaries: extractive note and section summaries computed at index time.
+    metadata: frontmatter, tags, aliases and wikilinks (side index).
+    graph: CSR link graph (backlinks, unresolved links, PageRank).
+    query: fielded query syntax (tag: path: alias: link: "phrase" -word /re/ word~).
+    trigram: term-dictionary trigram index for substring, regex and fuzzy lookups.
+    builder: process-pool cold build and BuildProgress.
+    bm25: BM25F ranking with per-field boosts and bounded top-k.
+    outline: title / alias / heading index for the coarse phase of two-phase retrieval.
+    diversity: SimHash section signatures, near-duplicate removal and MMR re-ranking.
+    semantic: offline LSA section vectors (NumPy, optional) for hybrid search.
+    ann: IVF approximate nearest-neighbour index for large vector sets.
+    packing: token-budgeted result packing for the search tool.
+    watcher: background inotify / polling updater (VaultWatcher).
+"""
+from __future__ import annotations
+
+from .ann import IVFIndex
+from .bm25 import BM25FScorer, CollectionStats
+from .builder import BuildProgress
+from .chunker import Section, heading_anchor, split_sections
+from .content import ContentCache, get_content_cache
+from .cursors import CursorCache, ResultCursor
+from .diversity import MMR_LAMBDA, diversify, near_duplicate, simhash
+from .documents import ChunkRecord, NoteRecord
+from .extractors import Extractor, is_indexed, read_document, register_extractor
+from .graph import LinkGraph
+from .index import (
+    INDEX_FORMAT_VERSION,
+    SEARCH_MODES,
+    HitStream,
+    RefreshReport,
+    SearchDeadline,
+    SearchHit,
+    VaultIndex,
+    default_index_dir,
+    get_vault_index,
+    peek_vault_index,
+)
+from .metadata import NoteMeta, extract_metadata
+from .outline import OutlineIndex
+from .packing import PackedResults, covered, pack_hits
+from .query import ParsedQuery, parse_query
+from .semantic import SemanticIndex, semantic_available
+from .sharded import ShardedResults, ShardedSearch, VaultShard, merge_ranked, parse_vaults
+from .snapshot import SnapshotError, export_snapshot, import_snapshot, read_manifest
+from .summaries import summarize_note
+from .tokenizer import (
+    DEFAULT_STOPWORDS,
+    TextPipeline,
+    Token,
+    estimate_tokens,
+    load_stopwords,
+    tokenize,
+    tokenize_with_offsets,
+)
+from .trigram import TermTrigrams
+from .watcher import VaultWatcher
+
+__all__ = [
+    "BM25FScorer",
+    "BuildProgress",
+    "ChunkRecord",
+    "CollectionStats",
+    "ContentCache",
+    "CursorCache",
+    "DEFAULT_STOPWORDS",
+    "Extractor",
+    "INDEX_FORMAT_VERSION",
+    "HitStream",
+    "IVFIndex",
+    "LinkGraph",
+    "MMR_LAMBDA",
+    "NoteMeta",
+    "NoteRecord",
+    "OutlineIndex",
+    "PackedResults",
+    "ParsedQuery",
+    "RefreshReport",
+    "ResultCursor",
+    "SEARCH_MODES",
+    "SearchDeadline",
+    "SearchHit",
+    "SemanticIndex",
+    "ShardedResults",
+    "ShardedSearch",
+    "SnapshotError",
+    "Section",
+    "TermTrigrams",
+    "TextPipeline",
+    "Token",
+    "VaultIndex",
+    "VaultShard",
+    "VaultWatcher",
+    "covered",
+    "default_index_dir",
+    "diversify",
+    "estimate_tokens",
+    "export_snapshot",
+    "extract_metadata",
+    "get_content_cache",
+    "get_vault_index",
+    "heading_anchor",
+    "import_snapshot",
+    "is_indexed",
+    "load_stopwords",
+    "merge_ranked",
+    "near_duplicate",
+    "pack_hits",
+    "parse_query",
+    "parse_vaults",
+    "peek_vault_index",
+    "read_document",
+    "read_manifest",
+    "register_extractor",
+    "semantic_available",
+    "simhash",
+    "split_sections",
+    "summarize_note",
+    "tokenize",
+    "tokenize_with_offsets",
+]
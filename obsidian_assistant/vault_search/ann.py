@@ -0,0 +1,320 @@
+"""Approximate nearest-neighbour search over section vectors (IVF, NumPy).
+
+Brute-force cosine (semantic.py) reads every vector per query; past a few
+hundred thousand sections that dominates the search latency.  IVFIndex
+partitions the vectors with spherical k-means and scans only the ``nprobe``
+lists whose centroids are closest to the query.
+
+Layout:
+    Vectors are stored grouped by list in CSR form: ``ptr[i]:ptr[i + 1]``
+    slices ``keys`` / ``codes`` / ``scales`` for list ``i``.  Codes are int8
+    with a per-vector scale (quantize_int8), i.e. ``dims + 4`` bytes per
+    vector, and a probed list is one contiguous slice.
+
+Maintenance:
+- add() puts a vector in a small per-list overlay (the centroids are not
+  retrained); remove() tombstones its CSR slot or drops it from the overlay.
+  Re-adding a key replaces it, so an edited section is remove + add.
+- Once overlay + tombstones exceed COMPACT_FRACTION of the vectors,
+  compact() folds them back into the CSR arrays.  Retraining the centroids
+  is left to a full refit (SemanticIndex does one when enough changed).
+
+benchmark() measures recall@k and latency against exact search; run
+``python -m obsidian_assistant.vault_search.ann`` for a synthetic report.
+"""
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # semantic search is an optional feature
+    np = None  # type: ignore[assignment]
+
+from .segment import replacing
+
+IVF_FORMAT_VERSION = 1
+KMEANS_ITERATIONS = 12
+KMEANS_SAMPLE_PER_LIST = 64  # training points per centroid
+COMPACT_FRACTION = 0.1
+DEFAULT_NPROBE = 16
+ASSIGN_BLOCK = 65536  # vectors per assignment matmul
+
+
+def quantize_int8(vectors):
+    """Per-row symmetric int8 quantisation; returns (codes, scales)."""
+    peak = np.abs(vectors).max(axis=1)
+    scales = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def default_nlist(n: int) -> int:
+    """About 4 * sqrt(n) lists (at least 1)."""
+    return max(1, min(n, int(4 * n ** 0.5)))
+
+
+def _assign(vectors, centroids):
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK], dtype=np.float32)
+        labels[start:start + ASSIGN_BLOCK] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(vectors, k: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0):
+    """Unit-norm centroids maximising cosine similarity (trained on a sample)."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_size = min(n, k * KMEANS_SAMPLE_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = np.flatnonzero(np.bincount(labels, minlength=k) == 0)
+        sums[empty] = sample[rng.choice(sample_size, len(empty))]  # re-seed empty lists
+        norms = np.linalg.norm(sums, axis=1)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms[:, None]).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index over unit vectors (see module docstring).
+
+    Parameters:
+        centroids: ``nlist x dims`` unit-norm coarse quantizer.
+        nprobe: Lists scanned per query (recall / latency trade-off).
+    """
+
+    def __init__(self, centroids, nprobe: int = DEFAULT_NPROBE) -> None:
+        if np is None:
+            raise RuntimeError("approximate search requires numpy")
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.nprobe = nprobe
+        nlist, dims = self.centroids.shape
+        self.ptr = np.zeros(nlist + 1, dtype=np.int64)
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.codes = np.zeros((0, dims), dtype=np.int8)
+        self.scales = np.zeros(0, dtype=np.float32)
+        self._slot: Dict[int, int] = {}  # key -> CSR position
+        self._dead = np.zeros(0, dtype=bool)
+        self._dead_count = 0
+        self._overlay: Dict[int, Dict[int, Tuple[object, float]]] = {}  # list -> key -> (code, scale)
+        self._overlay_list: Dict[int, int] = {}  # key -> list
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self) -> int:
+        return len(self.keys) - self._dead_count + len(self._overlay_list)
+
+    # ------------------------------------------------------------------
+    # Build / maintenance
+    # ------------------------------------------------------------------
+    @classmethod
+    def train(
+        cls, keys, vectors, nlist: Optional[int] = None, nprobe: int = DEFAULT_NPROBE, seed: int = 0
+    ) -> "IVFIndex":
+        """Cluster ``vectors`` (unit rows) and load them under ``keys``."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ivf = cls(spherical_kmeans(vectors, nlist or default_nlist(len(vectors)), seed=seed), nprobe)
+        codes, scales = quantize_int8(vectors)
+        ivf._load_csr(np.asarray(keys, dtype=np.int64), codes, scales, _assign(vectors, ivf.centroids))
+        return ivf
+
+    def _load_csr(self, keys, codes, scales, labels) -> None:
+        order = np.argsort(labels, kind="stable")
+        self.ptr = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=self.nlist), out=self.ptr[1:])
+        self.keys, self.codes, self.scales = keys[order], codes[order], scales[order]
+        self._slot = {int(key): pos for pos, key in enumerate(self.keys)}
+        self._dead = np.zeros(len(self.keys), dtype=bool)
+        self._dead_count = 0
+        self._overlay = {}
+        self._overlay_list = {}
+
+    def add(self, key: int, vector) -> None:
+        """Insert or replace ``key`` (``vector`` need not be normalised)."""
+        self.remove(key)
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0:
+            return
+        vector = vector / norm
+        codes, scales = quantize_int8(vector[None, :])
+        list_no = int(np.argmax(self.centroids @ vector))
+        self._overlay.setdefault(list_no, {})[key] = (codes[0], float(scales[0]))
+        self._overlay_list[key] = list_no
+        self._maybe_compact()
+
+    def remove(self, key: int) -> None:
+        list_no = self._overlay_list.pop(key, None)
+        if list_no is not None:
+            del self._overlay[list_no][key]
+            return
+        pos = self._slot.pop(key, None)
+        if pos is not None:
+            self._dead[pos] = True
+            self._dead_count += 1
+            self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        if self._dead_count + len(self._overlay_list) > COMPACT_FRACTION * max(len(self.keys), 1):
+            self.compact()
+
+    def compact(self) -> None:
+        """Fold the overlay and tombstones back into the CSR arrays."""
+        live = ~self._dead
+        labels = np.repeat(np.arange(self.nlist), np.diff(self.ptr))[live]
+        keys, codes, scales = [self.keys[live]], [np.asarray(self.codes[live])], [self.scales[live]]
+        extra_labels = []
+        for list_no, entries in self._overlay.items():
+            for key, (code, scale) in entries.items():
+                keys.append(np.array([key], dtype=np.int64))
+                codes.append(code[None, :])
+                scales.append(np.array([scale], dtype=np.float32))
+                extra_labels.append(list_no)
+        self._load_csr(
+            np.concatenate(keys),
+            np.concatenate(codes),
+            np.concatenate(scales),
+            np.concatenate([labels, np.asarray(extra_labels, dtype=np.int64)]),
+        )
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+    def search(self, query, k: int, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Approximate top-``k`` (key, cosine) pairs, highest first."""
+        query = np.asarray(query, dtype=np.float32)
+        probes = min(nprobe or self.nprobe, self.nlist)
+        coarse = self.centroids @ query
+        lists = np.argpartition(-coarse, probes - 1)[:probes] if probes < self.nlist else np.arange(self.nlist)
+        spans = [np.arange(self.ptr[i], self.ptr[i + 1]) for i in lists if self.ptr[i + 1] > self.ptr[i]]
+        keys = [np.zeros(0, dtype=np.int64)]
+        sims = [np.zeros(0, dtype=np.float32)]
+        if spans:
+            rows = np.concatenate(spans)
+            if self._dead_count:
+                rows = rows[~self._dead[rows]]
+            keys.append(self.keys[rows])
+            sims.append((np.asarray(self.codes[rows], dtype=np.float32) @ query) * self.scales[rows])
+        for list_no in lists:
+            for key, (code, scale) in self._overlay.get(int(list_no), {}).items():
+                keys.append(np.array([key], dtype=np.int64))
+                sims.append(np.array([float(code.astype(np.float32) @ query) * scale], dtype=np.float32))
+        all_keys, all_sims = np.concatenate(keys), np.concatenate(sims)
+        if not len(all_sims):
+            return []
+        top = min(k, len(all_sims))
+        best = np.argpartition(-all_sims, top - 1)[:top]
+        best = best[np.argsort(-all_sims[best], kind="stable")]
+        return [(int(all_keys[i]), float(all_sims[i])) for i in best]
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, directory: Path, prefix: str = "ivf") -> None:
+        """Write the compacted index as ``<prefix>_*.npy`` plus ``<prefix>.json``."""
+        if self._overlay_list or self._dead_count:
+            self.compact()
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "centroids": self.centroids,
+            "ptr": self.ptr,
+            "keys": self.keys,
+            "codes": self.codes,
+            "scales": self.scales,
+        }
+        for name, array in arrays.items():
+            with replacing(directory / f"{prefix}_{name}.npy", ".tmp.npy") as tmp:
+                np.save(tmp, array)
+        meta = {"version": IVF_FORMAT_VERSION, "nprobe": self.nprobe, "size": len(self.keys)}
+        with replacing(directory / f"{prefix}.json") as tmp:
+            tmp.write_text(json.dumps(meta), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: Path, prefix: str = "ivf") -> Optional["IVFIndex"]:
+        """Open a saved index (codes memory-mapped); None if missing or stale."""
+        directory = Path(directory)
+        try:
+            meta = json.loads((directory / f"{prefix}.json").read_text(encoding="utf-8"))
+            if meta.get("version") != IVF_FORMAT_VERSION:
+                return None
+            ivf = cls(np.load(directory / f"{prefix}_centroids.npy"), meta.get("nprobe", DEFAULT_NPROBE))
+            ivf.ptr = np.load(directory / f"{prefix}_ptr.npy")
+            ivf.keys = np.load(directory / f"{prefix}_keys.npy")
+            ivf.codes = np.load(directory / f"{prefix}_codes.npy", mmap_mode="r")
+            ivf.scales = np.load(directory / f"{prefix}_scales.npy")
+        except (OSError, ValueError):
+            return None
+        if len(ivf.keys) != meta.get("size"):
+            return None
+        ivf._slot = {int(key): pos for pos, key in enumerate(ivf.keys)}
+        ivf._dead = np.zeros(len(ivf.keys), dtype=bool)
+        return ivf
+
+
+def exact_search(keys, vectors, query, k: int) -> List[Tuple[int, float]]:
+    """Brute-force top-``k`` (key, cosine) pairs over unit rows."""
+    sims = np.asarray(vectors, dtype=np.float32) @ np.asarray(query, dtype=np.float32)
+    top = min(k, len(sims))
+    best = np.argpartition(-sims, top - 1)[:top]
+    best = best[np.argsort(-sims[best], kind="stable")]
+    return [(int(keys[i]), float(sims[i])) for i in best]
+
+
+def benchmark(
+    vectors, queries, k: int = 10, nprobes: Iterable[int] = (1, 4, 16, 64), nlist: Optional[int] = None
+) -> Dict[str, object]:
+    """Recall@k and mean latency of IVFIndex vs exact search over ``vectors``."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    keys = np.arange(len(vectors), dtype=np.int64)
+    started = time.perf_counter()
+    ivf = IVFIndex.train(keys, vectors, nlist=nlist)
+    report: Dict[str, object] = {
+        "vectors": len(vectors),
+        "dims": vectors.shape[1],
+        "nlist": ivf.nlist,
+        "train_s": round(time.perf_counter() - started, 3),
+        "bytes_per_vector": {"float32": 4 * vectors.shape[1], "ivf_int8": vectors.shape[1] + 4 + 8},
+    }
+    started = time.perf_counter()
+    truth = [{key for key, _ in exact_search(keys, vectors, q, k)} for q in queries]
+    report["exact_ms"] = round((time.perf_counter() - started) * 1000 / len(queries), 3)
+    runs = []
+    for nprobe in nprobes:
+        started = time.perf_counter()
+        found = [{key for key, _ in ivf.search(q, k, nprobe=nprobe)} for q in queries]
+        elapsed = (time.perf_counter() - started) * 1000 / len(queries)
+        recall = sum(len(f & t) for f, t in zip(found, truth)) / max(sum(len(t) for t in truth), 1)
+        runs.append({"nprobe": nprobe, "recall": round(recall, 4), "ms": round(elapsed, 3)})
+    report["runs"] = runs
+    return report
+
+
+def _synthetic(n: int, dims: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dims)).astype(np.float32)
+    points = centres[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dims)).astype(np.float32)
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+
+__all__ = ["IVFIndex", "benchmark", "default_nlist", "exact_search", "quantize_int8", "spherical_kmeans"]
+
+
+if __name__ == "__main__":
+    import sys
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    data = _synthetic(size + 100, 128, max(16, size // 2000))
+    print(json.dumps(benchmark(data[100:], data[:100]), indent=2))
+
@@ -0,0 +1,223 @@
+"""BM25F ranking for the vault index.
+
+Each query term contributes
+
+    idf(t) * tf'(t, d) / (k1 + tf'(t, d))
+
+where tf' is the boost-weighted, length-normalised term frequency summed over
+the section's fields (title, headings, body).  The unit is a heading
+section (chunk), not a whole note: a long note no longer wins just because it
+mentions every term somewhere.  Title and heading matches are boosted so a
+section *about* a topic outranks one that merely mentions it.
+
+top_k() keeps the best k chunks in a bounded min-heap instead of sorting
+every candidate.
+
+Matches are accumulated in ascending chunk-id blocks (SCORE_BLOCK) so a
+search deadline can stop after a prefix of the index: the scores found so
+far are exact for the covered sections, and the covered fraction is
+reported on the SearchDeadline.
+
+Scores from different indexes (shards) are only comparable when they share
+idf and average lengths: CollectionStats carries those statistics, shards
+sum theirs (merge()) and every shard then scores with the global values.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from .index import SearchDeadline, VaultIndex
+
+DEFAULT_FIELD_WEIGHTS = {"title": 3.0, "headings": 2.0, "body": 1.0}
+DEFAULT_FIELD_B = {"title": 0.3, "headings": 0.5, "body": 0.75}
+SCORE_BLOCK = 4096  # chunk ids scored between deadline checks
+
+
+@dataclass
+class CollectionStats:
+    """Corpus statistics BM25F depends on, summable across shards.
+
+    Parameters:
+        chunks: Number of live sections.
+        lengths: Field -> total field length over those sections.
+        df: Term -> sections containing it in any field.
+    """
+
+    chunks: int = 0
+    lengths: Dict[str, int] = field(default_factory=dict)
+    df: Dict[str, int] = field(default_factory=dict)
+
+    def merge(self, other: "CollectionStats") -> "CollectionStats":
+        lengths = dict(self.lengths)
+        for f, total in other.lengths.items():
+            lengths[f] = lengths.get(f, 0) + total
+        df = dict(self.df)
+        for term, count in other.df.items():
+            df[term] = df.get(term, 0) + count
+        return CollectionStats(self.chunks + other.chunks, lengths, df)
+
+    def average_lengths(self) -> Dict[str, float]:
+        n = max(self.chunks, 1)
+        return {f: (total / n) or 1.0 for f, total in self.lengths.items()}
+
+
+@dataclass
+class BM25FScorer:
+    """BM25F with per-field boosts and length normalisation.
+
+    Parameters:
+        k1: Term-frequency saturation.
+        field_weights: Boost per field.
+        field_b: Length-normalisation strength per field (0 disables it).
+    """
+
+    k1: float = 1.2
+    field_weights: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_FIELD_WEIGHTS))
+    field_b: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_FIELD_B))
+    _avg_lengths: Optional[Dict[str, float]] = field(default=None, init=False, repr=False)
+    _totals: Optional[Tuple[int, Dict[str, int]]] = field(default=None, init=False, repr=False)
+
+    def invalidate(self) -> None:
+        """Drop cached collection statistics (call after the index changes)."""
+        self._avg_lengths = None
+        self._totals = None
+
+    def _average_lengths(self, index: "VaultIndex") -> Dict[str, float]:
+        if self._avg_lengths is None:
+            self._avg_lengths = self.collection_stats(index, []).average_lengths()
+        return self._avg_lengths
+
+    def _field_totals(self, index: "VaultIndex") -> Tuple[int, Dict[str, int]]:
+        # one pass over the live sections per index change, not per query
+        if self._totals is None:
+            totals = {f: 0 for f in self.field_weights}
+            for _, chunk in index.live_chunks():
+                for f in totals:
+                    totals[f] += chunk.lengths.get(f, 0)
+            self._totals = (index.chunk_count, totals)
+        return self._totals
+
+    def collection_stats(self, index: "VaultIndex", terms: List[str]) -> CollectionStats:
+        """This index's section count, field length totals and df of ``terms``.
+
+        Counts and totals are cached until invalidate(); only the df of
+        ``terms`` is computed on each call.
+        """
+        chunks, totals = self._field_totals(index)
+        df = {}
+        for term in dict.fromkeys(terms):
+            matched = set()
+            for f in self.field_weights:
+                matched.update(index.postings.get(f, {}).get(term) or ())
+            df[term] = len(matched)
+        return CollectionStats(chunks, dict(totals), df)
+
+    def score(
+        self,
+        index: "VaultIndex",
+        terms: List[str],
+        candidates: Optional[Set[int]] = None,
+        stats: Optional[CollectionStats] = None,
+        deadline: Optional["SearchDeadline"] = None,
+        memo: Optional[Dict[str, Dict[int, float]]] = None,
+    ) -> Dict[int, float]:
+        """Return chunk_id -> score for every chunk matching at least one term.
+
+        ``candidates`` restricts scoring to those chunk ids (query filters);
+        collection statistics still cover the whole index, or come from
+        ``stats`` (global statistics of a sharded search; terms it lacks,
+        such as fuzzy corrections, use this index's df).  Once ``deadline``
+        expires the remaining chunk ids are skipped (see module docstring).
+
+        ``memo`` (term -> chunk_id -> contribution) shares per-term work
+        between the queries of one batch: terms found there are not scored
+        again, and new terms are scored over all their chunks and added.
+        Only valid for one index, ``stats`` and scorer configuration.
+        """
+        n_chunks = stats.chunks if stats is not None else index.chunk_count
+        avg = stats.average_lengths() if stats is not None else self._average_lengths(index)
+        scores: Dict[int, float] = {}
+        prepared = []  # (idf, field lists, matching chunk ids) per term
+        known: List[Dict[int, float]] = []  # memoised contributions
+        new_terms: List[str] = []
+        for term in dict.fromkeys(terms):
+            if memo is not None and term in memo:
+                known.append(memo[term])
+                continue
+            field_lists = {
+                f: index.postings[f].get(term)
+                for f in self.field_weights
+                if index.postings.get(f, {}).get(term)
+            }
+            if not field_lists:
+                continue
+            matched = set()
+            for plist in field_lists.values():
+                matched.update(plist)
+            df = stats.df.get(term, len(matched)) if stats is not None else len(matched)
+            idf = math.log(1.0 + (n_chunks - df + 0.5) / (df + 0.5))
+            if candidates is not None and memo is None:
+                matched &= candidates
+            prepared.append((idf, field_lists, matched))
+            new_terms.append(term)
+        end = len(index.chunks)
+        blocked = deadline is not None and deadline.at is not None and end > SCORE_BLOCK
+        block = SCORE_BLOCK if blocked else max(end, 1)
+        if blocked:
+            prepared = [(idf, field_lists, sorted(ids)) for idf, field_lists, ids in prepared]
+        else:
+            prepared = [(idf, field_lists, list(ids)) for idf, field_lists, ids in prepared]
+        cursors = [0] * len(prepared)
+        # with a memo every term collects its own contributions, summed below
+        targets = [{} for _ in prepared] if memo is not None else [scores] * len(prepared)
+        complete = True
+        for block_end in range(block, end + block, block):
+            for i, (idf, field_lists, ids) in enumerate(prepared):
+                target = targets[i]
+                stop = bisect_left(ids, block_end, cursors[i]) if blocked else len(ids)
+                for chunk_id in ids[cursors[i]:stop]:
+                    lengths = index.chunks[chunk_id].lengths
+                    tf = 0.0
+                    for f, plist in field_lists.items():
+                        positions = plist.get(chunk_id)
+                        if not positions:
+                            continue
+                        b = self.field_b.get(f, 0.75)
+                        norm = 1.0 - b + b * lengths.get(f, 0) / avg[f]
+                        tf += self.field_weights[f] * len(positions) / norm
+                    target[chunk_id] = target.get(chunk_id, 0.0) + idf * tf / (self.k1 + tf)
+                cursors[i] = stop
+            if block_end < end and deadline is not None and deadline.expired():
+                deadline.cut(block_end / end)
+                complete = False
+                break
+        if memo is not None:
+            if complete:
+                memo.update(zip(new_terms, targets))
+            for contributions in known + targets:
+                for chunk_id, value in contributions.items():
+                    if candidates is None or chunk_id in candidates:
+                        scores[chunk_id] = scores.get(chunk_id, 0.0) + value
+        return scores
+
+    @staticmethod
+    def top_k(scores: Dict[int, float], k: int) -> List[Tuple[int, float]]:
+        """Best k (id, score) pairs, highest first; ties favour lower ids."""
+        if k <= 0:
+            return []
+        heap: List[Tuple[float, int]] = []
+        for unit_id, score in scores.items():
+            item = (score, -unit_id)
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        return [(-neg_id, score) for score, neg_id in sorted(heap, reverse=True)]
+
+
+__all__ = ["BM25FScorer", "CollectionStats", "SCORE_BLOCK", "DEFAULT_FIELD_WEIGHTS", "DEFAULT_FIELD_B"]
@@ -0,0 +1,167 @@
+"""Parallel cold build for large vaults.
+
+The sorted file list is cut into shards; each shard is analysed in a
+ProcessPoolExecutor worker which returns partial postings keyed by
+shard-local chunk ids.  Note ids are assigned up front from the sorted list;
+the parent merges the shards in note order (so chunk ids match a serial
+build) and updates a BuildProgress record that the API server exposes on
+/health.
+
+Small vaults (< PARALLEL_MIN_NOTES) are built serially: process start-up
+and pickling cost more than they save there.
+"""
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .documents import ChunkRecord, NoteRecord, Postings, add_postings, analyze_note, empty_postings
+from .tokenizer import TextPipeline
+
+PARALLEL_MIN_NOTES = 2000
+SHARDS_PER_WORKER = 4
+
+# (note dict, [(chunk dict, distinct terms)])
+NoteEntry = Tuple[Dict[str, Any], List[Tuple[Dict[str, Any], List[str]]]]
+# (base note id, [NoteEntry or None per path], partial postings keyed by shard-local chunk ids)
+ShardResult = Tuple[int, List[Optional[NoteEntry]], Postings]
+
+
+@dataclass
+class BuildProgress:
+    """Build state shared with /health (plain attributes, read without locking)."""
+
+    state: str = "idle"  # idle | loading | scanning | building | merging | saving | ready | failed
+    total: int = 0
+    done: int = 0
+    workers: int = 1
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    def begin(self, state: str) -> None:
+        self.state = state
+        self.total = 0
+        self.done = 0
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def finish(self, error: Optional[str] = None) -> None:
+        self.state = "failed" if error else "ready"
+        self.error = error
+        self.finished_at = time.time()
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["percent"] = round(100.0 * self.done / self.total, 1) if self.total else (100.0 if self.state == "ready" else 0.0)
+        end = self.finished_at or time.time()
+        data["elapsed_s"] = round(end - self.started_at, 2) if self.started_at else None
+        return data
+
+
+def resolve_workers(requested: Optional[int], n_notes: int) -> int:
+    """Number of worker processes to use (1 means serial)."""
+    if requested is not None:
+        return max(1, requested)
+    env = os.getenv("OBSIDIAN_INDEX_WORKERS")
+    if env and env.isdigit():
+        return max(1, int(env))
+    if n_notes < PARALLEL_MIN_NOTES:
+        return 1
+    return max(1, min(os.cpu_count() or 1, 8))
+
+
+def _index_shard(docs_path: str, base_id: int, rel_paths: List[str], pipeline: TextPipeline) -> ShardResult:
+    root = Path(docs_path)
+    postings = empty_postings()
+    records: List[Optional[NoteEntry]] = []
+    local_id = 0
+    for offset, rel_path in enumerate(rel_paths):
+        analyzed = analyze_note(root, rel_path, pipeline, base_id + offset)
+        if analyzed is None:
+            records.append(None)
+            continue
+        record, chunks = analyzed
+        entries = []
+        for chunk, field_tokens in chunks:
+            entries.append((asdict(chunk), add_postings(postings, local_id, field_tokens)))
+            local_id += 1
+        records.append((asdict(record), entries))
+    return base_id, records, postings
+
+
+def shard_paths(rel_paths: List[str], workers: int) -> List[Tuple[int, List[str]]]:
+    """Cut the sorted path list into (base id, paths) shards."""
+    n_shards = max(1, workers * SHARDS_PER_WORKER)
+    size = max(1, -(-len(rel_paths) // n_shards))
+    return [(start, rel_paths[start:start + size]) for start in range(0, len(rel_paths), size)]
+
+
+def parallel_analyze(
+    docs_path: str,
+    rel_paths: List[str],
+    workers: int,
+    progress: BuildProgress,
+    pipeline: TextPipeline,
+):
+    """Yield ShardResults as workers finish; progress.done advances per shard."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_index_shard, docs_path, base_id, shard, pipeline): len(shard)
+            for base_id, shard in shard_paths(rel_paths, workers)
+        }
+        for future in as_completed(futures):
+            yield future.result()
+            progress.done += futures[future]
+
+
+def merge_shard(
+    result: ShardResult,
+    notes: List[Optional[NoteRecord]],
+    chunks: List[Optional[ChunkRecord]],
+    chunk_terms: Dict[int, List[str]],
+    postings: Postings,
+) -> None:
+    """Fold one worker's partial index into the parent structures.
+
+    Chunk ids inside a shard are local (0, 1, ...); they are shifted to the
+    end of the parent chunk table here.  Merging shards in base-id order
+    therefore yields the same ids as a serial build.
+    """
+    base_id, records, partial = result
+    chunk_base = len(chunks)
+    for offset, entry in enumerate(records):
+        if entry is None:
+            continue
+        record, entries = entry
+        note = NoteRecord(**record)
+        for chunk, terms in entries:
+            chunk_id = len(chunks)
+            chunks.append(ChunkRecord(**chunk))
+            chunk_terms[chunk_id] = terms
+            note.chunks.append(chunk_id)
+        notes[base_id + offset] = note
+    for f, terms_map in partial.items():
+        target = postings[f]
+        for term, plist in terms_map.items():
+            shifted = {local_id + chunk_base: positions for local_id, positions in plist.items()}
+            existing = target.get(term)
+            if existing is None:
+                target[term] = shifted
+            else:
+                existing.update(shifted)
+
+
+__all__ = [
+    "BuildProgress",
+    "PARALLEL_MIN_NOTES",
+    "merge_shard",
+    "parallel_analyze",
+    "resolve_workers",
+    "shard_paths",
+]
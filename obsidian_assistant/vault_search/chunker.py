@@ -0,0 +1,123 @@
+"""Split notes into heading-delimited sections.
+
+A section runs from one ATX heading (``#`` .. ``######``) to the next
+heading of any level; text before the first heading is an untitled preamble
+section.  Each section keeps its heading path (the enclosing headings plus
+its own), so "Setup" under "# Sync" is indexed with both.  Headings inside
+fenced code blocks are ignored.
+
+Obsidian block ids (a trailing ``^id`` on a paragraph or list item) are
+recorded with the span of the block they label, so a hit inside that block
+can link to ``[[note#^id]]`` instead of the enclosing heading.
+
+Sections longer than MAX_SECTION_CHARS are cut at blank lines so one huge
+section neither dominates ranking nor produces an oversized passage.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field, replace
+from typing import List, Optional, Tuple
+
+MAX_SECTION_CHARS = 6000
+
+_HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+_FENCE_RE = re.compile(r"^[ \t]{0,3}(```|~~~)")
+_BLOCK_ID_RE = re.compile(r"(?:^|[ \t])\^([A-Za-z0-9-]+)[ \t]*$")
+_LIST_ITEM_RE = re.compile(r"^[ \t]*(?:[-*+]|\d+[.)])[ \t]")
+# characters Obsidian does not allow in a heading link
+_LINK_UNSAFE_RE = re.compile(r"[#|^:\[\]]+")
+
+
+@dataclass
+class Section:
+    heading: Optional[str]  # None for the preamble
+    level: int  # 1-6, 0 for the preamble
+    heading_path: List[str]
+    start: int  # character offsets into the note
+    end: int
+    blocks: List[Tuple[str, int, int]] = field(default_factory=list)  # (block id, start, end)
+
+
+def split_sections(text: str, max_chars: int = MAX_SECTION_CHARS, start: int = 0) -> List[Section]:
+    """Sections of ``text[start:]`` in document order (offsets into ``text``).
+
+    Whitespace-only sections are dropped; ``start`` skips a frontmatter block.
+    """
+    sections: List[Section] = []
+    stack: List[Tuple[int, str]] = []
+    current = Section(None, 0, [], start, 0)
+    fence: Optional[str] = None
+    para_start = start
+    offset = start
+    for line in text[start:].splitlines(keepends=True):
+        line_start = offset
+        offset += len(line)
+        stripped = line.rstrip("\r\n")
+        fence_match = _FENCE_RE.match(stripped)
+        if fence is not None:
+            if fence_match and fence_match.group(1) == fence:
+                fence = None
+            continue
+        if fence_match:
+            fence = fence_match.group(1)
+            continue
+        heading = _HEADING_RE.match(stripped)
+        if heading:
+            current.end = line_start
+            sections.append(current)
+            level = len(heading.group(1))
+            title = heading.group(2).strip()
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, title))
+            current = Section(title, level, [t for _, t in stack], line_start, 0)
+            para_start = offset
+            continue
+        if not stripped.strip():
+            para_start = offset
+            continue
+        block = _BLOCK_ID_RE.search(stripped)
+        if block:
+            block_start = line_start if _LIST_ITEM_RE.match(stripped) else para_start
+            current.blocks.append((block.group(1), block_start, line_start + len(stripped)))
+    current.end = len(text)
+    sections.append(current)
+
+    out: List[Section] = []
+    for section in sections:
+        if text[section.start:section.end].strip():
+            out.extend(_split_long(section, text, max_chars))
+    return out
+
+
+def _split_long(section: Section, text: str, max_chars: int) -> List[Section]:
+    if section.end - section.start <= max_chars:
+        return [section]
+    parts: List[Section] = []
+    start = section.start
+    while section.end - start > max_chars:
+        limit = start + max_chars
+        cut = text.rfind("\n\n", start, limit)
+        if cut > start:
+            cut += 2
+        else:
+            cut = text.rfind("\n", start, limit)
+            cut = cut + 1 if cut > start else limit
+        parts.append(_part(section, start, cut))
+        start = cut
+    parts.append(_part(section, start, section.end))
+    return parts
+
+
+def _part(section: Section, start: int, end: int) -> Section:
+    blocks = [b for b in section.blocks if start <= b[1] < end]
+    return replace(section, start=start, end=end, blocks=blocks)
+
+
+def heading_anchor(heading: str) -> str:
+    """Link target for ``[[note#heading]]`` (drops characters Obsidian rejects)."""
+    return " ".join(_LINK_UNSAFE_RE.sub(" ", heading).split())
+
+
+__all__ = ["MAX_SECTION_CHARS", "Section", "heading_anchor", "split_sections"]
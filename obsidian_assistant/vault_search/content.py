@@ -0,0 +1,171 @@
+"""In-memory cache of decoded note text shared by the search tool and SmartRouter.
+
+Responsibilities:
+- ContentCache: file path -> text as extracted for its file type (see
+  extractors.py) and, on first request, its normalised form with the
+  origin map (see TextPipeline.normalize); an LRU bounded by the bytes its
+  strings occupy.
+- Entries are validated against (st_mtime_ns, st_size) on every access, so
+  one stat() replaces the read of an unchanged note; a changed note is
+  read again.
+- get_content_cache(): the process-wide instance (OBSIDIAN_CONTENT_CACHE_MB).
+
+Notes:
+- Files that cannot be indexed (not UTF-8, binary, too large) are cached
+  as None until they change.
+- A note larger than the whole budget is returned but not cached.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from .extractors import read_document
+from .tokenizer import TextPipeline
+
+CONTENT_CACHE_MB = 64  # default budget of the shared cache
+
+Normalized = Tuple[str, Optional[List[int]]]
+
+
+class _Entry:
+    __slots__ = ("key", "signature", "text", "normalized", "nbytes")
+
+    def __init__(self, key: str, signature: Tuple[int, int], text: Optional[str]) -> None:
+        self.key = key
+        self.signature = signature
+        self.text = text
+        self.normalized: Optional[Normalized] = None
+        self.nbytes = _sizeof(text)
+
+
+def _sizeof(value: object) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, tuple):  # (normalised text, origin map); the map holds ints outside the small-int cache
+        norm, origin = value
+        return sys.getsizeof(norm) + (sys.getsizeof(origin) + 28 * len(origin) if origin else 0)
+    return sys.getsizeof(value)
+
+
+class ContentCache:
+    """Byte-bounded LRU of note text keyed by path, validated by stat metadata.
+
+    Parameters:
+        max_bytes: Budget for the cached strings (and origin maps).
+    """
+
+    def __init__(self, max_bytes: int = CONTENT_CACHE_MB << 20) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def text(self, path: Union[str, Path]) -> Optional[str]:
+        """Extracted text of ``path`` (None if it cannot be indexed, see read_document())."""
+        entry = self._entry(path)
+        return entry.text if entry is not None else None
+
+    def normalized(self, path: Union[str, Path]) -> Optional[Normalized]:
+        """(normalised text, origin map) of ``path``; computed once per version of the note."""
+        entry = self._entry(path)
+        if entry is None or entry.text is None:
+            return None
+        if entry.normalized is None:
+            normalized = TextPipeline.normalize(entry.text)
+            with self._lock:
+                if entry.normalized is None:
+                    entry.normalized = normalized
+                    self._charge(entry, _sizeof(normalized))
+        return entry.normalized
+
+    def discard(self, path: Union[str, Path]) -> None:
+        with self._lock:
+            entry = self._entries.pop(str(path), None)
+            if entry is not None:
+                self.nbytes -= entry.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+    def _entry(self, path: Union[str, Path]) -> Optional[_Entry]:
+        key = str(path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            self.discard(key)
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        try:
+            text = read_document(key)
+        except OSError:
+            self.discard(key)
+            return None
+        entry = _Entry(key, signature, text)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            if entry.nbytes <= self.max_bytes:
+                self._entries[key] = entry
+                self.nbytes += entry.nbytes
+                self._evict()
+        return entry
+
+    def _charge(self, entry: _Entry, nbytes: int) -> None:
+        """Account ``nbytes`` more for ``entry`` (lock held)."""
+        entry.nbytes += nbytes
+        if self._entries.get(entry.key) is entry:
+            self.nbytes += nbytes
+            self._entries.move_to_end(entry.key)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self.nbytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.nbytes -= entry.nbytes
+
+
+_SHARED: Optional[ContentCache] = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_content_cache() -> ContentCache:
+    """The process-wide cache (budget: OBSIDIAN_CONTENT_CACHE_MB, default CONTENT_CACHE_MB)."""
+    global _SHARED
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            mb = float(os.getenv("OBSIDIAN_CONTENT_CACHE_MB", str(CONTENT_CACHE_MB)))
+            _SHARED = ContentCache(max_bytes=int(mb * (1 << 20)))
+        return _SHARED
+
+
+__all__ = ["CONTENT_CACHE_MB", "ContentCache", "get_content_cache"]
@@ -0,0 +1,137 @@
+"""Short-lived cursors over ranked search results (pagination).
+
+Responsibilities:
+- ResultCursor: the not yet returned part of one search, i.e. a
+  best-first merge of per-shard HitStreams plus hits that were taken but
+  not returned (push_back(); e.g. left out by the token budget).
+- CursorCache: cursor id -> ResultCursor with a TTL and an entry cap.
+- take(n, mmr_lambda) diversifies each page over MMR_POOL * n candidates
+  and drops near-duplicates of hits returned on earlier pages (record()).
+
+Notes:
+- A page costs O(page): the ranking is computed once, sections are only
+  read when a page takes them.
+- A cursor whose index changed since it was ranked is ``stale`` and is
+  dropped by the cache; callers re-run the search.
+"""
+from __future__ import annotations
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from .diversity import MMR_POOL, diversify
+from .index import HitStream, SearchHit
+
+CURSOR_TTL = 300.0  # seconds a cursor stays valid after its last use
+CURSOR_CACHE_SIZE = 32  # cursors kept (each holds the score table of one query)
+
+
+class ResultCursor:
+    """Remaining results of one (possibly sharded) search, best first.
+
+    Parameters:
+        streams: One HitStream per shard (scores comparable across them).
+        query: The query that was ranked (echoed on later pages).
+        partial: The ranking was cut by a deadline (reported on every page).
+        coverage: Share of the vaults that was ranked.
+    """
+
+    def __init__(
+        self, streams: Sequence[HitStream], query: str = "", partial: bool = False, coverage: float = 1.0
+    ) -> None:
+        self.streams = list(streams)
+        self.query = query
+        self.partial = partial
+        self.coverage = coverage
+        self.returned = 0  # hits handed out so far (rank offset of the next page)
+        self.seen: List[int] = []  # signatures of the returned hits
+        self._pending: List[SearchHit] = []
+
+    @property
+    def stale(self) -> bool:
+        return any(stream.stale for stream in self.streams)
+
+    @property
+    def exhausted(self) -> bool:
+        return not self._pending and all(stream.peek() is None for stream in self.streams)
+
+    def take(self, n: int, mmr_lambda: Optional[float] = None) -> List[SearchHit]:
+        """Up to ``n`` hits: pushed-back hits first, then the best stream heads.
+
+        With ``mmr_lambda`` the hits are picked by diversify() from the
+        next ``MMR_POOL * n``; the others are pushed back.
+        """
+        if mmr_lambda is not None:
+            picked, rest = diversify(self._next(n * MMR_POOL), n, mmr_lambda, self.seen)
+            self.push_back(rest)
+            return picked
+        return self._next(n)
+
+    def record(self, hits: List[SearchHit]) -> None:
+        """Count ``hits`` as returned (page offset, near-duplicates of later pages)."""
+        self.returned += len(hits)
+        self.seen.extend(hit.signature for hit in hits)
+
+    def _next(self, n: int) -> List[SearchHit]:
+        hits = self._pending[:n]
+        self._pending = self._pending[n:]
+        while len(hits) < n:
+            heads = [(stream.peek(), stream) for stream in self.streams]
+            heads = [(hit, stream) for hit, stream in heads if hit is not None]
+            if not heads:
+                break
+            # same order as sharded.merge_ranked()
+            _, stream = min(heads, key=lambda item: (-item[0].score, item[0].shard or "", item[0].chunk_id))
+            hits.append(stream.pop())
+        return hits
+
+    def push_back(self, hits: List[SearchHit]) -> None:
+        """Return taken but unused hits; the next take() starts with them."""
+        self._pending = list(hits) + self._pending
+
+
+class CursorCache:
+    """Thread-safe cursor store with expiry (``ttl`` seconds) and LRU eviction."""
+
+    def __init__(self, ttl: float = CURSOR_TTL, max_entries: int = CURSOR_CACHE_SIZE) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, ResultCursor]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, cursor: ResultCursor) -> str:
+        cursor_id = secrets.token_urlsafe(9)
+        with self._lock:
+            self._expire()
+            self._entries[cursor_id] = (time.monotonic() + self.ttl, cursor)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cursor_id
+
+    def get(self, cursor_id: str) -> Optional[ResultCursor]:
+        """The live cursor (its TTL is renewed), or None if unknown, expired or stale."""
+        with self._lock:
+            self._expire()
+            entry = self._entries.pop(cursor_id, None)
+            if entry is None or entry[1].stale:
+                return None
+            self._entries[cursor_id] = (time.monotonic() + self.ttl, entry[1])
+            return entry[1]
+
+    def discard(self, cursor_id: str) -> None:
+        with self._lock:
+            self._entries.pop(cursor_id, None)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for cursor_id in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[cursor_id]
+
+
+__all__ = ["CURSOR_CACHE_SIZE", "CURSOR_TTL", "CursorCache", "ResultCursor"]
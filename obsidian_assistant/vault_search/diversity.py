@@ -0,0 +1,130 @@
+"""Near-duplicate detection and result diversification.
+
+Templated and copied notes (daily notes, the same document imported in
+several places) produce sections whose top hits are almost identical.
+
+- simhash(): a 64-bit SimHash of a section body, computed at index time
+  over the distinct shingles of two consecutive body terms (without the
+  heading line, so dated daily notes still match) and kept in the chunk
+  table (unweighted, so one repeated line cannot outweigh the
+  rest of the section).  Two sections whose signatures differ in at most
+  NEAR_DUPLICATE_BITS bits are near-duplicates.
+- diversify(): Maximal Marginal Relevance over a ranked candidate pool.
+  Each slot takes the hit maximising
+  ``lam * score / best score - (1 - lam) * max similarity to the picked hits``;
+  near-duplicates of a picked hit are dropped and listed in its ``copies``.
+
+Notes:
+- One signature word per section: Hamming distance approximates cosine
+  distance of the shingle vectors, so no per-pair text comparison (and no
+  note read) is needed at query time.  similarity() maps the distance to
+  [0, 1], 0 for unrelated sections (about half the bits differ).
+- A signature of 0 means "no body terms" and never matches.
+- Bits are counted with one big-integer addition per shingle: every bit
+  of the hash owns a _LANE-bit counter in a packed integer (_SPREAD).
+"""
+from __future__ import annotations
+
+from hashlib import blake2b
+from typing import TYPE_CHECKING, Iterable, List, Sequence, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .index import SearchHit
+
+SIMHASH_BITS = 64
+NEAR_DUPLICATE_BITS = 8  # Hamming distance up to which two sections count as copies (sections are short)
+MMR_LAMBDA = 0.7  # 1.0 = pure relevance order (near-duplicates are still dropped)
+MMR_POOL = 3  # candidates considered per result slot
+
+_LANE = 32
+_LANE_MASK = (1 << _LANE) - 1
+# _SPREAD[k][byte]: the bits of hash byte k, each moved into its own lane
+_SPREAD = [
+    [sum(((byte >> bit) & 1) << ((8 * k + bit) * _LANE) for bit in range(8)) for byte in range(256)]
+    for k in range(SIMHASH_BITS // 8)
+]
+
+
+def simhash(terms: Sequence[str]) -> int:
+    """SimHash of a term sequence (distinct shingles of two terms; 0 if ``terms`` is empty)."""
+    if not terms:
+        return 0
+    features = set(zip(terms, terms[1:])) if len(terms) > 1 else {(terms[0],)}
+    counts = 0
+    for feature in features:
+        digest = blake2b("\x1f".join(feature).encode("utf-8"), digest_size=SIMHASH_BITS // 8).digest()
+        for k, byte in enumerate(digest):
+            counts += _SPREAD[k][byte]
+    signature = 0
+    for bit in range(SIMHASH_BITS):
+        if 2 * ((counts >> (bit * _LANE)) & _LANE_MASK) > len(features):
+            signature |= 1 << bit
+    return signature or 1  # keep 0 for "no terms"
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def similarity(a: int, b: int) -> float:
+    """Estimated similarity of two signatures in [0, 1] (0 if either is unknown)."""
+    if not a or not b:
+        return 0.0
+    return max(0.0, 1.0 - 2.0 * hamming(a, b) / SIMHASH_BITS)
+
+
+def near_duplicate(signature: int, others: Iterable[int], max_bits: int = NEAR_DUPLICATE_BITS) -> bool:
+    return bool(signature) and any(other and hamming(signature, other) <= max_bits for other in others)
+
+
+def diversify(
+    hits: Sequence["SearchHit"],
+    k: int,
+    lam: float = MMR_LAMBDA,
+    seen: Sequence[int] = (),
+    max_bits: int = NEAR_DUPLICATE_BITS,
+) -> Tuple[List["SearchHit"], List["SearchHit"]]:
+    """Pick up to ``k`` of the ranked ``hits`` by MMR; return (picked, not picked).
+
+    Near-duplicates of a picked hit are dropped from both lists and their
+    paths added to its ``copies``; hits that copy a signature in ``seen``
+    (returned earlier, e.g. on a previous page) are dropped.  Not picked
+    hits keep their rank order.
+    """
+    remaining = [hit for hit in hits if not near_duplicate(hit.signature, seen, max_bits)]
+    best = max((hit.score for hit in remaining), default=0.0)
+    redundancy = [0.0] * len(remaining)
+    picked: List["SearchHit"] = []
+    while remaining and len(picked) < k:
+        choice, value = 0, None
+        for i, hit in enumerate(remaining):
+            relevance = hit.score / best if best > 0 else 1.0
+            candidate = lam * relevance - (1 - lam) * redundancy[i]
+            if value is None or candidate > value:
+                choice, value = i, candidate
+        hit = remaining.pop(choice)
+        del redundancy[choice]
+        picked.append(hit)
+        kept, kept_redundancy = [], []
+        for other, r in zip(remaining, redundancy):
+            if near_duplicate(other.signature, (hit.signature,), max_bits):
+                if (other.shard, other.path) != (hit.shard, hit.path) and other.path not in hit.copies:
+                    hit.copies.append(other.path)
+                continue
+            kept.append(other)
+            kept_redundancy.append(max(r, similarity(other.signature, hit.signature)))
+        remaining, redundancy = kept, kept_redundancy
+    return picked, remaining
+
+
+__all__ = [
+    "MMR_LAMBDA",
+    "MMR_POOL",
+    "NEAR_DUPLICATE_BITS",
+    "SIMHASH_BITS",
+    "diversify",
+    "hamming",
+    "near_duplicate",
+    "similarity",
+    "simhash",
+]
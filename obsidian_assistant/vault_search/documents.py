@@ -0,0 +1,181 @@
+"""Note analysis shared by the serial and the parallel index builders.
+
+analyze_note() reads a note through its file type's extractor (see
+extractors.py), extracts the note's metadata (frontmatter, tags, aliases,
+wikilinks; see metadata.py), splits the rest into heading sections (see
+chunker.py), summarises the note and its sections (see summaries.py) and
+turns each section into a ChunkRecord plus per-field
+(term, position) lists produced by a TextPipeline; add_postings() folds
+those into a field -> term -> chunk_id -> positions map.  Both are plain module-level
+functions so process-pool workers can run them without pickling an index.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .chunker import split_sections
+from .diversity import simhash
+from .extractors import read_document
+from .metadata import NoteMeta, extract_metadata
+from .summaries import summarize_note
+from .tokenizer import TextPipeline, estimate_tokens
+
+FIELDS = ("title", "headings", "body")
+
+Postings = Dict[str, Dict[str, Dict[int, List[int]]]]
+FieldTokens = Dict[str, List[Tuple[str, int]]]
+
+
+@dataclass
+class NoteRecord:
+    path: str  # vault-relative POSIX path including the suffix (".md", ".canvas", ...)
+    title: str
+    mtime: float
+    size: int
+    inode: int = 0
+    chunks: List[int] = field(default_factory=list)  # chunk ids in document order
+    tags: List[str] = field(default_factory=list)  # normalised, without "#"
+    aliases: List[str] = field(default_factory=list)
+    links: List[str] = field(default_factory=list)  # normalised wikilink targets
+    summary: str = ""  # extractive summary of the note
+
+    def signature(self) -> Tuple[float, int, int]:
+        return (self.mtime, self.size, self.inode)
+
+
+@dataclass
+class ChunkRecord:
+    """One heading section of a note (the unit that is indexed and ranked)."""
+
+    note_id: int
+    heading: Optional[str]  # None for the text before the first heading
+    heading_path: List[str]
+    start: int  # character offsets of the section in the note
+    end: int
+    blocks: List[Tuple[str, int, int]] = field(default_factory=list)  # (^block id, start, end)
+    tokens: int = 0  # estimated LLM tokens of the section text
+    lengths: Dict[str, int] = field(default_factory=dict)  # index tokens per field
+    simhash: int = 0  # near-duplicate signature of the body (see diversity.py; 0 = empty)
+    summary: str = ""  # extractive summary of the section
+
+
+def empty_postings() -> Postings:
+    return {f: {} for f in FIELDS}
+
+
+def analyze_text(
+    title: str, text: str, pipeline: TextPipeline, meta: Optional[NoteMeta] = None
+) -> Tuple[List[Tuple[ChunkRecord, FieldTokens]], str]:
+    """Split a note into sections and their indexed fields; also return the note summary.
+
+    Body positions are relative to the section start so they map back to
+    offsets in ``text[chunk.start:chunk.end]``; the heading path is indexed
+    a second time as its own field for boosting, and aliases count as title.
+    The frontmatter block is not part of any section.  ``note_id`` is left
+    at -1 for the caller to fill in.
+    """
+    meta = meta or extract_metadata(text)
+    title_tokens = pipeline.positioned("\n".join([title, *meta.aliases]))
+    analyzed = []
+    bodies = []
+    for section in split_sections(text, start=meta.body_start):
+        body = text[section.start:section.end]
+        body_tokens = pipeline.tokens(body)
+        bodies.append((body, body_tokens))
+        field_tokens = {
+            "title": title_tokens,
+            "headings": pipeline.positioned("\n".join(section.heading_path)),
+            "body": [(t.term, t.position) for t in body_tokens],
+        }
+        chunk = ChunkRecord(
+            note_id=-1,
+            heading=section.heading,
+            heading_path=section.heading_path,
+            start=section.start,
+            end=section.end,
+            blocks=section.blocks,
+            tokens=estimate_tokens(body),
+            lengths={f: len(toks) for f, toks in field_tokens.items()},
+            simhash=simhash(_content_terms(section.heading, field_tokens["body"], pipeline)),
+        )
+        analyzed.append((chunk, field_tokens))
+    summaries, note_summary = summarize_note(bodies)
+    for (chunk, _), summary in zip(analyzed, summaries):
+        chunk.summary = summary
+    return analyzed, note_summary
+
+
+def _content_terms(heading: Optional[str], body: List[Tuple[str, int]], pipeline: TextPipeline) -> List[str]:
+    """Body terms without the leading heading line (for the near-duplicate signature)."""
+    terms = [term for term, _ in body]
+    head = [term for term, _ in pipeline.positioned(heading)] if heading else []
+    return terms[len(head):] if head and terms[:len(head)] == head else terms
+
+
+def analyze_note(
+    docs_path: Path, rel_path: str, pipeline: TextPipeline, note_id: int
+) -> Optional[Tuple[NoteRecord, List[Tuple[ChunkRecord, FieldTokens]]]]:
+    """Read (see extractors.py) and analyse one note; None if it is unreadable, binary or too large."""
+    md_file = docs_path / rel_path
+    try:
+        text = read_document(md_file)
+        st = md_file.stat()
+    except OSError:
+        return None
+    if text is None:
+        return None
+    meta = extract_metadata(text)
+    chunks, summary = analyze_text(md_file.stem, text, pipeline, meta)
+    for chunk, _ in chunks:
+        chunk.note_id = note_id
+    record = NoteRecord(
+        path=rel_path,
+        title=md_file.stem,
+        mtime=st.st_mtime,
+        size=st.st_size,
+        inode=st.st_ino,
+        tags=meta.tags,
+        aliases=meta.aliases,
+        links=meta.links,
+        summary=summary,
+    )
+    return record, chunks
+
+
+def add_postings(postings: Postings, chunk_id: int, field_tokens: FieldTokens) -> List[str]:
+    """Add one chunk's tokens to ``postings``; return its distinct terms (sorted)."""
+    terms = set()
+    for f, tokens in field_tokens.items():
+        # group positions per term first so each global posting list is touched once
+        local: Dict[str, List[int]] = {}
+        for term, pos in tokens:
+            positions = local.get(term)
+            if positions is None:
+                local[term] = [pos]
+            else:
+                positions.append(pos)
+        field_postings = postings[f]
+        for term, positions in local.items():
+            plist = field_postings.get(term)
+            if plist is None:
+                field_postings[term] = {chunk_id: positions}
+            else:
+                plist[chunk_id] = positions
+                field_postings[term] = plist  # write back (postings may be file-backed)
+        terms.update(local)
+    return sorted(terms)
+
+
+__all__ = [
+    "FIELDS",
+    "ChunkRecord",
+    "FieldTokens",
+    "NoteRecord",
+    "Postings",
+    "add_postings",
+    "analyze_note",
+    "analyze_text",
+    "empty_postings",
+]
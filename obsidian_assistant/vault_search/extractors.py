@@ -0,0 +1,256 @@
+"""Per file type text extraction for the vault index.
+
+Every indexed file goes through read_document(): the extractor registered
+for its suffix turns the decoded file into Markdown-like text.  Sections,
+metadata, summaries, postings and snippets are all computed over that text,
+so every file type feeds the same index and the same search tool.
+
+Built-in extractors:
+- ``.md``: the note as it is.
+- ``.canvas``: Obsidian JSON Canvas boards.  Cards are emitted in reading
+  order (top to bottom, left to right) and grouped under a heading per
+  group node.  Text cards keep their Markdown, file cards become
+  ``[[wikilinks]]`` (so they enter the link graph) and link cards keep
+  their URL.  Each card is followed by its outgoing edges
+  (``→ target card (edge label)``).
+- ``.txt``: plain text.
+- ``.csv``: one line per row, ``column: value`` pairs joined by `` | ``.
+
+Guards (checked before anything is decoded):
+- Files larger than the extractor's ``max_bytes`` are skipped.
+- Files whose first bytes match a known binary signature (MAGIC), or that
+  contain a NUL byte in their first SNIFF_BYTES, are skipped.  The rest of
+  such a file is never read.
+
+Notes:
+- Text is decoded as UTF-8 with universal newlines, as Path.read_text()
+  does (notes keep a leading BOM, so their offsets match older indexes;
+  attachments drop it); undecodable files are skipped.
+- register_extractor() adds or replaces a file type.  Process-pool builds
+  (builder.py) see only extractors registered at import time.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+SNIFF_BYTES = 8192
+MAX_NOTE_BYTES = 8 << 20
+MAX_ATTACHMENT_BYTES = 2 << 20
+MAX_CSV_ROWS = 5000
+CARD_LABEL_CHARS = 60
+
+# leading bytes of common binary formats (attachments renamed or mislabelled as text)
+MAGIC = (
+    b"%PDF", b"\x89PNG", b"\xff\xd8\xff", b"GIF8", b"PK\x03\x04", b"\x1f\x8b", b"7z\xbc\xaf", b"Rar!",
+    b"\x7fELF", b"RIFF", b"OggS", b"fLaC", b"ID3", b"\xd0\xcf\x11\xe0", b"SQLite format 3\x00",
+    b"wOFF", b"wOF2", b"\x00\x01\x00\x00",
+)
+
+
+@dataclass(frozen=True)
+class Extractor:
+    """How one file type becomes indexable text.
+
+    Parameters:
+        extract: Decoded file text -> Markdown-like text (raise ValueError to skip the file).
+        max_bytes: Files above this size are not indexed.
+        encoding: Codec of the file ("utf-8-sig" drops a leading BOM).
+    """
+
+    extract: Callable[[str], str]
+    max_bytes: int = MAX_ATTACHMENT_BYTES
+    encoding: str = "utf-8-sig"
+
+
+def _identity(text: str) -> str:
+    return text
+
+
+def is_binary(head: bytes) -> bool:
+    """True if ``head`` (the first bytes of a file) looks like a binary format."""
+    return head.startswith(MAGIC) or head[4:8] == b"ftyp" or b"\x00" in head[:SNIFF_BYTES]
+
+
+# ----------------------------------------------------------------------
+# Canvas
+# ----------------------------------------------------------------------
+def _card_label(node: Dict[str, object]) -> str:
+    kind = node.get("type")
+    if kind == "file":
+        label = str(node.get("file") or "")
+    elif kind == "link":
+        label = str(node.get("url") or "")
+    elif kind == "group":
+        label = str(node.get("label") or "")
+    else:
+        lines = [line.strip().lstrip("#").strip() for line in str(node.get("text") or "").splitlines()]
+        label = next((line for line in lines if line), "")
+    return label if len(label) <= CARD_LABEL_CHARS else label[:CARD_LABEL_CHARS - 1].rstrip() + "…"
+
+
+def _card_text(node: Dict[str, object]) -> str:
+    kind = node.get("type")
+    if kind == "file":
+        target = str(node.get("file") or "")
+        if not target:
+            return ""
+        target = target[:-3] if target.lower().endswith(".md") else target
+        subpath = str(node.get("subpath") or "")
+        return f"[[{target}{subpath}]]"
+    if kind == "link":
+        return str(node.get("url") or "")
+    return str(node.get("text") or "").strip()
+
+
+def _inside(node: Dict[str, object], group: Dict[str, object]) -> bool:
+    try:
+        x, y = float(node.get("x", 0)), float(node.get("y", 0))
+        gx, gy = float(group.get("x", 0)), float(group.get("y", 0))
+        return gx <= x < gx + float(group.get("width", 0)) and gy <= y < gy + float(group.get("height", 0))
+    except (TypeError, ValueError):
+        return False
+
+
+def _position(node: Dict[str, object]) -> Tuple[float, float]:
+    try:
+        return float(node.get("y", 0)), float(node.get("x", 0))
+    except (TypeError, ValueError):
+        return 0.0, 0.0
+
+
+def extract_canvas(text: str) -> str:
+    """Markdown for a JSON Canvas board (see module docstring)."""
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("not a canvas")
+    nodes = [n for n in data.get("nodes") or [] if isinstance(n, dict) and n.get("id") is not None]
+    edges = [e for e in data.get("edges") or [] if isinstance(e, dict)]
+    labels = {node["id"]: _card_label(node) for node in nodes}
+    outgoing: Dict[object, List[str]] = {}
+    for edge in edges:
+        target = labels.get(edge.get("toNode"))
+        if edge.get("fromNode") in labels and target:
+            label = str(edge.get("label") or "").strip()
+            outgoing.setdefault(edge["fromNode"], []).append(f"→ {target}" + (f" ({label})" if label else ""))
+
+    groups = sorted((n for n in nodes if n.get("type") == "group"), key=_position)
+    cards = sorted((n for n in nodes if n.get("type") != "group"), key=_position)
+    members: Dict[object, List[Dict[str, object]]] = {g["id"]: [] for g in groups}
+    loose: List[Dict[str, object]] = []
+    for card in cards:
+        # innermost group: the smallest one containing the card
+        containing = [g for g in groups if _inside(card, g)]
+        if containing:
+            best = min(containing, key=lambda g: float(g.get("width", 0) or 0) * float(g.get("height", 0) or 0))
+            members[best["id"]].append(card)
+        else:
+            loose.append(card)
+
+    blocks: List[str] = []
+
+    def emit(card: Dict[str, object]) -> None:
+        body = _card_text(card)
+        links = outgoing.get(card["id"], [])
+        if body or links:
+            blocks.append("\n".join([body, *links]).strip())
+
+    for card in loose:
+        emit(card)
+    for group in groups:
+        blocks.append(f"# {labels[group['id']] or 'Group'}")
+        for card in members[group["id"]]:
+            emit(card)
+        for link in outgoing.get(group["id"], []):
+            blocks.append(link)
+    return "\n\n".join(blocks) + "\n"
+
+
+# ----------------------------------------------------------------------
+# CSV
+# ----------------------------------------------------------------------
+def extract_csv(text: str) -> str:
+    """One line per row: ``header: value`` pairs (the first row is the header)."""
+    try:
+        dialect = csv.Sniffer().sniff(text[:SNIFF_BYTES], delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    rows = csv.reader(io.StringIO(text), dialect)
+    header = [h.strip() for h in next(rows, [])]
+    lines = []
+    for count, row in enumerate(rows):
+        if count >= MAX_CSV_ROWS:
+            break
+        pairs = [
+            f"{header[i] if i < len(header) and header[i] else f'column {i + 1}'}: {value.strip()}"
+            for i, value in enumerate(row)
+            if value.strip()
+        ]
+        if pairs:
+            lines.append(" | ".join(pairs))
+    return "\n".join([" | ".join(h for h in header if h), *lines]) + "\n"
+
+
+EXTRACTORS: Dict[str, Extractor] = {
+    ".md": Extractor(_identity, MAX_NOTE_BYTES, "utf-8"),
+    ".canvas": Extractor(extract_canvas, MAX_NOTE_BYTES),
+    ".txt": Extractor(_identity),
+    ".csv": Extractor(extract_csv),
+}
+
+
+def register_extractor(suffix: str, extractor: Optional[Extractor]) -> None:
+    """Index files with ``suffix`` (e.g. ".org") through ``extractor``; None stops indexing them."""
+    suffix = suffix.lower()
+    if extractor is None:
+        EXTRACTORS.pop(suffix, None)
+    else:
+        EXTRACTORS[suffix] = extractor
+
+
+def is_indexed(path: Union[str, Path]) -> bool:
+    """True if files named like ``path`` have an extractor."""
+    return Path(path).suffix.lower() in EXTRACTORS
+
+
+def read_document(path: Union[str, Path]) -> Optional[str]:
+    """Indexable text of ``path``; None if it has no extractor, is too large, binary or undecodable.
+
+    OSError (missing or unreadable file) propagates to the caller.
+    """
+    path = Path(path)
+    extractor = EXTRACTORS.get(path.suffix.lower())
+    if extractor is None:
+        return None
+    with path.open("rb") as f:
+        if extractor.max_bytes and (f.seek(0, 2) > extractor.max_bytes):
+            return None
+        f.seek(0)
+        head = f.read(SNIFF_BYTES)
+        if is_binary(head):
+            return None
+        data = head + f.read()
+    try:
+        text = data.decode(extractor.encoding).replace("\r\n", "\n").replace("\r", "\n")
+    except UnicodeDecodeError:
+        return None
+    try:
+        return extractor.extract(text)
+    except (ValueError, TypeError, KeyError, csv.Error):
+        return None
+
+
+__all__ = [
+    "EXTRACTORS",
+    "Extractor",
+    "extract_canvas",
+    "extract_csv",
+    "is_binary",
+    "is_indexed",
+    "read_document",
+    "register_extractor",
+]
@@ -0,0 +1,216 @@
+"""Note link graph (outgoing links, backlinks, unresolved links).
+
+The graph is derived from the wikilink targets stored on each NoteRecord and
+kept in compressed sparse row (CSR) form: ``out_ptr[i]:out_ptr[i + 1]``
+slices ``out_idx`` to give the notes that note ``i`` links to, and the
+``in_*`` arrays hold the transposed graph (backlinks).  Both are
+``array("i")``, i.e. 4 bytes per edge instead of a Python list of ints.
+
+Maintenance:
+- A note edited in place only changes its own out-edges; update_note()
+  re-resolves them into a small overlay that outgoing()/backlinks() consult
+  before the CSR rows.
+- Adding, removing or renaming a note can change how *other* notes' links
+  resolve, so it marks the graph stale; the next reader rebuilds it in
+  O(notes + links).  A large overlay is folded back the same way.
+
+Link resolution follows Obsidian: a target matches a note path (without
+``.md``, case-insensitive) or, failing that, a note file name; among several
+notes with the same name the shortest path wins.  Canvases and indexed text
+attachments (see extractors.py) are notes under their full file name; other
+targets with a file extension (images, PDFs) are attachments and are
+ignored.
+
+PageRank (power iteration over the CSR rows) is computed lazily after a
+rebuild and turned into a multiplicative ranking boost.
+"""
+from __future__ import annotations
+
+import posixpath
+from array import array
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence
+
+from .metadata import normalize_value
+
+if TYPE_CHECKING:
+    from .documents import NoteRecord
+
+OVERLAY_LIMIT = 256  # edited notes kept in the overlay before a rebuild
+PAGERANK_DAMPING = 0.85
+PAGERANK_ITERATIONS = 30
+PAGERANK_TOLERANCE = 1e-6
+
+
+def _note_key(path: str) -> str:
+    return normalize_value(path[:-3] if path.lower().endswith(".md") else path)
+
+
+def _is_attachment(target: str) -> bool:
+    return bool(posixpath.splitext(target.rsplit("/", 1)[-1])[1])
+
+
+class LinkGraph:
+    """CSR adjacency over note ids (see module docstring)."""
+
+    def __init__(self) -> None:
+        self.size = 0
+        self.out_ptr = array("i", [0])
+        self.out_idx = array("i")
+        self.in_ptr = array("i", [0])
+        self.in_idx = array("i")
+        self.unresolved: Dict[str, List[int]] = {}  # target -> source note ids
+        self.stale = True
+        self._names: Dict[str, int] = {}
+        self._overlay: Dict[int, List[int]] = {}
+        self._live: List[int] = []
+        self._rank: Optional[array] = None
+        self._rank_range = (0.0, 0.0)
+
+    # ------------------------------------------------------------------
+    # Build / maintenance
+    # ------------------------------------------------------------------
+    def rebuild(self, notes: Sequence[Optional["NoteRecord"]]) -> None:
+        names: Dict[str, int] = {}
+        by_name: Dict[str, List[int]] = {}
+        for note_id, note in enumerate(notes):
+            if note is None:
+                continue
+            key = _note_key(note.path)
+            names[key] = note_id
+            by_name.setdefault(key.rsplit("/", 1)[-1], []).append(note_id)
+        for name, ids in by_name.items():
+            if name not in names:
+                names[name] = min(ids, key=lambda nid: (len(notes[nid].path), notes[nid].path))
+        self._names = names
+        self._live = [nid for nid, note in enumerate(notes) if note is not None]
+
+        self.size = len(notes)
+        self.unresolved = {}
+        out_ptr = array("i", [0])
+        out_idx = array("i")
+        in_deg = [0] * self.size
+        for note_id, note in enumerate(notes):
+            if note is not None:
+                targets = self._resolve(note_id, note.links)
+                out_idx.extend(targets)
+                for target in targets:
+                    in_deg[target] += 1
+            out_ptr.append(len(out_idx))
+        in_ptr = array("i", [0])
+        for deg in in_deg:
+            in_ptr.append(in_ptr[-1] + deg)
+        in_idx = array("i", bytes(4 * len(out_idx)))
+        fill = list(in_ptr[:-1])
+        for source in range(self.size):
+            for target in out_idx[out_ptr[source]:out_ptr[source + 1]]:
+                in_idx[fill[target]] = source
+                fill[target] += 1
+        self.out_ptr, self.out_idx, self.in_ptr, self.in_idx = out_ptr, out_idx, in_ptr, in_idx
+        self._overlay = {}
+        self._rank = None
+        self.stale = False
+
+    def _resolve(self, note_id: int, links: Iterable[str]) -> List[int]:
+        targets: List[int] = []
+        for link in links:
+            target = self._names.get(link)
+            if target is None:
+                target = self._names.get(link.rsplit("/", 1)[-1])
+            if target is None:
+                if not _is_attachment(link):
+                    self.unresolved.setdefault(link, []).append(note_id)
+            elif target != note_id and target not in targets:
+                targets.append(target)
+        return targets
+
+    def mark_stale(self) -> None:
+        self.stale = True
+
+    def update_note(self, note_id: int, note: "NoteRecord") -> None:
+        """Re-resolve the out-links of a note edited in place."""
+        if self.stale or note_id >= self.size:
+            self.stale = True
+            return
+        for sources in self.unresolved.values():
+            if note_id in sources:
+                sources.remove(note_id)
+        self._overlay[note_id] = self._resolve(note_id, note.links)
+        self.unresolved = {t: s for t, s in self.unresolved.items() if s}
+        if len(self._overlay) > OVERLAY_LIMIT:
+            self.stale = True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def outgoing(self, note_id: int) -> List[int]:
+        if note_id in self._overlay:
+            return list(self._overlay[note_id])
+        if note_id >= self.size:
+            return []
+        return list(self.out_idx[self.out_ptr[note_id]:self.out_ptr[note_id + 1]])
+
+    def backlinks(self, note_id: int) -> List[int]:
+        sources: List[int] = []
+        if note_id < self.size:
+            sources = [
+                s for s in self.in_idx[self.in_ptr[note_id]:self.in_ptr[note_id + 1]]
+                if s not in self._overlay
+            ]
+        sources.extend(s for s, targets in self._overlay.items() if note_id in targets)
+        return sorted(sources)
+
+    def neighbours(self, note_id: int) -> List[int]:
+        """Outgoing links first, then backlinks (deduplicated)."""
+        return list(dict.fromkeys(self.outgoing(note_id) + self.backlinks(note_id)))
+
+    def edge_count(self) -> int:
+        return len(self.out_idx)
+
+    def pagerank(self) -> array:
+        """PageRank over the CSR rows (cached until the next rebuild)."""
+        if self._rank is not None:
+            return self._rank
+        live = self._live
+        n = max(len(live), 1)
+        rank = array("d", [0.0]) * self.size
+        for i in live:
+            rank[i] = 1.0 / n
+        out_deg = [self.out_ptr[i + 1] - self.out_ptr[i] for i in range(self.size)]
+        for _ in range(PAGERANK_ITERATIONS):
+            dangling = sum(rank[i] for i in live if out_deg[i] == 0)
+            base = (1.0 - PAGERANK_DAMPING) / n + PAGERANK_DAMPING * dangling / n
+            new = array("d", [0.0]) * self.size
+            for i in live:
+                if out_deg[i]:
+                    share = PAGERANK_DAMPING * rank[i] / out_deg[i]
+                    for j in self.out_idx[self.out_ptr[i]:self.out_ptr[i + 1]]:
+                        new[j] += share
+            delta = 0.0
+            for i in live:
+                new[i] += base
+                delta += abs(new[i] - rank[i])
+            rank = new
+            if delta < PAGERANK_TOLERANCE:
+                break
+        self._rank = rank
+        values = [rank[i] for i in live]
+        self._rank_range = (min(values), max(values)) if values else (0.0, 0.0)
+        return rank
+
+    def boost(self, note_id: int, weight: float) -> float:
+        """``1 + weight * (rank - min) / (max - min)``; 1.0 when every rank is equal."""
+        rank = self.pagerank()
+        low, high = self._rank_range
+        if note_id >= len(rank) or high - low <= 1e-12:
+            return 1.0
+        return 1.0 + weight * (rank[note_id] - low) / (high - low)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "edges": self.edge_count(),
+            "unresolved_links": sum(len(s) for s in self.unresolved.values()),
+            "overlay": len(self._overlay),
+        }
+
+
+__all__ = ["LinkGraph", "OVERLAY_LIMIT"]
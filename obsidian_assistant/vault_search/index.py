@@ -0,0 +1,1303 @@
+"""Persistent inverted index over an Obsidian vault.
+
+Responsibilities:
+- Scan the vault once, split every note into heading sections (chunks) and
+  keep per-field term -> postings (chunk id + token positions) for title,
+  headings and body.
+- Persist the index on disk so later tool calls and server restarts reuse it
+  instead of re-reading every note.
+- Keep a structured side index (tag / alias / link -> note ids, see
+  metadata.py) for fielded queries (see query.py).  Filters narrow the
+  candidate sections before scoring, using only in-memory tables.
+- Rank sections with BM25F (see bm25.py), boosted by the note's PageRank in
+  the link graph (see graph.py), and read only the notes behind the
+  returned sections again, to cut the section passage.  Note text comes
+  from the shared content cache (see content.py), so unchanged notes are
+  not read again by later queries.  Optionally expand each hit to its
+  1-hop link neighbours.
+- Queries whose terms occur in many sections run in two phases: an
+  in-memory outline index (titles, aliases, headings; see outline.py)
+  picks candidate notes and BM25F scores only their sections.
+- Substring, regex and typo-tolerant lookups go through a trigram index
+  over the term dictionary (see trigram.py), built on first use.
+- Every note and section carries an extractive summary computed at index
+  time (see summaries.py); with ``summaries`` hits carry those instead of
+  passages and no note is read at all.
+- Optionally rank by meaning instead of (or fused with) exact terms: the
+  semantic / hybrid modes use the offline LSA vectors of semantic.py
+  (NumPy; without it they fall back to lexical ranking).
+
+Storage:
+    <index_dir>/vault_index.bin, a binary file read through mmap (see
+    segment.py): a sorted term dictionary, varint posting lists and the
+    note / section tables.  Loading maps it instead of parsing it (only the
+    note records are decoded up front; sections and posting lists are
+    decoded on access), so server workers share its pages; changes since the last save live in small
+    in-memory deltas.  save() writes a new file and swaps it in atomically
+    (a per-writer tmp file + os.replace, so workers sharing the directory
+    never mix their writes).  Section vectors live in <index_dir>/semantic/
+    (see semantic.py).
+    index_dir defaults to $OBSIDIAN_INDEX_DIR/<vault hash>, falling back to
+    ~/.cache/obsidian_assistant/<vault hash>.  snapshot.py packs the whole
+    directory into one checksummed file for fast cold starts elsewhere.
+
+Notes:
+- Note and chunk ids are positions in their tables and only meaningful
+  inside one index file.  A re-indexed note reuses its old chunk ids first,
+  so edits do not grow the chunk table.
+- "Notes" include every file type with an extractor (extractors.py):
+  Markdown, JSON Canvas boards, .txt and .csv attachments.
+- Section splitting lives in chunker.py, field analysis in documents.py; large cold builds are sharded over
+  worker processes by builder.py.
+- Text analysis (NFKC, case folding, CJK uni/bigrams, stopwords) is done by
+  tokenizer.TextPipeline; queries use its query mode.
+- The file carries INDEX_FORMAT_VERSION (plus the segment layout version)
+  and the pipeline signature; a mismatch (or a different vault path) makes
+  load() fail so the caller rebuilds.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import stat
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, MutableMapping, MutableSequence, Optional, Sequence, Set, Tuple
+
+from .bm25 import BM25FScorer, CollectionStats
+from .builder import BuildProgress, merge_shard, parallel_analyze, resolve_workers
+from .chunker import heading_anchor
+from .content import get_content_cache
+from .documents import FIELDS, ChunkRecord, NoteRecord, add_postings, analyze_note, empty_postings
+from .extractors import is_indexed
+from .graph import LinkGraph
+from .metadata import META_FIELDS, link_keys, meta_keys, normalize_value, tag_keys
+from .outline import OUTLINE_MIN_POSTINGS, OUTLINE_NOTES, OUTLINE_PAD_POSTINGS, OutlineIndex
+from .query import ParsedQuery, parse_query
+from .segment import FieldPostings, SegmentReader, open_segment, replacing, write_segment
+from .semantic import SEMANTIC_DIRNAME, SemanticIndex, reciprocal_rank_fusion, semantic_available
+from .tokenizer import TextPipeline, Token, estimate_tokens, is_cjk
+from .trigram import TermTrigrams, fuzzy_budget, literal_constraints, required_literals
+
+INDEX_FORMAT_VERSION = 9
+INDEX_FILENAME = "vault_index.bin"
+LEGACY_INDEX_FILENAME = "vault_index.json"  # format <= 6, removed on the next save
+PASSAGE_TOKENS = 400  # sections up to this size are returned whole
+PASSAGE_RADIUS = 300  # characters around the hit for larger sections
+MAX_SECTIONS_PER_NOTE = 2
+LINK_BOOST = 0.2  # weight of the PageRank boost (0 disables it)
+MAX_RELATED = 5  # linked notes listed per hit when expanding
+MAX_EXPANDED = 2  # neighbour sections added per hit when expanding
+NEIGHBOUR_WEIGHT = 0.5  # score factor for sections reached through a link
+SEARCH_MODES = ("lexical", "semantic", "hybrid")
+HYBRID_DEPTH = 200  # sections taken from each ranking before fusion
+FUZZY_EXPANSIONS = 3  # terms a word~ query expands to
+
+
+def default_index_dir(docs_path: str) -> Path:
+    """Per-vault index directory (stable hash of the resolved vault path)."""
+    base = os.getenv("OBSIDIAN_INDEX_DIR")
+    root = Path(base) if base else Path.home() / ".cache" / "obsidian_assistant"
+    digest = hashlib.sha1(str(Path(docs_path).resolve()).encode("utf-8")).hexdigest()[:16]
+    return root / digest
+
+
+@dataclass
+class SearchHit:
+    note_id: int
+    chunk_id: int
+    path: str
+    title: str
+    heading: Optional[str]
+    anchor: Optional[str]  # link fragment: heading text or "^block-id"
+    snippet: str
+    score: float = 0.0
+    tokens: int = 0  # estimated tokens of ``snippet``
+    section_tokens: int = 0  # estimated tokens of the whole section
+    start: int = 0  # character offsets of ``snippet`` in the note
+    end: int = 0
+    via: Optional[str] = None  # path of the hit whose link led here (expansion)
+    shard: Optional[str] = None  # vault name when searched through ShardedSearch
+    related: List[str] = field(default_factory=list)  # paths of linked notes (expansion)
+    signature: int = 0  # SimHash of the section body (see diversity.py)
+    copies: List[str] = field(default_factory=list)  # paths of near-duplicate sections left out
+    note_summary: Optional[str] = None  # summary of the whole note (summaries=True only)
+
+
+@dataclass
+class SearchDeadline:
+    """Time limit of one search and how much of the index it covered.
+
+    ``at`` is a time.perf_counter() value (None = unlimited).  Ranking and
+    regex verification check expired() between blocks of work; when it has
+    passed they stop, keep what they found and call cut() with the fraction
+    of sections covered.  Hits are still cut from the ranked sections.
+    """
+
+    at: Optional[float] = None
+    partial: bool = False
+    coverage: float = 1.0
+
+    @classmethod
+    def after(cls, ms: Optional[float]) -> "SearchDeadline":
+        return cls(time.perf_counter() + ms / 1000 if ms and ms > 0 else None)
+
+    def expired(self) -> bool:
+        return self.at is not None and time.perf_counter() >= self.at
+
+    def cut(self, coverage: float) -> None:
+        self.partial = True
+        self.coverage = min(self.coverage, max(coverage, 0.0))
+
+
+@dataclass
+class RefreshReport:
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.modified or self.removed)
+
+
+def _stat_signature(st: os.stat_result) -> Tuple[float, int, int]:
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+
+class VaultIndex:
+    """Inverted index for one vault.
+
+    Parameters:
+        docs_path: Vault root (or sub-directory) to index.
+        index_dir: Directory holding the persisted index file.
+        scorer: Ranking function (defaults to BM25FScorer()).
+        build_workers: Worker processes for cold builds (None = auto, 1 = serial).
+        pipeline: Text analysis (defaults to TextPipeline.from_env()).
+        link_boost: Weight of the PageRank boost (0 disables it).
+
+    The note table doubles as the file manifest: each record keeps the
+    (mtime, size, inode) it was indexed with, so refresh() only re-reads notes
+    whose signature changed (an inode of 0, as restored from a snapshot, is
+    unknown: mtime and size decide).  Postings point at the chunk table (one entry
+    per heading section).  Removed notes and chunks leave a None slot so the
+    remaining ids stay valid.  All public methods hold ``self.lock``.
+    """
+
+    def __init__(
+        self,
+        docs_path: str,
+        index_dir: Optional[str] = None,
+        scorer: Optional[BM25FScorer] = None,
+        build_workers: Optional[int] = None,
+        pipeline: Optional[TextPipeline] = None,
+        link_boost: float = LINK_BOOST,
+    ) -> None:
+        self.docs_path = Path(docs_path)
+        self.index_dir = Path(index_dir) if index_dir else default_index_dir(docs_path)
+        self.scorer = scorer or BM25FScorer()
+        self.build_workers = build_workers
+        self.pipeline = pipeline or TextPipeline.from_env()
+        self.lock = threading.RLock()
+        self.progress = BuildProgress()
+        self.ready = False
+        self.notes: List[Optional[NoteRecord]] = []
+        # chunk_id -> section (None = free slot); a plain list while building,
+        # segment.ChunkRecords (decoded on access) over the mapped file after load/save
+        self.chunks: MutableSequence[Optional[ChunkRecord]] = []
+        # field -> term -> chunk_id -> positions (plain dicts while building,
+        # segment.FieldPostings over the mapped index file after load/save)
+        self.postings: Dict[str, MutableMapping[str, Dict[int, List[int]]]] = empty_postings()
+        # chunk_id -> distinct terms (all fields), used to drop postings on update
+        self.chunk_terms: MutableMapping[int, List[str]] = {}
+        self._reader: Optional[SegmentReader] = None
+        self._path_ids: Dict[str, int] = {}
+        self._free_chunks: List[int] = []
+        # side index: "tag" / "alias" / "link" -> key -> note ids (derived from the note table)
+        self.meta: Dict[str, Dict[str, Set[int]]] = {f: {} for f in META_FIELDS}
+        self.graph = LinkGraph()  # rebuilt lazily, see link_graph()
+        self.link_boost = link_boost
+        self._semantic: Optional[SemanticIndex] = None  # created lazily, see semantic()
+        self._semantic_stale = True
+        self._term_grams: Optional[TermTrigrams] = None  # built lazily, see term_trigrams()
+        self._outline: Optional[OutlineIndex] = None  # built lazily, see outline()
+        self.content = get_content_cache()  # note text, shared with SmartRouter
+        self.built_at: float = 0.0
+        self.dirty = False
+        self.generation = 0  # bumped whenever chunk ids may change meaning (see HitStream)
+
+    @classmethod
+    def open(cls, docs_path: str, index_dir: Optional[str] = None) -> "VaultIndex":
+        """Load the persisted index (reconciling offline edits) or build it on first use."""
+        index = cls(docs_path, index_dir)
+        index.warm()
+        return index
+
+    def warm(self) -> None:
+        """Make the index queryable; concurrent callers wait on ``self.lock``."""
+        with self.lock:
+            if self.ready:
+                return
+            try:
+                self.progress.begin("loading")
+                if self.load():
+                    self.refresh()
+                else:
+                    self.build()
+                if self.dirty:
+                    self.progress.state = "saving"
+                    self.save()
+            except Exception as e:
+                self.progress.finish(error=str(e))
+                raise
+            self.ready = True
+            self.progress.finish()
+
+    @property
+    def index_file(self) -> Path:
+        return self.index_dir / INDEX_FILENAME
+
+    @property
+    def note_count(self) -> int:
+        return len(self._path_ids)
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.chunks) - len(self._free_chunks)
+
+    def live_notes(self) -> Iterator[Tuple[int, NoteRecord]]:
+        for note_id, note in enumerate(self.notes):
+            if note is not None:
+                yield note_id, note
+
+    def live_chunks(self) -> Iterator[Tuple[int, ChunkRecord]]:
+        for chunk_id, chunk in enumerate(self.chunks):
+            if chunk is not None:
+                yield chunk_id, chunk
+
+    # ------------------------------------------------------------------
+    # Build / incremental maintenance
+    # ------------------------------------------------------------------
+    def scan(self) -> Dict[str, os.stat_result]:
+        """Stat every indexable file under docs_path (no reads): rel path -> stat."""
+        found: Dict[str, os.stat_result] = {}
+        for path in self.docs_path.rglob("*"):
+            if not is_indexed(path):
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                found[path.relative_to(self.docs_path).as_posix()] = st
+        return found
+
+    def build(self, workers: Optional[int] = None) -> None:
+        """Full rebuild; shards over worker processes for large vaults."""
+        with self.lock:
+            self.progress.state = "scanning"
+            rel_paths = sorted(self.scan())
+            self.notes = [None] * len(rel_paths)
+            self.chunks = []
+            self.postings = empty_postings()
+            self.chunk_terms = {}
+            self._reader = None
+            self._term_grams = None
+            self._outline = None
+            self._free_chunks = []
+            n_workers = resolve_workers(workers if workers is not None else self.build_workers, len(rel_paths))
+            self.progress.state = "building"
+            self.progress.total = len(rel_paths)
+            self.progress.done = 0
+            self.progress.workers = n_workers
+            if n_workers > 1:
+                try:
+                    shards = list(parallel_analyze(
+                        str(self.docs_path), rel_paths, n_workers, self.progress, self.pipeline
+                    ))
+                    self.progress.state = "merging"
+                    for shard in sorted(shards, key=lambda r: r[0]):
+                        merge_shard(shard, self.notes, self.chunks, self.chunk_terms, self.postings)
+                except (OSError, RuntimeError) as e:  # e.g. BrokenProcessPool: fall back to serial
+                    self.progress.error = f"parallel_build_failed: {e}"
+                    return self.build(workers=1)
+            else:
+                for note_id, rel_path in enumerate(rel_paths):
+                    self._index_path(rel_path, note_id)
+                    self.progress.done += 1
+            self._path_ids = {note.path: nid for nid, note in self.live_notes()}
+            self._rebuild_meta()
+            self.graph.mark_stale()
+            self._semantic_stale = True
+            self.built_at = time.time()
+            self.generation += 1
+            self.scorer.invalidate()
+            self.dirty = True
+
+    def refresh(self) -> RefreshReport:
+        """Compare the stored manifest with the vault and re-index only the differences."""
+        started = time.perf_counter()
+        current = self.scan()
+        report = RefreshReport()
+        with self.lock:
+            for rel_path in [p for p in self._path_ids if p not in current]:
+                self._remove_path(rel_path)
+                report.removed.append(rel_path)
+            for rel_path in sorted(current):
+                self._sync_path(rel_path, current[rel_path], report)
+            self._finish_update(report)
+        report.elapsed_ms = (time.perf_counter() - started) * 1000
+        return report
+
+    def update_paths(self, paths: Iterable[str]) -> RefreshReport:
+        """Re-check only the given notes (absolute or vault-relative paths)."""
+        started = time.perf_counter()
+        report = RefreshReport()
+        with self.lock:
+            for path in dict.fromkeys(paths):
+                rel_path = self._relative(path)
+                if rel_path is None or not is_indexed(rel_path):
+                    continue
+                try:
+                    st = (self.docs_path / rel_path).stat()
+                except OSError:
+                    if rel_path in self._path_ids:
+                        self._remove_path(rel_path)
+                        report.removed.append(rel_path)
+                    continue
+                self._sync_path(rel_path, st, report)
+            self._finish_update(report)
+        report.elapsed_ms = (time.perf_counter() - started) * 1000
+        return report
+
+    def _relative(self, path: str) -> Optional[str]:
+        p = Path(path)
+        if not p.is_absolute():
+            return p.as_posix()
+        try:
+            return p.relative_to(self.docs_path).as_posix()
+        except ValueError:
+            return None
+
+    def _sync_path(self, rel_path: str, st: os.stat_result, report: RefreshReport) -> None:
+        note_id = self._path_ids.get(rel_path)
+        if note_id is None:
+            if self._index_path(rel_path) is not None:
+                report.added.append(rel_path)
+            return
+        note = self.notes[note_id]
+        if note is not None and note.signature() == _stat_signature(st):
+            return
+        if note is not None and not note.inode and (note.mtime, note.size) == (st.st_mtime, st.st_size):
+            note.inode = st.st_ino  # restored from a snapshot (see snapshot.py): unchanged, adopt the inode
+            self.dirty = True
+            return
+        self._remove_path(rel_path)
+        if self._index_path(rel_path, note_id) is not None:
+            report.modified.append(rel_path)
+        else:
+            report.removed.append(rel_path)
+
+    def _finish_update(self, report: RefreshReport) -> None:
+        if report.changed:
+            self.generation += 1
+            self.scorer.invalidate()
+            self._semantic_stale = True
+            self.dirty = True
+        if report.added or report.removed:
+            self.graph.mark_stale()  # note names changed: links may resolve differently
+        for rel_path in report.modified:
+            note_id = self._path_ids[rel_path]
+            self.graph.update_note(note_id, self.notes[note_id])
+
+    def link_graph(self) -> LinkGraph:
+        """The link graph, rebuilt first if notes were added or removed."""
+        with self.lock:
+            if self.graph.stale:
+                self.graph.rebuild(self.notes)
+            return self.graph
+
+    def term_trigrams(self) -> TermTrigrams:
+        """Trigram index over every indexed term (built on first use)."""
+        with self.lock:
+            if self._term_grams is None:
+                self._term_grams = TermTrigrams.build(t for f in FIELDS for t in self.postings[f])
+            return self._term_grams
+
+    def outline(self) -> OutlineIndex:
+        """Outline index over titles, aliases and headings (built on first use)."""
+        with self.lock:
+            if self._outline is None:
+                chunk_notes = [chunk.note_id if chunk is not None else None for chunk in self.chunks]
+                self._outline = OutlineIndex.build(self.postings, chunk_notes)
+            return self._outline
+
+    def semantic(self) -> Optional[SemanticIndex]:
+        """Section vectors in line with the chunk table (None without NumPy)."""
+        if not semantic_available():
+            return None
+        with self.lock:
+            if self._semantic is None:
+                self._semantic = SemanticIndex.from_env(self.index_dir / SEMANTIC_DIRNAME)
+            if self._semantic_stale:
+                self._semantic.sync(self)
+                self._semantic_stale = False
+            return self._semantic
+
+    def _index_path(self, rel_path: str, note_id: Optional[int] = None) -> Optional[int]:
+        new_note = note_id is None
+        if new_note:
+            note_id = len(self.notes)
+        analyzed = analyze_note(self.docs_path, rel_path, self.pipeline, note_id)
+        if analyzed is None:
+            return None
+        record, chunks = analyzed
+        if new_note:
+            self.notes.append(record)
+        else:
+            self.notes[note_id] = record
+        outline_terms: Dict[str, Set[str]] = {"title": set(), "headings": set()}
+        for chunk, field_tokens in chunks:
+            if self._free_chunks:
+                chunk_id = self._free_chunks.pop()
+                self.chunks[chunk_id] = chunk
+            else:
+                chunk_id = len(self.chunks)
+                self.chunks.append(chunk)
+            terms = self.chunk_terms[chunk_id] = add_postings(self.postings, chunk_id, field_tokens)
+            if self._term_grams is not None:
+                for term in terms:
+                    self._term_grams.add(term)
+            for f, found in outline_terms.items():
+                found.update(term for term, _ in field_tokens[f])
+            record.chunks.append(chunk_id)
+        if self._outline is not None:
+            self._outline.add(note_id, outline_terms)
+        self._path_ids[rel_path] = note_id
+        self._update_meta(note_id, record, add=True)
+        return note_id
+
+    def _remove_path(self, rel_path: str) -> None:
+        note_id = self._path_ids.pop(rel_path)
+        note = self.notes[note_id]
+        for chunk_id in reversed(note.chunks if note is not None else []):
+            for term in self.chunk_terms.pop(chunk_id, []):
+                for field_postings in self.postings.values():
+                    plist = field_postings.get(term)
+                    if plist is None or plist.pop(chunk_id, None) is None:
+                        continue
+                    if plist:
+                        field_postings[term] = plist
+                    else:
+                        del field_postings[term]
+            self.chunks[chunk_id] = None
+            self._free_chunks.append(chunk_id)
+        if note is not None:
+            self._update_meta(note_id, note, add=False)
+        if self._outline is not None:
+            self._outline.remove(note_id)
+        self.notes[note_id] = None
+
+    def _update_meta(self, note_id: int, note: NoteRecord, add: bool) -> None:
+        for f, keys in meta_keys(note.tags, note.aliases, note.links).items():
+            table = self.meta[f]
+            for key in keys:
+                if add:
+                    table.setdefault(key, set()).add(note_id)
+                    continue
+                ids = table.get(key)
+                if ids is not None:
+                    ids.discard(note_id)
+                    if not ids:
+                        del table[key]
+
+    def _rebuild_meta(self) -> None:
+        self.meta = {f: {} for f in META_FIELDS}
+        for note_id, note in self.live_notes():
+            self._update_meta(note_id, note, add=True)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self) -> None:
+        """Write the index file and swap it in atomically, then map the new file."""
+        with self.lock:
+            meta = {
+                "version": INDEX_FORMAT_VERSION,
+                "analyzer": self.pipeline.signature(),
+                "docs_path": str(self.docs_path.resolve()),
+                "built_at": self.built_at,
+            }
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            with replacing(self.index_file) as tmp:
+                write_segment(tmp, meta, self.notes, self.chunks, self.chunk_terms, self.postings)
+            # the written file now holds everything: drop the in-memory postings and sections
+            self._reader, self.postings, self.chunk_terms = open_segment(self.index_file)
+            self.chunks = self._reader.chunks()
+            self.dirty = False
+        legacy = self.index_dir / LEGACY_INDEX_FILENAME
+        if legacy.exists():
+            legacy.unlink()
+
+    def load(self) -> bool:
+        """Map the index file; return False if missing, stale-format or corrupt."""
+        try:
+            reader, postings, chunk_terms = open_segment(self.index_file)
+            meta = reader.meta
+            if meta.get("version") != INDEX_FORMAT_VERSION:
+                return False
+            if meta.get("analyzer") != self.pipeline.signature():
+                return False
+            if meta.get("docs_path") != str(self.docs_path.resolve()):
+                return False
+            notes, chunks = reader.notes(), reader.chunks()
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        with self.lock:
+            self._reader = reader
+            self.notes = notes
+            self.chunks = chunks
+            self.chunk_terms = chunk_terms
+            self.postings = postings
+            self._term_grams = None
+            self._outline = None
+            self._free_chunks = self.chunks.free_ids()
+            self._path_ids = {note.path: nid for nid, note in self.live_notes()}
+            self._rebuild_meta()
+            self.graph.mark_stale()
+            self._semantic_stale = True
+            self.built_at = meta.get("built_at", 0.0)
+            self.generation += 1
+            self.scorer.invalidate()
+            self.dirty = False
+        return True
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+    def analyze_query(self, query: str) -> List[Token]:
+        return self.pipeline.tokens(query, query=True)
+
+    def match(self, query: str, field: str = "body") -> List[Tuple[int, int]]:
+        """Return (chunk_id, phrase start position) for sections whose ``field`` contains the query phrase."""
+        tokens = self.analyze_query(query)
+        if not tokens:
+            return []
+        offsets = [t.position - tokens[0].position for t in tokens]
+        with self.lock:
+            postings = self.postings[field]
+            lists = [postings.get(t.term) for t in tokens]
+            if any(p is None for p in lists):
+                return []
+            candidates = set(min(lists, key=len))
+            for plist in lists:
+                candidates &= plist.keys()
+            matches = []
+            for chunk_id in sorted(candidates):
+                start = self._phrase_start(chunk_id, lists, offsets)
+                if start is not None:
+                    matches.append((chunk_id, start))
+            return matches
+
+    @staticmethod
+    def _phrase_start(chunk_id: int, lists: List[Dict[int, List[int]]], offsets: List[int]) -> Optional[int]:
+        following = [(off, set(plist[chunk_id])) for off, plist in zip(offsets[1:], lists[1:])]
+        for start in lists[0][chunk_id]:
+            if all(start + off in positions for off, positions in following):
+                return start
+        return None
+
+    def search(
+        self,
+        query: str,
+        max_results: int = 5,
+        per_note: int = MAX_SECTIONS_PER_NOTE,
+        expand_links: bool = False,
+        mode: str = "lexical",
+        stats: Optional[CollectionStats] = None,
+        deadline: Optional[SearchDeadline] = None,
+        summaries: bool = False,
+    ) -> List[SearchHit]:
+        """BM25F-ranked sections (at most ``per_note`` per note).
+
+        ``query`` may use the fielded syntax of query.py.  Filters are
+        resolved first, from the side index and postings; only the notes
+        behind the returned sections are read again, to cut the passage.
+        A filter-only query returns the first matching section of each
+        matching note (ranked by match count for regexes).  Unknown or
+        ``word~`` terms are expanded to their closest indexed terms.
+
+        With ``expand_links`` every hit lists its linked notes (``related``)
+        and the best matching section of up to MAX_EXPANDED neighbours is
+        appended (``via`` = the hit's path), so linked context needs no
+        follow-up search.
+
+        ``mode`` is one of SEARCH_MODES: "semantic" ranks by cosine
+        similarity of the LSA vectors, "hybrid" fuses the top HYBRID_DEPTH
+        of both rankings by reciprocal rank.  Both fall back to "lexical"
+        when NumPy is unavailable.
+
+        ``stats`` replaces this index's BM25 collection statistics (see
+        collection_stats(); ShardedSearch passes the sum over all shards).
+        With ``deadline`` ranking stops when it expires and the best hits of
+        the covered part are returned (``deadline.partial``/``coverage``).
+
+        With ``summaries`` the snippet of a hit is the section summary and
+        ``note_summary`` is set; nothing is read from disk.
+        """
+        return self.search_many([query], max_results, per_note, expand_links, mode, stats, deadline, summaries)[0]
+
+    def search_many(
+        self,
+        queries: Sequence[str],
+        max_results: int = 5,
+        per_note: int = MAX_SECTIONS_PER_NOTE,
+        expand_links: bool = False,
+        mode: str = "lexical",
+        stats: Optional[CollectionStats] = None,
+        deadline: Optional[SearchDeadline] = None,
+        summaries: bool = False,
+    ) -> List[List[SearchHit]]:
+        """search() for several queries in one pass; one hit list per query.
+
+        The queries share the note texts read for regexes and passages and
+        the BM25 contribution of every term, so related queries ("tag",
+        "tags", "标签") cost little more than one.  Hits are not
+        deduplicated across queries.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"unknown search mode: {mode}")
+        with self.lock:
+            texts: Dict[int, Optional[str]] = {}
+            memo: Optional[Dict[str, Dict[int, float]]] = {} if len(queries) > 1 else None
+            graph = self.link_graph() if (self.link_boost or expand_links) else None
+            return [
+                self._search(
+                    query, max_results, per_note, expand_links, mode, stats, deadline, texts, memo, graph, summaries
+                )
+                for query in queries
+            ]
+
+    def _search(
+        self,
+        query: str,
+        max_results: int,
+        per_note: int,
+        expand_links: bool,
+        mode: str,
+        stats: Optional[CollectionStats],
+        deadline: Optional[SearchDeadline],
+        texts: Dict[int, Optional[str]],
+        memo: Optional[Dict[str, Dict[int, float]]],
+        graph: Optional[LinkGraph],
+        summaries: bool = False,
+    ) -> List[SearchHit]:
+        if max_results <= 0:
+            return []
+        scored = self._score_query(query, max_results * max(per_note, 1), mode, stats, deadline, texts, memo, graph)
+        if scored is None:
+            return []
+        scores, tokens, spans = scored
+        window = max_results * max(per_note, 1)
+        hits = HitStream(self, scores, tokens, spans, per_note, texts, window, summaries).take(max_results)
+        if expand_links and graph is not None and not (deadline and deadline.expired()):
+            hits.extend(self._expand(hits, graph, scores, tokens, texts, summaries))
+        return hits
+
+    def stream(
+        self,
+        query: str,
+        per_note: int = MAX_SECTIONS_PER_NOTE,
+        mode: str = "lexical",
+        stats: Optional[CollectionStats] = None,
+        deadline: Optional[SearchDeadline] = None,
+        summaries: bool = False,
+    ) -> "HitStream":
+        """The full ranking of ``query`` as a lazily materialised HitStream.
+
+        Same order as search(); sections are only read when taken, so a
+        cached stream serves later pages in O(page).
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"unknown search mode: {mode}")
+        with self.lock:
+            texts: Dict[int, Optional[str]] = {}
+            graph = self.link_graph() if self.link_boost else None
+            scored = self._score_query(query, HYBRID_DEPTH, mode, stats, deadline, texts, None, graph)
+            scores, tokens, spans = scored if scored is not None else ({}, [], {})
+            return HitStream(self, scores, tokens, spans, per_note, texts, summaries=summaries)
+
+    def _score_query(
+        self,
+        query: str,
+        depth: int,
+        mode: str,
+        stats: Optional[CollectionStats],
+        deadline: Optional[SearchDeadline],
+        texts: Dict[int, Optional[str]],
+        memo: Optional[Dict[str, Dict[int, float]]],
+        graph: Optional[LinkGraph],
+    ) -> Optional[Tuple[Dict[int, float], List[Token], Dict[int, Tuple[int, int, int]]]]:
+        """(chunk scores, query tokens, regex spans), or None for an empty query."""
+        parsed = parse_query(query)
+        tokens = self.analyze_query(parsed.text)
+        if not (tokens or parsed.filters or parsed.regexes):
+            return None
+        spans: Dict[int, Tuple[int, int, int]] = {}
+        allowed = self.filter_chunks(parsed, texts, spans, deadline)
+        tokens = self._correct(tokens, parsed.fuzzy)
+        if tokens:
+            scores = self._rank(parsed.text, tokens, allowed, mode, depth, stats, deadline, memo)
+        else:
+            scores = {}
+            for nid in sorted({self.chunks[cid].note_id for cid in allowed or ()}):
+                chunk_id = next(c for c in self.notes[nid].chunks if c in allowed)
+                scores[chunk_id] = float(spans[chunk_id][2]) if chunk_id in spans else 0.0
+        if graph is not None and self.link_boost:
+            for chunk_id in scores:
+                scores[chunk_id] *= graph.boost(self.chunks[chunk_id].note_id, self.link_boost)
+        return scores, tokens, spans
+
+    def _correct(self, tokens: List[Token], fuzzy: Dict[str, Optional[int]]) -> List[Token]:
+        """Replace unknown terms by their closest indexed term; expand ``word~`` terms."""
+        wanted = {self.pipeline.normalize(word)[0]: edits for word, edits in fuzzy.items()}
+        corrected: List[Token] = []
+        for tok in tokens:
+            explicit = tok.term in wanted
+            known = self._doc_freq(tok.term) > 0
+            edits = fuzzy_budget(tok.term, wanted.get(tok.term))
+            if (known and not explicit) or not edits or is_cjk(tok.term) or tok.term.isdigit():
+                corrected.append(tok)
+                continue
+            ranked = sorted(
+                ((d, -self._doc_freq(t), t) for t, d in self.term_trigrams().similar(tok.term, edits) if t != tok.term),
+                key=lambda item: item[:2],
+            )
+            alternatives = [t for d, df, t in ranked if df < 0][:FUZZY_EXPANSIONS if explicit else 1]
+            if known or not alternatives:
+                corrected.append(tok)
+            corrected.extend(tok._replace(term=t) for t in alternatives)
+        return corrected
+
+    def _doc_freq(self, term: str) -> int:
+        return sum(len(self.postings[f].get(term) or ()) for f in FIELDS)
+
+    def collection_stats(self, *queries: str) -> CollectionStats:
+        """BM25 statistics of this index for the free text of ``queries``."""
+        with self.lock:
+            terms = [t.term for query in queries for t in self.analyze_query(parse_query(query).text)]
+            return self.scorer.collection_stats(self, terms)
+
+    def _rank(
+        self,
+        text: str,
+        tokens: List[Token],
+        allowed: Optional[Set[int]],
+        mode: str,
+        depth: int,
+        stats: Optional[CollectionStats] = None,
+        deadline: Optional[SearchDeadline] = None,
+        memo: Optional[Dict[str, Dict[int, float]]] = None,
+    ) -> Dict[int, float]:
+        semantic = self.semantic() if mode != "lexical" else None
+        if semantic is None:
+            terms = [t.term for t in tokens]
+            if memo is None:
+                allowed = self._coarse(terms, allowed, depth)
+            return self.scorer.score(self, terms, allowed, stats, deadline, memo)
+        # section vectors are built from index-mode terms, so embed the query the same way
+        terms = [t.term for t in self.pipeline.tokens(text)]
+        if mode == "semantic":
+            return semantic.score(terms, candidates=allowed, top_k=max(depth * 4, HYBRID_DEPTH))
+        lexical = self.scorer.score(self, [t.term for t in tokens], allowed, stats, deadline, memo)
+        return reciprocal_rank_fusion([
+            dict(self.scorer.top_k(lexical, HYBRID_DEPTH)),
+            semantic.score(terms, candidates=allowed, top_k=HYBRID_DEPTH),
+        ])
+
+    def _coarse(self, terms: List[str], allowed: Optional[Set[int]], depth: int) -> Optional[Set[int]]:
+        """Coarse phase: the sections of the notes whose outline best matches ``terms``,
+        plus the sections whose body holds one of the rarer terms (see outline.py).
+
+        Returns ``allowed`` unchanged when the query is cheap to rank in
+        full (fewer than OUTLINE_MIN_POSTINGS body postings) or the outline
+        matches fewer notes than ``depth`` sections.
+        """
+        body = self.postings["body"]
+        count = body.count if isinstance(body, FieldPostings) else lambda t: len(body.get(t) or ())
+        if sum(count(term) for term in dict.fromkeys(terms)) < OUTLINE_MIN_POSTINGS:
+            return allowed
+        scope = None if allowed is None else {self.chunks[cid].note_id for cid in allowed}
+        notes = self.outline().candidates(terms, max(OUTLINE_NOTES, 4 * depth), scope)
+        if len(notes) < depth:
+            return allowed
+        chunks = {cid for nid in notes for cid in self.notes[nid].chunks}
+        budget = OUTLINE_PAD_POSTINGS
+        for term in sorted(dict.fromkeys(terms), key=count):
+            postings = count(term)
+            if postings > budget:
+                break
+            if postings:
+                chunks.update(body.get(term) or ())
+                budget -= postings
+        return chunks if allowed is None else chunks & allowed
+
+    def _expand(
+        self,
+        hits: List[SearchHit],
+        graph: LinkGraph,
+        scores: Dict[int, float],
+        tokens: List[Token],
+        texts: Dict[int, Optional[str]],
+        summaries: bool = False,
+    ) -> List[SearchHit]:
+        """Attach 1-hop neighbours to ``hits``; return the added neighbour sections."""
+        seen = {hit.note_id for hit in hits}
+        added: List[SearchHit] = []
+        for hit in hits:
+            neighbours = [n for n in graph.neighbours(hit.note_id) if self.notes[n] is not None]
+            neighbours.sort(key=lambda n: -graph.boost(n, 1.0))
+            hit.related = [self.notes[n].path for n in neighbours[:MAX_RELATED]]
+            expanded = 0
+            for note_id in neighbours:
+                if expanded >= MAX_EXPANDED:
+                    break
+                if note_id in seen:
+                    continue
+                matched = [(scores[c], c) for c in self.notes[note_id].chunks if c in scores]
+                if not matched:
+                    continue
+                score, chunk_id = max(matched)
+                score *= NEIGHBOUR_WEIGHT
+                if summaries:
+                    extra = self._summary_hit(chunk_id, self.chunks[chunk_id], score)
+                else:
+                    extra = self._section_hit(chunk_id, self.chunks[chunk_id], score, tokens, texts)
+                if extra is None:
+                    continue
+                extra.via = hit.path
+                added.append(extra)
+                seen.add(note_id)
+                expanded += 1
+        return added
+
+    def filter_notes(self, parsed: ParsedQuery) -> Optional[Set[int]]:
+        """Note ids passing the query's filters and exclusions (None = no restriction)."""
+        with self.lock:
+            allowed: Optional[Set[int]] = None
+            for f, values in parsed.filters.items():
+                for value in values:
+                    ids = self._filter_ids(f, value)
+                    allowed = ids if allowed is None else allowed & ids
+            banned: Set[int] = set()
+            for f, values in parsed.negated.items():
+                for value in values:
+                    banned |= self._filter_ids(f, value)
+            for word in parsed.excluded:
+                banned |= self._filter_ids("tag", word) | self._filter_ids("alias", word)
+                for f in ("title", "body"):
+                    banned.update(self.chunks[cid].note_id for cid, _ in self.match(word, field=f))
+            texts: Dict[int, Optional[str]] = {}
+            for pattern in parsed.excluded_regexes:
+                banned.update(self.chunks[cid].note_id for cid in self.regex_matches(pattern, allowed, texts))
+            if not banned:
+                return allowed
+            if allowed is None:
+                allowed = set(self._path_ids.values())
+            return allowed - banned
+
+    def filter_chunks(
+        self,
+        parsed: ParsedQuery,
+        texts: Optional[Dict[int, Optional[str]]] = None,
+        spans: Optional[Dict[int, Tuple[int, int, int]]] = None,
+        deadline: Optional[SearchDeadline] = None,
+    ) -> Optional[Set[int]]:
+        """Chunk ids the query may return (None = no restriction).
+
+        Phrases and regexes are required per section; ``spans`` receives
+        the first regex match of each section as (start, end, match count).
+        """
+        texts = {} if texts is None else texts
+        with self.lock:
+            notes = self.filter_notes(parsed)
+            allowed: Optional[Set[int]] = None
+            if notes is not None:
+                allowed = {cid for nid in notes for cid in self.notes[nid].chunks}
+            for phrase in parsed.phrases:
+                ids = {cid for cid, _ in self.match(phrase)}
+                allowed = ids if allowed is None else allowed & ids
+            for pattern in parsed.regexes:
+                scope = None if allowed is None else {self.chunks[cid].note_id for cid in allowed}
+                matches = self.regex_matches(pattern, scope, texts, deadline)
+                allowed = set(matches) if allowed is None else allowed & matches.keys()
+                if spans is not None:
+                    for cid in allowed:
+                        if cid not in spans:
+                            spans[cid] = matches[cid]
+            return allowed
+
+    def regex_matches(
+        self,
+        pattern: str,
+        notes: Optional[Set[int]] = None,
+        texts: Optional[Dict[int, Optional[str]]] = None,
+        deadline: Optional[SearchDeadline] = None,
+    ) -> Dict[int, Tuple[int, int, int]]:
+        """chunk_id -> (start, end, count) of ``pattern`` matches inside sections.
+
+        Candidate notes are narrowed by the term trigram index first, then
+        read and verified; matching is case-insensitive over the normalised
+        text (see TextPipeline.normalize), offsets are section-relative.
+        An invalid regex is searched for literally.  Verification stops
+        when ``deadline`` expires (coverage = share of candidates read).
+        """
+        try:
+            regex = re.compile(pattern, re.IGNORECASE | re.MULTILINE)
+        except re.error:
+            pattern = re.escape(pattern)
+            regex = re.compile(pattern, re.IGNORECASE)
+        texts = {} if texts is None else texts
+        with self.lock:
+            candidates = self._regex_candidates(pattern)
+            if notes is not None:
+                candidates = notes if candidates is None else candidates & notes
+            if candidates is None:
+                candidates = set(self._path_ids.values())
+            found: Dict[int, Tuple[int, int, int]] = {}
+            ordered = sorted(candidates)
+            for checked, note_id in enumerate(ordered):
+                if deadline is not None and deadline.expired():
+                    deadline.cut(checked / len(ordered))
+                    break
+                note = self.notes[note_id]
+                text = self._note_text(note_id, texts) if note is not None else None
+                if not text:
+                    continue
+                cached = self.content.normalized(self.docs_path / note.path)
+                norm, origin = cached if cached is not None else self.pipeline.normalize(text)
+                spans = iter(sorted((self.chunks[cid].start, self.chunks[cid].end, cid) for cid in note.chunks))
+                section = next(spans, None)
+                for m in regex.finditer(norm):
+                    start = origin[m.start()] if origin else m.start()
+                    end = origin[m.end()] if origin else m.end()
+                    while section is not None and start >= section[1]:
+                        section = next(spans, None)
+                    if section is None:
+                        break
+                    if start < section[0]:
+                        continue  # frontmatter
+                    first = found.get(section[2])
+                    if first is None:
+                        found[section[2]] = (start - section[0], min(end, section[1]) - section[0], 1)
+                    else:
+                        found[section[2]] = (first[0], first[1], first[2] + 1)
+            return found
+
+    def _regex_candidates(self, pattern: str) -> Optional[Set[int]]:
+        """Notes that can contain a match (None = cannot narrow)."""
+        candidates: Optional[Set[int]] = None
+        for literal in required_literals(pattern):
+            exact, partial = literal_constraints(literal, self.pipeline)
+            groups = [[term] for term in exact]
+            for piece in partial:
+                terms = self.term_trigrams().containing(piece)
+                if terms is not None:
+                    groups.append(terms)
+            for terms in groups:
+                ids = {
+                    self.chunks[cid].note_id
+                    for term in terms
+                    for f in FIELDS
+                    for cid in (self.postings[f].get(term) or ())
+                }
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    return candidates
+        return candidates
+
+    def _filter_ids(self, f: str, value: str) -> Set[int]:
+        if f == "path":
+            needle = normalize_value(value)
+            return {nid for path, nid in self._path_ids.items() if needle in path.casefold()}
+        if f == "tag":
+            keys = tag_keys(value)[-1:]
+        elif f == "link":
+            keys = link_keys(value)[:1]
+        else:
+            keys = [normalize_value(value)]
+        return set(self.meta[f].get(keys[0], ())) if keys and keys[0] else set()
+
+    def _note_text(self, note_id: int, texts: Dict[int, Optional[str]]) -> Optional[str]:
+        if note_id not in texts:
+            note = self.notes[note_id]
+            texts[note_id] = self.content.text(self.docs_path / note.path) if note else None
+        return texts[note_id]
+
+    def _section_hit(
+        self,
+        chunk_id: int,
+        chunk: ChunkRecord,
+        score: float,
+        tokens: List[Token],
+        texts: Dict[int, Optional[str]],
+        hint: Optional[Tuple[int, int]] = None,
+    ) -> Optional[SearchHit]:
+        note = self.notes[chunk.note_id]
+        text = self._note_text(chunk.note_id, texts)
+        if note is None or text is None:
+            return None
+        section = text[chunk.start:chunk.end]
+        span = self._hit_span(chunk_id, section, tokens) or hint
+        if chunk.tokens <= PASSAGE_TOKENS:
+            begin, end = 0, len(section)
+        elif span is None:
+            begin, end = 0, min(len(section), 2 * PASSAGE_RADIUS)
+        else:
+            begin, end = max(0, span[0] - PASSAGE_RADIUS), min(len(section), span[1] + PASSAGE_RADIUS)
+        raw = section[begin:end]
+        passage = raw.strip()
+        begin += len(raw) - len(raw.lstrip())
+        anchor = heading_anchor(chunk.heading) if chunk.heading else None
+        if span is not None:
+            hit_at = chunk.start + span[0]
+            block = next((bid for bid, start, end in chunk.blocks if start <= hit_at < end), None)
+            if block is not None:
+                anchor = f"^{block}"
+        return SearchHit(
+            note_id=chunk.note_id,
+            chunk_id=chunk_id,
+            path=note.path,
+            title=note.title,
+            heading=chunk.heading,
+            anchor=anchor,
+            snippet=passage,
+            score=score,
+            tokens=estimate_tokens(passage),
+            section_tokens=chunk.tokens,
+            start=chunk.start + begin,
+            end=chunk.start + begin + len(passage),
+            signature=chunk.simhash,
+        )
+
+    def _summary_hit(self, chunk_id: int, chunk: ChunkRecord, score: float) -> Optional[SearchHit]:
+        """Hit carrying the stored summaries (the passage span is the whole section)."""
+        note = self.notes[chunk.note_id]
+        if note is None:
+            return None
+        summary = chunk.summary or note.summary
+        return SearchHit(
+            note_id=chunk.note_id,
+            chunk_id=chunk_id,
+            path=note.path,
+            title=note.title,
+            heading=chunk.heading,
+            anchor=heading_anchor(chunk.heading) if chunk.heading else None,
+            snippet=summary,
+            score=score,
+            tokens=estimate_tokens(summary),
+            section_tokens=chunk.tokens,
+            start=chunk.start,
+            end=chunk.end,
+            signature=chunk.simhash,
+            note_summary=note.summary,
+        )
+
+    def _anchor(self, chunk_id: int, tokens: List[Token]) -> Optional[Tuple[int, int]]:
+        """Pick the (first, last) body position of the hit inside a section.
+
+        Prefers an exact phrase occurrence, else the rarest query term in the body.
+        """
+        if not tokens:
+            return None
+        body = self.postings["body"]
+        lists = [body.get(t.term) for t in tokens]
+        if all(p is not None and chunk_id in p for p in lists):
+            offsets = [t.position - tokens[0].position for t in tokens]
+            start = self._phrase_start(chunk_id, lists, offsets)  # type: ignore[arg-type]
+            if start is not None:
+                return start, start + offsets[-1]
+        present = [p for p in lists if p is not None and chunk_id in p]
+        if not present:
+            return None
+        first = min(present, key=len)[chunk_id][0]
+        return first, first
+
+    def _hit_span(self, chunk_id: int, section: str, tokens: List[Token]) -> Optional[Tuple[int, int]]:
+        """Character span of the hit inside ``section`` (None if only title/headings matched)."""
+        anchor = self._anchor(chunk_id, tokens)
+        if anchor is None:
+            return None
+        first, last = anchor
+        begin = end = None
+        for tok in self.pipeline.tokens(section):
+            if tok.position == first and (begin is None or tok.start < begin):
+                begin = tok.start
+            if tok.position == last:
+                end = tok.end if end is None else max(end, tok.end)
+            elif tok.position > last:
+                break
+        if begin is None or end is None:
+            return None
+        return begin, end
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "notes": self.note_count,
+            "sections": self.chunk_count,
+            "tags": len(self.meta["tag"]),
+            "links": None if self.graph.stale else self.graph.stats(),
+            "semantic": self._semantic.stats() if self._semantic is not None else None,
+            "outline_terms": len(self._outline.postings) if self._outline is not None else None,
+            "content_cache": self.content.stats(),
+            "terms": len(self.postings["body"]),
+            "built_at": self.built_at,
+            "dirty": self.dirty,
+            "index_file": str(self.index_file),
+            "progress": self.progress.as_dict(),
+        }
+
+
+class HitStream:
+    """Ranked sections of one query, turned into SearchHits on demand.
+
+    Walks the scores best first (ties favour lower chunk ids) and applies
+    the per-note cap as it goes, exactly like a single search() call.  Only
+    a window of the ranking is sorted; it widens (x4) when the walk reaches
+    its end, so taking the next page costs O(page) amortised.
+
+    With ``summaries`` hits carry the stored summaries and no note is read.
+
+    A stream is tied to the index state it was ranked on: once the index
+    changes (``index.generation``) chunk ids may be reused and the stream
+    is ``stale``; take() then returns nothing.
+    """
+
+    def __init__(
+        self,
+        index: VaultIndex,
+        scores: Dict[int, float],
+        tokens: List[Token],
+        spans: Dict[int, Tuple[int, int, int]],
+        per_note: int = MAX_SECTIONS_PER_NOTE,
+        texts: Optional[Dict[int, Optional[str]]] = None,
+        window: int = 64,
+        summaries: bool = False,
+    ) -> None:
+        self.index = index
+        self.generation = index.generation
+        self.scores = scores
+        self.tokens = tokens
+        self.spans = spans
+        self.per_note = max(per_note, 1)
+        self.texts: Dict[int, Optional[str]] = {} if texts is None else texts
+        self.summaries = summaries
+        self.shard: Optional[str] = None  # set by ShardedSearch, copied to hits
+        self._window = max(window, 1)
+        self._ranked: Optional[List[Tuple[int, float]]] = None
+        self._pos = 0
+        self._taken: Dict[int, int] = {}
+        self._head: Optional[SearchHit] = None
+
+    @property
+    def stale(self) -> bool:
+        return self.index.generation != self.generation
+
+    def peek(self) -> Optional[SearchHit]:
+        """The next hit without consuming it (None when exhausted or stale)."""
+        if self._head is None:
+            self._head = self._advance()
+        return self._head
+
+    def pop(self) -> Optional[SearchHit]:
+        hit = self.peek()
+        self._head = None
+        return hit
+
+    def take(self, n: int) -> List[SearchHit]:
+        hits = []
+        while len(hits) < n:
+            hit = self.pop()
+            if hit is None:
+                break
+            hits.append(hit)
+        return hits
+
+    def _advance(self) -> Optional[SearchHit]:
+        index = self.index
+        with index.lock:
+            while not self.stale:
+                if self._ranked is None or self._pos >= len(self._ranked):
+                    if self._ranked is not None:
+                        if len(self._ranked) >= len(self.scores):
+                            return None
+                        self._window *= 4  # the per-note cap discarded too many; widen the window
+                    self._ranked = index.scorer.top_k(self.scores, self._window)
+                    if self._pos >= len(self._ranked):
+                        return None
+                chunk_id, score = self._ranked[self._pos]
+                self._pos += 1
+                chunk = index.chunks[chunk_id]
+                if chunk is None or self._taken.get(chunk.note_id, 0) >= self.per_note:
+                    continue
+                if self.summaries:
+                    hit = index._summary_hit(chunk_id, chunk, score)
+                else:
+                    span = self.spans.get(chunk_id)
+                    hint = span[:2] if span else None
+                    hit = index._section_hit(chunk_id, chunk, score, self.tokens, self.texts, hint)
+                if hit is None:
+                    continue
+                self._taken[chunk.note_id] = self._taken.get(chunk.note_id, 0) + 1
+                hit.shard = self.shard
+                return hit
+        return None
+
+
+# Process-wide registry so the search tool, the API server and the watcher
+# share one in-memory index per vault.
+_REGISTRY: Dict[Tuple[str, str], VaultIndex] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _registry_key(docs_path: str, index_dir: Optional[str]) -> Tuple[str, str]:
+    return (str(Path(docs_path).resolve()), str(Path(index_dir).resolve()) if index_dir else "")
+
+
+def get_vault_index(docs_path: str, index_dir: Optional[str] = None) -> VaultIndex:
+    """Return the shared VaultIndex for a vault, loading/building it on first use."""
+    key = _registry_key(docs_path, index_dir)
+    with _REGISTRY_LOCK:
+        index = _REGISTRY.get(key)
+        if index is None:
+            index = VaultIndex(docs_path, index_dir)
+            _REGISTRY[key] = index
+    index.warm()
+    return index
+
+
+def peek_vault_index(docs_path: str, index_dir: Optional[str] = None) -> Optional[VaultIndex]:
+    """Return the registered index without warming it (for status endpoints)."""
+    with _REGISTRY_LOCK:
+        return _REGISTRY.get(_registry_key(docs_path, index_dir))
+
+
+__all__ = [
+    "INDEX_FORMAT_VERSION",
+    "SEARCH_MODES",
+    "ChunkRecord",
+    "HitStream",
+    "NoteRecord",
+    "RefreshReport",
+    "SearchDeadline",
+    "SearchHit",
+    "VaultIndex",
+    "default_index_dir",
+    "get_vault_index",
+    "peek_vault_index",
+]
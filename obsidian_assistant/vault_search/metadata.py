@@ -0,0 +1,160 @@
+"""Structured note metadata: frontmatter properties, tags, aliases, wikilinks.
+
+Extracted once per note at index time and kept in a side index
+(field -> value -> note ids) so fielded queries (``tag:project``,
+``alias:...``, ``link:...``) are answered without reading notes.
+
+Notes:
+- Frontmatter is parsed with a small YAML subset that covers Obsidian
+  properties: ``key: value``, inline lists ``key: [a, b]`` and block lists
+  (``- item`` lines).  No YAML dependency is needed.
+- Tags come from the ``tags``/``tag`` property and inline ``#tags`` outside
+  code.  Nested tags index every ancestor, so ``tag:project`` also matches
+  ``#project/alpha`` (as in Obsidian's own search).
+- Link targets drop ``#heading``, ``|alias`` and ``.md`` and are casefolded;
+  both the full target and its last path component are indexed.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+_FRONTMATTER_RE = re.compile(r"\A---[ \t]*\r?\n(.*?)\r?\n(?:---|\.\.\.)[ \t]*(?:\r?\n|\Z)", re.DOTALL)
+_KEY_RE = re.compile(r"^([A-Za-z0-9_\-]+|\S[^:]*?):(?:[ \t]+(.*))?$")
+_CODE_RE = re.compile(r"```.*?```|~~~.*?~~~|`[^`\n]*`", re.DOTALL)
+_TAG_RE = re.compile(r"(?<![\w/#&])#([^\s#\[\]{}()\"'`,.:;!?]+)")
+_WIKILINK_RE = re.compile(r"!?\[\[([^\]\n]+?)\]\]")
+
+META_FIELDS = ("tag", "alias", "link")
+
+
+@dataclass
+class NoteMeta:
+    properties: Dict[str, object] = field(default_factory=dict)
+    tags: List[str] = field(default_factory=list)
+    aliases: List[str] = field(default_factory=list)
+    links: List[str] = field(default_factory=list)
+    body_start: int = 0  # offset of the first character after the frontmatter
+
+
+def _scalar(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def parse_frontmatter(text: str) -> Tuple[Dict[str, object], int]:
+    """Return (properties, end offset of the frontmatter block)."""
+    m = _FRONTMATTER_RE.match(text)
+    if not m:
+        return {}, 0
+    props: Dict[str, object] = {}
+    key = None
+    for line in m.group(1).splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        stripped = line.strip()
+        if stripped.startswith("- ") or stripped == "-":
+            if key is not None:
+                items = props.get(key)
+                if not isinstance(items, list):
+                    items = [] if items in (None, "") else [items]
+                    props[key] = items
+                item = _scalar(stripped[1:])
+                if item:
+                    items.append(item)
+            continue
+        if line[:1] in " \t":
+            continue  # nested mappings are not Obsidian properties
+        km = _KEY_RE.match(stripped)
+        if not km:
+            continue
+        key = km.group(1).strip()
+        raw = (km.group(2) or "").strip()
+        if raw.startswith("[") and raw.endswith("]"):
+            props[key] = [_scalar(v) for v in raw[1:-1].split(",") if _scalar(v)]
+        else:
+            props[key] = _scalar(raw)
+    return props, m.end()
+
+
+def _as_list(value: object, separators: str = r"[,\s]+") -> List[str]:
+    """Property value as a list; scalars are split on ``separators``."""
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    if isinstance(value, str) and value:
+        return [v for v in re.split(separators, value) if v.strip()]
+    return []
+
+
+def normalize_value(value: str) -> str:
+    return unicodedata.normalize("NFKC", value).strip().casefold()
+
+
+def normalize_tag(tag: str) -> str:
+    return normalize_value(tag.lstrip("#"))
+
+
+def tag_keys(tag: str) -> List[str]:
+    """``a/b/c`` -> [``a``, ``a/b``, ``a/b/c``]."""
+    parts = [p for p in normalize_tag(tag).split("/") if p]
+    return ["/".join(parts[:i + 1]) for i in range(len(parts))]
+
+
+def normalize_link(target: str) -> str:
+    target = target.split("|", 1)[0].split("#", 1)[0].strip()
+    if target.lower().endswith(".md"):
+        target = target[:-3]
+    return normalize_value(target)
+
+
+def link_keys(target: str) -> List[str]:
+    full = normalize_link(target)
+    base = full.rsplit("/", 1)[-1]
+    return [full] if base == full else [full, base]
+
+
+def extract_metadata(text: str) -> NoteMeta:
+    props, body_start = parse_frontmatter(text)
+    body = _CODE_RE.sub(" ", text[body_start:])
+    tags = [normalize_tag(t) for t in _as_list(props.get("tags", props.get("tag")))]
+    tags.extend(normalize_tag(t) for t in _TAG_RE.findall(body) if not t.isdigit())
+    aliases = [a.strip() for a in _as_list(props.get("aliases", props.get("alias")), ",")]
+    links = []
+    for raw in _WIKILINK_RE.findall(body):
+        target = normalize_link(raw)
+        if target:
+            links.append(target)
+    return NoteMeta(
+        properties=props,
+        tags=list(dict.fromkeys(t for t in tags if t)),
+        aliases=list(dict.fromkeys(a for a in aliases if a)),
+        links=list(dict.fromkeys(links)),
+        body_start=body_start,
+    )
+
+
+def meta_keys(tags: List[str], aliases: List[str], links: List[str]) -> Dict[str, List[str]]:
+    """Side-index keys of one note per META_FIELDS entry."""
+    return {
+        "tag": sorted({k for t in tags for k in tag_keys(t)}),
+        "alias": sorted({normalize_value(a) for a in aliases}),
+        "link": sorted({k for target in links for k in link_keys(target)}),
+    }
+
+
+__all__ = [
+    "META_FIELDS",
+    "NoteMeta",
+    "extract_metadata",
+    "link_keys",
+    "meta_keys",
+    "normalize_link",
+    "normalize_tag",
+    "normalize_value",
+    "parse_frontmatter",
+    "tag_keys",
+]
@@ -0,0 +1,104 @@
+"""Outline index: the coarse phase of two-phase retrieval.
+
+A note's outline is its title, aliases and heading paths.  OutlineIndex
+maps every outline term to the notes whose outline contains it (title
+and alias terms weigh OUTLINE_WEIGHTS["title"], heading terms less), a
+few terms per note instead of the body's full posting lists.
+
+For queries whose terms occur in many sections VaultIndex first ranks
+notes by their outline (candidates(): sum of weight * idf over the query
+terms) and then scores only the sections of the best OUTLINE_NOTES notes
+with BM25F.  Scores of those sections equal a full ranking's (collection
+statistics are unchanged).  Sections whose body holds one of the rarer
+query terms are ranked as well (rarest first, up to OUTLINE_PAD_POSTINGS
+body postings), so a note that answers the query only in its body is not
+lost; only sections matching nothing but the common terms, in notes whose
+outline does not mention the query, go unranked -- the trade-off of the
+coarse phase.  When the outline matches too few notes the full ranking is
+used.
+
+The index is built from the title and headings posting lists on first
+use and then maintained per note (add() / remove()).
+"""
+from __future__ import annotations
+
+import heapq
+import math
+from typing import Dict, Iterable, List, Mapping, MutableMapping, Optional, Sequence, Set
+
+OUTLINE_WEIGHTS = {"title": 2.0, "headings": 1.0}  # title also holds the aliases
+OUTLINE_NOTES = 100  # notes the coarse phase passes on (at least 4x the requested sections)
+OUTLINE_MIN_POSTINGS = 10000  # body postings of the query terms below which one phase is cheaper
+OUTLINE_PAD_POSTINGS = 2000  # body postings of rare query terms whose sections join the candidates
+
+
+class OutlineIndex:
+    """Outline term -> note id -> weight (see module docstring)."""
+
+    def __init__(self) -> None:
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self._note_terms: Dict[int, List[str]] = {}
+
+    @classmethod
+    def build(
+        cls,
+        postings: Mapping[str, MutableMapping[str, Dict[int, List[int]]]],
+        chunk_notes: Sequence[Optional[int]],
+    ) -> "OutlineIndex":
+        """From the field postings; ``chunk_notes[chunk_id]`` is the chunk's note id (None if removed)."""
+        outline = cls()
+        for f, weight in OUTLINE_WEIGHTS.items():
+            for term, plist in postings[f].items():
+                notes = outline.postings.setdefault(term, {})
+                for chunk_id in plist:
+                    note_id = chunk_notes[chunk_id] if chunk_id < len(chunk_notes) else None
+                    if note_id is not None and notes.get(note_id, 0.0) < weight:
+                        notes[note_id] = weight
+                if not notes:
+                    del outline.postings[term]
+        for term, notes in outline.postings.items():
+            for note_id in notes:
+                outline._note_terms.setdefault(note_id, []).append(term)
+        return outline
+
+    @property
+    def note_count(self) -> int:
+        return len(self._note_terms)
+
+    def add(self, note_id: int, field_terms: Mapping[str, Iterable[str]]) -> None:
+        """Index one note's outline (``field`` -> terms; fields outside OUTLINE_WEIGHTS are ignored)."""
+        self.remove(note_id)
+        weights: Dict[str, float] = {}
+        for f, weight in OUTLINE_WEIGHTS.items():
+            for term in field_terms.get(f, ()):
+                weights[term] = max(weights.get(term, 0.0), weight)
+        for term, weight in weights.items():
+            self.postings.setdefault(term, {})[note_id] = weight
+        if weights:
+            self._note_terms[note_id] = list(weights)
+
+    def remove(self, note_id: int) -> None:
+        for term in self._note_terms.pop(note_id, []):
+            notes = self.postings.get(term)
+            if notes is not None:
+                notes.pop(note_id, None)
+                if not notes:
+                    del self.postings[term]
+
+    def candidates(self, terms: Iterable[str], limit: int, notes: Optional[Set[int]] = None) -> List[int]:
+        """Up to ``limit`` note ids whose outline matches ``terms``, best first (restricted to ``notes``)."""
+        n = max(self.note_count, 1)
+        scores: Dict[int, float] = {}
+        for term in dict.fromkeys(terms):
+            matched = self.postings.get(term)
+            if not matched:
+                continue
+            idf = math.log(1.0 + n / len(matched))
+            for note_id, weight in matched.items():
+                if notes is None or note_id in notes:
+                    scores[note_id] = scores.get(note_id, 0.0) + weight * idf
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [note_id for note_id, _ in best]
+
+
+__all__ = ["OUTLINE_MIN_POSTINGS", "OUTLINE_NOTES", "OUTLINE_PAD_POSTINGS", "OUTLINE_WEIGHTS", "OutlineIndex"]
@@ -0,0 +1,161 @@
+"""Fit search results into a token budget.
+
+Every tool result stays in the conversation and is re-sent with each later
+model call, so the search tool packs its output instead of returning all it
+found:
+
+1. merge_hits(): passages of one note that overlap or touch (adjacent
+   sections, repeated windows) are fused into one passage that keeps the
+   link and score of the better hit.  Summary hits (``note_summary`` set)
+   carry no passage and are kept apart.
+2. squeeze(): trailing spaces and runs of blank lines are dropped.
+3. pack_hits(): hits are taken in score order while they fit.  Once the
+   budget is the limit (the next hit does not fit), the remaining budget is
+   filled greedily by score per token among the hits left.  The selection
+   is returned in score order.  If not even one hit fits, the best passage
+   is truncated to the budget so the caller still gets an answer.
+   With ``ordered`` (cursor pages) only the longest prefix of the given
+   ranking that fits is taken, so consecutive pages concatenate to the
+   ranking.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .index import SearchHit
+from .tokenizer import estimate_tokens
+
+RESULT_OVERHEAD_TOKENS = 24  # link, path and JSON keys of one result
+MERGE_GAP = 2  # passages this close (stripped whitespace) count as touching
+
+_TRAILING_WS_RE = re.compile(r"[ \t]+\n")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+@dataclass
+class PackedResults:
+    hits: List[SearchHit]
+    tokens: int  # estimated tokens used, per-result overhead included
+    dropped: int  # candidates left out to respect the budget
+
+
+def squeeze(text: str) -> str:
+    """Drop trailing spaces and collapse runs of blank lines."""
+    return _BLANK_LINES_RE.sub("\n\n", _TRAILING_WS_RE.sub("\n", text)).strip()
+
+
+def merge_hits(hits: List[SearchHit]) -> List[SearchHit]:
+    """Fuse overlapping or touching passages of the same note.
+
+    The merged hit takes the place of the best-scoring hit it absorbed, so
+    the list order (usually by score) is kept.
+    """
+    by_note: Dict[Tuple[Optional[str], int], List[SearchHit]] = {}
+    for hit in hits:
+        if hit.note_summary is None:
+            by_note.setdefault((hit.shard, hit.note_id), []).append(hit)
+    replaced: Dict[int, SearchHit] = {}  # id(original best hit) -> merged hit
+    absorbed = set()
+    for group in by_note.values():
+        if len(group) < 2:
+            continue
+        group = sorted(group, key=lambda h: h.start)
+        runs = [[group[0]]]
+        for hit in group[1:]:
+            if hit.start <= max(h.end for h in runs[-1]) + MERGE_GAP:
+                runs[-1].append(hit)
+            else:
+                runs.append([hit])
+        for run in runs:
+            if len(run) < 2:
+                continue
+            merged = run[0]
+            for hit in run[1:]:
+                merged = _fuse(merged, hit)
+            best = max(run, key=lambda h: h.score)
+            replaced[id(best)] = merged
+            absorbed.update(id(h) for h in run if h is not best)
+    return [replaced.get(id(h), h) for h in hits if id(h) not in absorbed]
+
+
+def _fuse(a: SearchHit, b: SearchHit) -> SearchHit:
+    """Join two passages of one note (``a`` starts first)."""
+    if b.end <= a.end:
+        text = a.snippet
+    elif b.start < a.end:
+        text = a.snippet + b.snippet[a.end - b.start:]
+    else:
+        text = a.snippet + "\n" * (b.start - a.end) + b.snippet
+    best = a if a.score >= b.score else b
+    section_tokens = a.section_tokens + b.section_tokens if a.chunk_id != b.chunk_id else best.section_tokens
+    return replace(
+        best,
+        snippet=text,
+        start=a.start,
+        end=max(a.end, b.end),
+        tokens=estimate_tokens(text),
+        section_tokens=section_tokens,
+    )
+
+
+def truncate(hit: SearchHit, max_tokens: int) -> SearchHit:
+    """Shorten the passage (at a word boundary) until it fits ``max_tokens``."""
+    text = hit.snippet
+    while text and estimate_tokens(text) > max_tokens:
+        keep = int(len(text) * min(0.9, max_tokens / estimate_tokens(text)))
+        cut = text.rfind(" ", 0, keep)
+        text = text[:cut if cut > keep // 2 else keep].rstrip()
+    if len(text) < len(hit.snippet):
+        text += "…"
+    return replace(hit, snippet=text, end=hit.start + len(text), tokens=estimate_tokens(text))
+
+
+def covered(hit: SearchHit, shown: Iterable[SearchHit]) -> bool:
+    """True if a passage in ``shown`` (same vault and note) contains ``hit``'s passage."""
+    return any(
+        s.shard == hit.shard and s.path == hit.path and s.start <= hit.start and hit.end <= s.end for s in shown
+    )
+
+
+def pack_hits(
+    hits: List[SearchHit],
+    max_tokens: int,
+    max_results: Optional[int] = None,
+    overhead: int = RESULT_OVERHEAD_TOKENS,
+    ordered: bool = False,
+) -> PackedResults:
+    """Choose the hits to return within ``max_tokens`` (see module docstring)."""
+    candidates = []
+    for hit in merge_hits(hits):
+        text = squeeze(hit.snippet)
+        candidates.append(replace(hit, snippet=text, tokens=estimate_tokens(text)) if text != hit.snippet else hit)
+    limit = len(candidates) if max_results is None else max_results
+    ranked = candidates if ordered else sorted(candidates, key=lambda h: h.score, reverse=True)
+    chosen: List[SearchHit] = []
+    used = 0
+    rest = 0  # ranked[rest:] did not fit in score order
+    for hit in ranked:
+        if len(chosen) >= limit or used + hit.tokens + overhead > max_tokens:
+            break
+        chosen.append(hit)
+        used += hit.tokens + overhead
+        rest += 1
+    for hit in [] if ordered else sorted(ranked[rest:], key=lambda h: h.score / (h.tokens + overhead), reverse=True):
+        if len(chosen) >= limit:
+            break
+        cost = hit.tokens + overhead
+        if used + cost <= max_tokens:
+            chosen.append(hit)
+            used += cost
+    if not chosen and candidates and max_tokens > overhead:
+        best = truncate(ranked[0] if ordered else max(candidates, key=lambda h: h.score), max_tokens - overhead)
+        chosen.append(best)
+        used = best.tokens + overhead
+    if not ordered:
+        chosen.sort(key=lambda h: h.score, reverse=True)
+    return PackedResults(hits=chosen, tokens=used, dropped=len(candidates) - len(chosen))
+
+
+__all__ = ["PackedResults", "RESULT_OVERHEAD_TOKENS", "covered", "merge_hits", "pack_hits", "squeeze", "truncate"]
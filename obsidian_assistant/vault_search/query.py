@@ -0,0 +1,99 @@
+"""Fielded query syntax for vault search.
+
+    tag:project path:Work/ "exact phrase" -draft -tag:archived /sync(ing)?/ plug* pluign~
+
+- ``field:value`` filters on the structured side index (tag, alias, link)
+  or on the note path (substring, case-insensitive).  Several filters are
+  ANDed; a leading ``-`` negates one.
+- ``"..."`` is a phrase that must occur in the returned section (it also
+  contributes to ranking).
+- ``-word`` / ``-"a phrase"`` drops notes that contain it (body or title)
+  or carry it as a tag or alias.
+- ``/regex/`` must match the note text (case-insensitive, multi-line);
+  ``plug*`` / ``*sync*`` are wildcards turned into such a regex.  A
+  leading ``-`` drops notes that match.  Candidates come from the term
+  trigram index (see trigram.py); only they are read and verified.
+- ``word~`` / ``word~2`` also matches terms within 1 or 2 edits
+  (misspelt plugin names); an unknown word is corrected automatically.
+- Everything else is free text ranked with BM25F.
+
+Unknown ``field:`` prefixes (``http:``, ``C++:``) are treated as free text.
+Filters are resolved against the side index and postings only, so a narrow
+query never reads note content except for regex candidates and the hits it
+returns.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .trigram import wildcard_pattern
+
+FILTER_FIELDS = ("tag", "path", "alias", "link")
+
+_CLAUSE_RE = re.compile(r'(-?)(?:([A-Za-z]+):)?(?:"([^"]*)"?|/((?:[^/\\\n]|\\.)+)/(?=\s|$)|(\S+))')
+_FUZZY_RE = re.compile(r"^(.+?)~([0-9]?)$")
+
+
+@dataclass
+class ParsedQuery:
+    terms: List[str] = field(default_factory=list)  # free words
+    phrases: List[str] = field(default_factory=list)
+    excluded: List[str] = field(default_factory=list)
+    filters: Dict[str, List[str]] = field(default_factory=dict)
+    negated: Dict[str, List[str]] = field(default_factory=dict)
+    regexes: List[str] = field(default_factory=list)  # /regex/ and wildcards
+    excluded_regexes: List[str] = field(default_factory=list)
+    fuzzy: Dict[str, Optional[int]] = field(default_factory=dict)  # word~N (None = default edits)
+
+    @property
+    def text(self) -> str:
+        """Positive text to rank with (free words and phrases)."""
+        return " ".join(self.terms + self.phrases)
+
+    @property
+    def has_filters(self) -> bool:
+        return bool(
+            self.filters or self.negated or self.excluded or self.phrases or self.regexes or self.excluded_regexes
+        )
+
+
+def parse_query(query: str) -> ParsedQuery:
+    parsed = ParsedQuery()
+    for m in _CLAUSE_RE.finditer(query):
+        negate, name, quoted, regex, bare = m.groups()
+        if regex is not None and not name:
+            (parsed.excluded_regexes if negate else parsed.regexes).append(regex)
+            continue
+        if regex is not None:
+            bare = f"/{regex}/"
+        value = quoted if quoted is not None else bare
+        if name and name.lower() in FILTER_FIELDS:
+            if value:
+                target = parsed.negated if negate else parsed.filters
+                target.setdefault(name.lower(), []).append(value)
+            continue
+        if name:  # not a filter: keep "name:value" as text
+            value = f"{name}:{value}" if quoted is None else f"{name}: {value}"
+            quoted = None
+        if not value:
+            continue
+        if quoted is None and "*" in value and value.strip("*"):
+            (parsed.excluded_regexes if negate else parsed.regexes).append(wildcard_pattern(value))
+            continue
+        fuzzy = _FUZZY_RE.match(value) if quoted is None else None
+        if fuzzy:
+            value = fuzzy.group(1)
+            if not negate:
+                parsed.fuzzy[value] = int(fuzzy.group(2)) if fuzzy.group(2) else None
+        if negate:
+            parsed.excluded.append(value)
+        elif quoted is not None:
+            parsed.phrases.append(value)
+        else:
+            parsed.terms.append(value)
+    return parsed
+
+
+__all__ = ["FILTER_FIELDS", "ParsedQuery", "parse_query"]
@@ -0,0 +1,597 @@
+"""Binary, memory-mapped index file (``vault_index.bin``).
+
+A JSON index has to be parsed into Python dicts in full, so every server
+worker holds its own copy of every posting list.  This format is read
+through ``mmap``.  Opening a file parses a small directory and the note
+records (VaultIndex needs every note's path, tags, aliases and links to
+build its lookup tables).  Posting lists and section (chunk) records are
+decoded on demand, and the pages are shared by all processes that map the
+same file, through the OS page cache.
+
+Layout (little endian; every section starts 8-byte aligned)::
+
+    magic "OBVSIDX\\0" | u32 format version | u32 0 | u64 dir offset | u64 dir length
+    sections ...
+    directory (JSON): analyzer, docs_path, built_at, counts, section offsets
+
+Every section is a *blob table*: ``count + 1`` u64 offsets followed by the
+concatenated records, so record ``i`` is ``data[off[i]:off[i + 1]]`` (an
+empty record means "none").  The sections are:
+
+- ``notes`` / ``chunks``: the doc tables (one compact JSON record each).
+- ``vocab``: every indexed term, UTF-8, sorted by code point.  Lookups
+  binary-search it and do not build a Python dict.
+- ``postings.<field>``: record i holds the posting list of vocab term i,
+  stored as varints: chunk count, then per chunk the chunk-id delta, the
+  position count and the position deltas.
+- ``chunk_terms``: record i holds the sorted vocab ids of chunk i, also as
+  varint deltas.
+
+FieldPostings and ChunkTerms expose a file as the mutable mappings that
+VaultIndex already uses, and ChunkRecords exposes the ``chunks`` table as
+its list of ChunkRecord (None for a free slot).  Reads come from the file, through a small cache
+of decoded lists.  Writes go to an in-memory delta, so incremental updates
+never touch the mapped pages.  write_segment() merges file + delta into a
+new file.  Records nobody changed (or decoded) are copied as raw bytes.  The caller
+publishes the new file with ``os.replace`` (replacing() gives every
+writer its own temporary file) and reopens it.  Readers that
+still map the old file keep a valid view of it, because on POSIX the
+replaced inode lives until it is unmapped.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, MutableMapping, MutableSequence, Optional, Sequence, Tuple, Union
+
+from .documents import FIELDS, ChunkRecord, NoteRecord
+
+MAGIC = b"OBVSIDX\0"
+SEGMENT_FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<8sIIQQ")
+DECODE_CACHE = 2048  # decoded posting lists kept per field
+
+
+class SegmentError(ValueError):
+    """The file is not a readable segment of this format version."""
+
+
+# ----------------------------------------------------------------------
+# Varints
+# ----------------------------------------------------------------------
+def encode_varints(values: Iterable[int], out: bytearray) -> None:
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+
+def _decode_varints(buf) -> List[int]:
+    values: List[int] = []
+    value = shift = 0
+    for byte in buf:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+    return values
+
+
+def _first_varint(buf) -> int:
+    value = shift = 0
+    for byte in buf:
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+    return value
+
+
+def encode_postings(plist: Dict[int, List[int]]) -> bytes:
+    out = bytearray()
+    encode_varints((len(plist),), out)
+    previous = 0
+    for chunk_id in sorted(plist):
+        positions = plist[chunk_id]
+        encode_varints((chunk_id - previous, len(positions)), out)
+        last = 0
+        for pos in positions:
+            encode_varints((pos - last,), out)
+            last = pos
+        previous = chunk_id
+    return bytes(out)
+
+
+def decode_postings(buf) -> Dict[int, List[int]]:
+    values = _decode_varints(buf)
+    plist: Dict[int, List[int]] = {}
+    i, chunk_id = 1, 0
+    for _ in range(values[0] if values else 0):
+        chunk_id += values[i]
+        n = values[i + 1]
+        i += 2
+        positions, pos = [], 0
+        for delta in values[i:i + n]:
+            pos += delta
+            positions.append(pos)
+        plist[chunk_id] = positions
+        i += n
+    return plist
+
+
+def encode_ids(ids: Iterable[int]) -> bytes:
+    out = bytearray()
+    previous = 0
+    for value in ids:
+        encode_varints((value - previous,), out)
+        previous = value
+    return bytes(out)
+
+
+def decode_ids(buf) -> List[int]:
+    ids, total = [], 0
+    for delta in _decode_varints(buf):
+        total += delta
+        ids.append(total)
+    return ids
+
+
+# ----------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------
+class _BlobTable:
+    def __init__(self, view: memoryview, offset: int, count: int) -> None:
+        self.count = count
+        self._offsets = view[offset:offset + 8 * (count + 1)].cast("Q")
+        self._data = view[offset + 8 * (count + 1):]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get(self, i: int) -> memoryview:
+        return self._data[self._offsets[i]:self._offsets[i + 1]]
+
+    def size(self, i: int) -> int:
+        return self._offsets[i + 1] - self._offsets[i]
+
+
+class _Vocab(Sequence[str]):
+    """Sorted term dictionary; ``vocab[i]`` decodes one term."""
+
+    def __init__(self, table: _BlobTable) -> None:
+        self._table = table
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __getitem__(self, i):  # type: ignore[override]
+        return bytes(self._table.get(i)).decode("utf-8")
+
+    def find(self, term: str) -> Optional[int]:
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self._table)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(self._table.get(mid)) < key:  # UTF-8 byte order == code point order
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self._table) and self._table.get(lo) == key else None
+
+
+class SegmentReader:
+    """One opened (memory-mapped) index file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # empty file
+                raise SegmentError(str(e)) from e
+        self.view = memoryview(self._mmap)
+        if len(self.view) < _PREAMBLE.size:
+            raise SegmentError("truncated index file")
+        magic, version, _, dir_offset, dir_length = _PREAMBLE.unpack_from(self.view)
+        if magic != MAGIC:
+            raise SegmentError("not a vault index file")
+        if version != SEGMENT_FORMAT_VERSION:
+            raise SegmentError(f"segment format {version}")
+        try:
+            self.directory = json.loads(bytes(self.view[dir_offset:dir_offset + dir_length]))
+        except ValueError as e:
+            raise SegmentError("corrupt directory") from e
+        self.tables = {name: _BlobTable(self.view, off, count) for name, (off, count) in self.directory["sections"].items()}
+        self.vocab = _Vocab(self.tables["vocab"])
+
+    @property
+    def meta(self) -> Dict[str, object]:
+        return self.directory["meta"]
+
+    def notes(self) -> List[Optional[NoteRecord]]:
+        table = self.tables["notes"]
+        return [NoteRecord(**json.loads(bytes(table.get(i)))) if table.size(i) else None for i in range(len(table))]
+
+    def chunks(self) -> "ChunkRecords":
+        return ChunkRecords(self)
+
+
+class ChunkRecords(MutableSequence[Optional[ChunkRecord]]):
+    """chunk_id -> ChunkRecord (None = free slot): file plus an in-memory delta.
+
+    A record is decoded on first access and kept, so callers always see the
+    same object.  Assigned and appended records live in the delta; slots
+    are never deleted or inserted in the middle (ids are stable).
+    """
+
+    def __init__(self, reader: SegmentReader) -> None:
+        self.reader = reader
+        self._table = reader.tables["chunks"]
+        self._decoded: Dict[int, Optional[ChunkRecord]] = {}
+        self.delta: Dict[int, Optional[ChunkRecord]] = {}  # assigned slots of the file
+        self._appended: List[Optional[ChunkRecord]] = []
+
+    def __len__(self) -> int:
+        return len(self._table) + len(self._appended)
+
+    def __getitem__(self, chunk_id):  # type: ignore[override]
+        if isinstance(chunk_id, slice):
+            return [self[i] for i in range(*chunk_id.indices(len(self)))]
+        if chunk_id < 0:
+            chunk_id += len(self)
+        base = len(self._table)
+        if not 0 <= chunk_id < len(self):
+            raise IndexError(chunk_id)
+        if chunk_id >= base:
+            return self._appended[chunk_id - base]
+        if chunk_id in self.delta:
+            return self.delta[chunk_id]
+        if chunk_id not in self._decoded:
+            buf = self._table.get(chunk_id)
+            self._decoded[chunk_id] = ChunkRecord(**json.loads(bytes(buf))) if len(buf) else None
+        return self._decoded[chunk_id]
+
+    def __setitem__(self, chunk_id, record) -> None:  # type: ignore[override]
+        if isinstance(chunk_id, slice) or not 0 <= chunk_id < len(self):
+            raise IndexError(chunk_id)
+        base = len(self._table)
+        if chunk_id >= base:
+            self._appended[chunk_id - base] = record
+        else:
+            self.delta[chunk_id] = record
+
+    def __delitem__(self, chunk_id) -> None:  # type: ignore[override]
+        raise TypeError("chunk ids are stable: free a slot by assigning None")
+
+    def insert(self, index: int, record: Optional[ChunkRecord]) -> None:
+        if index != len(self):
+            raise TypeError("chunk ids are stable: records can only be appended")
+        self._appended.append(record)
+
+    def __iter__(self) -> Iterator[Optional[ChunkRecord]]:
+        for chunk_id in range(len(self)):
+            yield self[chunk_id]
+
+    def is_free(self, chunk_id: int) -> bool:
+        """True for a free slot, without decoding the record."""
+        base = len(self._table)
+        if chunk_id >= base:
+            return self._appended[chunk_id - base] is None
+        if chunk_id in self.delta:
+            return self.delta[chunk_id] is None
+        return not self._table.size(chunk_id)
+
+    def free_ids(self) -> List[int]:
+        return [chunk_id for chunk_id in range(len(self)) if self.is_free(chunk_id)]
+
+    def raw(self, chunk_id: int) -> Optional[memoryview]:
+        """Encoded record straight from the file (None if assigned, appended or already decoded)."""
+        if chunk_id >= len(self._table) or chunk_id in self.delta or chunk_id in self._decoded:
+            return None
+        return self._table.get(chunk_id)
+
+
+class FieldPostings(MutableMapping[str, Dict[int, List[int]]]):
+    """term -> {chunk_id: positions} for one field: file + in-memory delta.
+
+    Callers that change a posting list must assign it back
+    (``postings[term] = plist``); lists handed out by a lookup may be shared
+    with the decode cache.
+    """
+
+    def __init__(self, reader: Optional[SegmentReader], field: str) -> None:
+        self.reader = reader
+        self._table = reader.tables[f"postings.{field}"] if reader is not None else None
+        self._base_count = reader.directory["terms"][field] if reader is not None else 0
+        self.delta: Dict[str, Optional[Dict[int, List[int]]]] = {}  # None = removed
+        self._cache: "OrderedDict[int, Dict[int, List[int]]]" = OrderedDict()
+        self._size = self._base_count
+
+    def _base_id(self, term: str) -> Optional[int]:
+        if self._table is None:
+            return None
+        term_id = self.reader.vocab.find(term)
+        return term_id if term_id is not None and self._table.size(term_id) else None
+
+    def _decode(self, term_id: int) -> Dict[int, List[int]]:
+        plist = self._cache.get(term_id)
+        if plist is None:
+            plist = decode_postings(self._table.get(term_id))
+            self._cache[term_id] = plist
+            if len(self._cache) > DECODE_CACHE:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(term_id)
+        return plist
+
+    def __getitem__(self, term: str) -> Dict[int, List[int]]:
+        if term in self.delta:
+            plist = self.delta[term]
+            if plist is None:
+                raise KeyError(term)
+            return plist
+        term_id = self._base_id(term)
+        if term_id is None:
+            raise KeyError(term)
+        return self._decode(term_id)
+
+    def __setitem__(self, term: str, plist: Dict[int, List[int]]) -> None:
+        if term not in self:
+            self._size += 1
+        self.delta[term] = plist
+
+    def __delitem__(self, term: str) -> None:
+        if term not in self:
+            raise KeyError(term)
+        self._size -= 1
+        if self._base_id(term) is None:
+            del self.delta[term]
+        else:
+            self.delta[term] = None
+
+    def __contains__(self, term: object) -> bool:
+        if term in self.delta:
+            return self.delta[term] is not None
+        return isinstance(term, str) and self._base_id(term) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        if self._table is not None:
+            for term_id in range(len(self._table)):
+                if self._table.size(term_id):
+                    term = self.reader.vocab[term_id]
+                    if term not in self.delta:
+                        yield term
+        for term, plist in list(self.delta.items()):
+            if plist is not None:
+                yield term
+
+    def __len__(self) -> int:
+        return self._size
+
+    def count(self, term: str) -> int:
+        """Sections in the posting list of ``term``, without decoding it (only its leading count)."""
+        if term in self.delta:
+            plist = self.delta[term]
+            return len(plist) if plist else 0
+        term_id = self._base_id(term)
+        if term_id is None:
+            return 0
+        cached = self._cache.get(term_id)
+        return len(cached) if cached is not None else _first_varint(self._table.get(term_id))
+
+    def raw(self, term: str) -> Optional[memoryview]:
+        """Encoded posting list straight from the file (None if changed or absent)."""
+        if term in self.delta:
+            return None
+        term_id = self._base_id(term)
+        return self._table.get(term_id) if term_id is not None else None
+
+
+class ChunkTerms(MutableMapping[int, List[str]]):
+    """chunk_id -> distinct terms, from the file plus an in-memory delta."""
+
+    def __init__(self, reader: Optional[SegmentReader]) -> None:
+        self.reader = reader
+        self._table = reader.tables["chunk_terms"] if reader is not None else None
+        self.delta: Dict[int, Optional[List[str]]] = {}
+
+    def _in_base(self, chunk_id: int) -> bool:
+        return self._table is not None and 0 <= chunk_id < len(self._table) and self._table.size(chunk_id) > 0
+
+    def __getitem__(self, chunk_id: int) -> List[str]:
+        if chunk_id in self.delta:
+            terms = self.delta[chunk_id]
+            if terms is None:
+                raise KeyError(chunk_id)
+            return terms
+        if not self._in_base(chunk_id):
+            raise KeyError(chunk_id)
+        vocab = self.reader.vocab
+        return [vocab[i] for i in decode_ids(self._table.get(chunk_id))]
+
+    def __setitem__(self, chunk_id: int, terms: List[str]) -> None:
+        self.delta[chunk_id] = terms
+
+    def __delitem__(self, chunk_id: int) -> None:
+        if chunk_id not in self:
+            raise KeyError(chunk_id)
+        self.delta[chunk_id] = None
+
+    def __contains__(self, chunk_id: object) -> bool:
+        if chunk_id in self.delta:
+            return self.delta[chunk_id] is not None
+        return isinstance(chunk_id, int) and self._in_base(chunk_id)
+
+    def __iter__(self) -> Iterator[int]:
+        if self._table is not None:
+            for chunk_id in range(len(self._table)):
+                if chunk_id not in self.delta and self._table.size(chunk_id):
+                    yield chunk_id
+        for chunk_id, terms in list(self.delta.items()):
+            if terms is not None:
+                yield chunk_id
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def raw_ids(self, chunk_id: int) -> Optional[List[int]]:
+        """Vocab ids of an unchanged chunk in the file (None if changed or absent)."""
+        if chunk_id in self.delta or not self._in_base(chunk_id):
+            return None
+        return decode_ids(self._table.get(chunk_id))
+
+
+def open_segment(path: Path) -> Tuple[SegmentReader, Dict[str, FieldPostings], ChunkTerms]:
+    reader = SegmentReader(path)
+    return reader, {f: FieldPostings(reader, f) for f in FIELDS}, ChunkTerms(reader)
+
+
+# ----------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------
+@contextmanager
+def replacing(path: Union[str, Path], suffix: str = ".tmp") -> Iterator[Path]:
+    """Yield a new temporary file next to ``path``; on success ``os.replace`` it over ``path``.
+
+    The name is unique (mkstemp), so processes sharing an index directory
+    never write the same temporary file.  On error the file is removed.
+    """
+    path = Path(path)
+    fd, name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=suffix)
+    os.close(fd)
+    tmp = Path(name)
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _align(f) -> None:
+    pad = -f.tell() % 8
+    if pad:
+        f.write(b"\0" * pad)
+
+
+def _write_table(f, records: Iterable[bytes], count: int) -> Tuple[int, int]:
+    """Write a blob table; returns (offset, count)."""
+    _align(f)
+    start = f.tell()
+    offsets = [0] * (count + 1)
+    f.write(b"\0" * 8 * (count + 1))  # offsets are filled in below
+    total = 0
+    for i, record in enumerate(records):
+        f.write(record)
+        total += len(record)
+        offsets[i + 1] = total
+    end = f.tell()
+    f.seek(start)
+    f.write(struct.pack(f"<{count + 1}Q", *offsets))
+    f.seek(end)
+    return start, count
+
+
+def write_segment(
+    path: Path,
+    meta: Dict[str, object],
+    notes: Sequence[Optional[NoteRecord]],
+    chunks: Sequence[Optional[ChunkRecord]],
+    chunk_terms: MutableMapping[int, List[str]],
+    postings: Dict[str, MutableMapping[str, Dict[int, List[int]]]],
+) -> None:
+    """Write a complete index file to ``path`` (the caller swaps it into place)."""
+    vocab = sorted(set().union(*(postings[f].keys() for f in FIELDS)))
+    term_ids = {term: i for i, term in enumerate(vocab)}
+    old_vocab = chunk_terms.reader.vocab if isinstance(chunk_terms, ChunkTerms) and chunk_terms.reader else None
+
+    def field_records(field: str) -> Iterator[bytes]:
+        field_postings = postings[field]
+        raw = field_postings.raw if isinstance(field_postings, FieldPostings) else None
+        for term in vocab:
+            encoded = raw(term) if raw is not None else None
+            if encoded is not None:
+                yield bytes(encoded)  # unchanged: copy the encoded list as is
+                continue
+            plist = field_postings.get(term)
+            yield encode_postings(plist) if plist else b""
+
+    def chunk_term_records() -> Iterator[bytes]:
+        remap: Dict[int, int] = {}
+        is_free = chunks.is_free if isinstance(chunks, ChunkRecords) else (lambda cid: chunks[cid] is None)
+        for chunk_id in range(len(chunks)):
+            if is_free(chunk_id):
+                yield b""
+                continue
+            old_ids = chunk_terms.raw_ids(chunk_id) if old_vocab is not None else None
+            if old_ids is not None:
+                ids = []
+                for old in old_ids:
+                    new = remap.get(old)
+                    if new is None:
+                        new = remap[old] = term_ids[old_vocab[old]]
+                    ids.append(new)
+            else:
+                ids = sorted(term_ids[t] for t in chunk_terms.get(chunk_id, ()))
+            yield encode_ids(ids)
+
+    def doc_records(records: Sequence[object]) -> Iterator[bytes]:
+        raw = records.raw if isinstance(records, ChunkRecords) else None
+        for i in range(len(records)):
+            encoded = raw(i) if raw is not None else None
+            if encoded is not None:
+                yield bytes(encoded)  # never decoded: copy the record as is
+                continue
+            record = records[i]
+            yield json.dumps(asdict(record), ensure_ascii=False, separators=(",", ":")).encode("utf-8") if record is not None else b""
+
+    sections: Dict[str, Tuple[int, int]] = {}
+    with Path(path).open("wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, SEGMENT_FORMAT_VERSION, 0, 0, 0))
+        sections["notes"] = _write_table(f, doc_records(notes), len(notes))
+        sections["chunks"] = _write_table(f, doc_records(chunks), len(chunks))
+        sections["vocab"] = _write_table(f, (t.encode("utf-8") for t in vocab), len(vocab))
+        for field in FIELDS:
+            sections[f"postings.{field}"] = _write_table(f, field_records(field), len(vocab))
+        sections["chunk_terms"] = _write_table(f, chunk_term_records(), len(chunks))
+        directory = {
+            "meta": meta,
+            "terms": {field: len(postings[field]) for field in FIELDS},
+            "sections": sections,
+        }
+        blob = json.dumps(directory, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        _align(f)
+        dir_offset = f.tell()
+        f.write(blob)
+        f.seek(0)
+        f.write(_PREAMBLE.pack(MAGIC, SEGMENT_FORMAT_VERSION, 0, dir_offset, len(blob)))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+__all__ = [
+    "ChunkRecords",
+    "ChunkTerms",
+    "FieldPostings",
+    "SEGMENT_FORMAT_VERSION",
+    "SegmentError",
+    "SegmentReader",
+    "decode_ids",
+    "decode_postings",
+    "encode_ids",
+    "encode_postings",
+    "encode_varints",
+    "open_segment",
+    "replacing",
+    "write_segment",
+]
@@ -0,0 +1,442 @@
+"""Offline semantic retrieval over section vectors (NumPy, optional).
+
+No remote embedding API is needed: sections are embedded with latent
+semantic analysis over the index's own terms.
+
+Vectoriser:
+    Hashed TF-IDF.  Term frequencies come straight from the postings
+    (title and heading hits weighted like BM25F), so fitting never re-reads
+    notes; each term is hashed (crc32) into ``n_features`` columns,
+    sublinear tf is multiplied by a smoothed idf and rows are L2-normalised.
+
+Projection (LSA, optional):
+    Randomized truncated SVD (Halko et al.) of the sparse section x feature
+    matrix; the sparse products are blocked NumPy gathers + reduceat, so
+    no SciPy is needed.  Sections and queries are both projected with the
+    same ``n_features x dims`` matrix.  With
+    ``lsa_dims=0`` the hashed vectors are stored as they are (use a small
+    ``n_features`` then).
+
+Storage (``<index_dir>/semantic/``):
+    vectors.npy (rows x dims, int8 with a per-row scale, or float32) is
+    opened with ``mmap_mode="r"``, and so is signatures.npy (rows x 4
+    float64: note id, start, end, note mtime of each row); scales.npy,
+    idf.npy, projection.npy, chunk_ids.npy and meta.json (written last)
+    complete the set.
+
+Maintenance:
+    sync() compares each row's (note id, offsets, note mtime) with the chunk
+    table.  Added or edited sections are folded in with the stored idf and
+    projection and kept in memory; removed sections are masked.  Once the
+    delta exceeds REFIT_FRACTION of the rows the model is fitted again.
+
+Scoring is batched cosine similarity over blocks of rows, or over the
+candidate rows only when a query filter restricts them.  From ANN_MIN_ROWS
+sections on, unfiltered queries go through an IVF index instead (ann.py,
+``ivf*`` files next to the vectors); folded-in and removed sections are
+inserted into / deleted from it as well.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import zlib
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # semantic search is an optional feature
+    np = None  # type: ignore[assignment]
+
+from .ann import IVFIndex, quantize_int8
+from .segment import replacing
+
+if TYPE_CHECKING:
+    from .index import VaultIndex
+
+SEMANTIC_DIRNAME = "semantic"
+SEMANTIC_FORMAT_VERSION = 2
+DEFAULT_FEATURES = 1 << 15
+HASH_ONLY_FEATURES = 1024  # n_features default when lsa_dims == 0
+DEFAULT_LSA_DIMS = 128
+FIELD_WEIGHTS = {"title": 3.0, "headings": 2.0, "body": 1.0}
+REFIT_FRACTION = 0.2
+SIGNATURE_FIELDS = 4  # note id, start, end, note mtime
+MIN_SIMILARITY = 0.05
+SCORE_BLOCK = 65536  # rows per matmul block
+ANN_MIN_ROWS = 50_000  # sections from which unfiltered queries use the IVF index
+SPMM_BLOCK = 65536  # non-zeros per sparse-product block
+
+
+def semantic_available() -> bool:
+    return np is not None
+
+
+def _feature(term: str, n_features: int) -> int:
+    return zlib.crc32(term.encode("utf-8")) % n_features
+
+
+def _spmm(rows, cols, vals, dense, n_rows: int):
+    """(sparse COO matrix) @ dense: row-sorted blocks summed with np.add.reduceat."""
+    order = np.argsort(rows, kind="stable")
+    rows, cols, vals = rows[order], cols[order], vals[order]
+    out = np.zeros((n_rows, dense.shape[1]), dtype=np.float32)
+    for start in range(0, len(vals), SPMM_BLOCK):
+        r = rows[start:start + SPMM_BLOCK]
+        products = dense[cols[start:start + SPMM_BLOCK]] * vals[start:start + SPMM_BLOCK, None]
+        heads = np.flatnonzero(np.r_[True, r[1:] != r[:-1]])
+        out[r[heads]] += np.add.reduceat(products, heads, axis=0)
+    return out
+
+
+def randomized_svd(rows, cols, vals, shape: Tuple[int, int], k: int, n_iter: int = 2, seed: int = 0):
+    """Top-``k`` right singular vectors (n_features x k) of a sparse COO matrix."""
+    n, d = shape
+    width = min(k + 10, n, d)
+    rng = np.random.default_rng(seed)
+    omega = rng.standard_normal((d, width)).astype(np.float32)
+    q, _ = np.linalg.qr(_spmm(rows, cols, vals, omega, n))
+    for _ in range(n_iter):
+        z, _ = np.linalg.qr(_spmm(cols, rows, vals, q, d))
+        q, _ = np.linalg.qr(_spmm(rows, cols, vals, z, n))
+    bt = _spmm(cols, rows, vals, q, d)  # (Q^T X)^T
+    _, _, vt = np.linalg.svd(bt.T, full_matrices=False)
+    return np.ascontiguousarray(vt[:min(k, width)].T, dtype=np.float32)
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1.0
+    return (matrix / norms[:, None]).astype(np.float32)
+
+
+class SemanticIndex:
+    """Section vectors for one VaultIndex (see module docstring).
+
+    Parameters:
+        directory: Where the model and vectors are stored.
+        n_features: Hash space of the TF-IDF vectoriser.
+        lsa_dims: LSA dimensions (0 stores the hashed vectors directly).
+        quantize: "int8" (default) or "float32" storage.
+        ann_min_rows: Build an IVF index once the vault has this many sections.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        n_features: Optional[int] = None,
+        lsa_dims: int = DEFAULT_LSA_DIMS,
+        quantize: str = "int8",
+        ann_min_rows: int = ANN_MIN_ROWS,
+    ) -> None:
+        if np is None:
+            raise RuntimeError("semantic search requires numpy")
+        self.directory = Path(directory)
+        self.lsa_dims = lsa_dims
+        self.n_features = n_features or (DEFAULT_FEATURES if lsa_dims else HASH_ONLY_FEATURES)
+        self.quantize = quantize
+        self.ann_min_rows = ann_min_rows
+        self.ann: Optional[IVFIndex] = None
+        self.analyzer = ""
+        self.idf = None
+        self.projection = None
+        self.vectors = None
+        self.scales = None
+        self.chunk_ids = None
+        self.signatures = None  # rows x 4 (see _signature)
+        self._row_of: Dict[int, int] = {}
+        self._masked: Set[int] = set()
+        self._extra: Dict[int, object] = {}  # chunk id -> folded-in float32 vector
+        self._extra_sig: Dict[int, List[float]] = {}
+
+    @classmethod
+    def from_env(cls, directory: Path) -> "SemanticIndex":
+        """OBSIDIAN_SEMANTIC_DIMS sets lsa_dims (0 = hashed vectors only),
+        OBSIDIAN_ANN_MIN_ROWS the section count from which the IVF index is used."""
+        dims = os.getenv("OBSIDIAN_SEMANTIC_DIMS")
+        ann_rows = os.getenv("OBSIDIAN_ANN_MIN_ROWS")
+        return cls(
+            directory,
+            lsa_dims=int(dims) if dims and dims.isdigit() else DEFAULT_LSA_DIMS,
+            ann_min_rows=int(ann_rows) if ann_rows and ann_rows.isdigit() else ANN_MIN_ROWS,
+        )
+
+    @property
+    def dims(self) -> int:
+        return 0 if self.vectors is None else int(self.vectors.shape[1])
+
+    @property
+    def rows(self) -> int:
+        return 0 if self.vectors is None else int(self.vectors.shape[0])
+
+    # ------------------------------------------------------------------
+    # Vectorisation
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _signature(index: "VaultIndex", chunk_id: int) -> List[float]:
+        chunk = index.chunks[chunk_id]
+        return [chunk.note_id, chunk.start, chunk.end, index.notes[chunk.note_id].mtime]
+
+    def _chunk_counts(self, index: "VaultIndex", chunk_id: int) -> Dict[int, float]:
+        counts: Dict[int, float] = {}
+        for term in index.chunk_terms.get(chunk_id, ()):
+            tf = 0.0
+            for f, weight in FIELD_WEIGHTS.items():
+                positions = index.postings[f].get(term, {}).get(chunk_id)
+                if positions:
+                    tf += weight * len(positions)
+            col = _feature(term, self.n_features)
+            counts[col] = counts.get(col, 0.0) + tf
+        return counts
+
+    def _embed_counts(self, counts: Dict[int, float]):
+        """Fold one sparse count vector into the model space (normalised float32)."""
+        if not counts:
+            return None
+        cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        vals = (1.0 + np.log(tf)) * self.idf[cols]
+        if self.projection is not None:
+            vec = vals @ self.projection[cols]
+        else:
+            vec = np.zeros(self.n_features, dtype=np.float32)
+            vec[cols] = vals
+        norm = float(np.linalg.norm(vec))
+        return (vec / norm).astype(np.float32) if norm > 0 else None
+
+    def query_vector(self, terms: Iterable[str]):
+        counts: Dict[int, float] = {}
+        for term in terms:
+            col = _feature(term, self.n_features)
+            counts[col] = counts.get(col, 0.0) + 1.0
+        return self._embed_counts(counts) if self.idf is not None else None
+
+    # ------------------------------------------------------------------
+    # Fit / persistence
+    # ------------------------------------------------------------------
+    def fit(self, index: "VaultIndex") -> None:
+        """Fit the vectoriser (and LSA) on every live section and save it."""
+        chunk_ids = [cid for cid, _ in index.live_chunks()]
+        row_of = {cid: row for row, cid in enumerate(chunk_ids)}
+        cells: Dict[Tuple[int, int], float] = {}
+        for f, weight in FIELD_WEIGHTS.items():
+            for term, plist in index.postings[f].items():
+                col = _feature(term, self.n_features)
+                for cid, positions in plist.items():
+                    row = row_of.get(cid)
+                    if row is not None:
+                        key = (row, col)
+                        cells[key] = cells.get(key, 0.0) + weight * len(positions)
+        n = len(chunk_ids)
+        rows = np.fromiter((k[0] for k in cells), dtype=np.int64, count=len(cells))
+        cols = np.fromiter((k[1] for k in cells), dtype=np.int64, count=len(cells))
+        tf = np.fromiter(cells.values(), dtype=np.float32, count=len(cells))
+        df = np.bincount(cols, minlength=self.n_features).astype(np.float32)
+        self.idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+        vals = (1.0 + np.log(tf)) * self.idf[cols] if len(tf) else tf
+        norms = np.sqrt(np.bincount(rows, weights=vals * vals, minlength=n)).astype(np.float32)
+        norms[norms == 0] = 1.0
+        vals = (vals / norms[rows]).astype(np.float32)
+
+        if self.lsa_dims and n:
+            self.projection = randomized_svd(rows, cols, vals, (n, self.n_features), self.lsa_dims)
+            vectors = _normalize_rows(_spmm(rows, cols, vals, self.projection, n))
+        else:
+            self.projection = None
+            vectors = np.zeros((n, self.n_features), dtype=np.float32)
+            vectors[rows, cols] = vals
+        self.chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        self.signatures = np.asarray(
+            [self._signature(index, cid) for cid in chunk_ids], dtype=np.float64
+        ).reshape(-1, SIGNATURE_FIELDS)
+        self.analyzer = index.pipeline.signature()
+        self.ann = IVFIndex.train(self.chunk_ids, vectors) if n and n >= self.ann_min_rows else None
+        if self.quantize == "int8":
+            self.vectors, self.scales = quantize_int8(vectors)
+        else:
+            self.vectors, self.scales = vectors, None
+        self._row_of = row_of
+        self._masked = set()
+        self._extra = {}
+        self._extra_sig = {}
+        self.save()
+        self.load(self.analyzer)  # reopen the vectors memory-mapped
+
+    def save(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "vectors": self.vectors,
+            "idf": self.idf,
+            "chunk_ids": self.chunk_ids,
+            "signatures": self.signatures,
+        }
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        if self.projection is not None:
+            arrays["projection"] = self.projection
+        for name, array in arrays.items():
+            with replacing(self.directory / f"{name}.npy", ".tmp.npy") as tmp:
+                np.save(tmp, array)
+        if self.ann is not None:
+            self.ann.save(self.directory)
+        meta = {
+            "version": SEMANTIC_FORMAT_VERSION,
+            "analyzer": self.analyzer,
+            "n_features": self.n_features,
+            "lsa_dims": self.lsa_dims,
+            "quantize": self.quantize,
+            "ann": self.ann is not None,
+        }
+        with replacing(self.directory / "meta.json") as tmp:
+            tmp.write_text(json.dumps(meta, separators=(",", ":")), encoding="utf-8")
+
+    def load(self, analyzer: str) -> bool:
+        """Open a saved model; False if missing or built with another configuration."""
+        try:
+            meta = json.loads((self.directory / "meta.json").read_text(encoding="utf-8"))
+            if (
+                meta.get("version") != SEMANTIC_FORMAT_VERSION
+                or meta.get("analyzer") != analyzer
+                or meta.get("n_features") != self.n_features
+                or meta.get("lsa_dims") != self.lsa_dims
+                or meta.get("quantize") != self.quantize
+            ):
+                return False
+            self.vectors = np.load(self.directory / "vectors.npy", mmap_mode="r")
+            self.idf = np.load(self.directory / "idf.npy")
+            self.chunk_ids = np.load(self.directory / "chunk_ids.npy")
+            self.signatures = np.load(self.directory / "signatures.npy", mmap_mode="r")
+            if self.signatures.shape != (len(self.chunk_ids), SIGNATURE_FIELDS):
+                raise ValueError("signature table does not match the rows")
+            self.scales = np.load(self.directory / "scales.npy") if self.quantize == "int8" else None
+            self.projection = np.load(self.directory / "projection.npy") if self.lsa_dims else None
+            self.ann = IVFIndex.load(self.directory) if meta.get("ann") else None
+            if meta.get("ann") and self.ann is None:
+                raise ValueError("missing IVF index")
+        except (OSError, ValueError):
+            self.vectors = None
+            return False
+        self.analyzer = analyzer
+        self._row_of = {int(cid): row for row, cid in enumerate(self.chunk_ids)}
+        self._masked = set()
+        self._extra = {}
+        self._extra_sig = {}
+        return True
+
+    def sync(self, index: "VaultIndex") -> None:
+        """Bring the vectors in line with the chunk table (fold-in, mask or refit)."""
+        analyzer = index.pipeline.signature()
+        if self.vectors is None and not self.load(analyzer):
+            self.fit(index)
+            return
+        if self.analyzer != analyzer:
+            self.fit(index)
+            return
+        live = set()
+        for cid, _ in index.live_chunks():
+            live.add(cid)
+            sig = self._signature(index, cid)
+            row = self._row_of.get(cid)
+            if row is not None and row not in self._masked and self.signatures[row].tolist() == sig:
+                continue
+            if row is not None:
+                self._masked.add(row)
+            if self._extra_sig.get(cid) != sig:
+                vec = self._extra[cid] = self._embed_counts(self._chunk_counts(index, cid))
+                self._extra_sig[cid] = sig
+                if self.ann is not None:
+                    if vec is None:
+                        self.ann.remove(cid)
+                    else:
+                        self.ann.add(cid, vec)
+        for cid, row in self._row_of.items():
+            if cid not in live and row not in self._masked:
+                self._masked.add(row)
+                if self.ann is not None:
+                    self.ann.remove(cid)
+        for cid in [c for c in self._extra if c not in live]:
+            del self._extra[cid]
+            del self._extra_sig[cid]
+            if self.ann is not None:
+                self.ann.remove(cid)
+        if len(self._masked) + len(self._extra) > REFIT_FRACTION * max(self.rows, 1):
+            self.fit(index)
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+    def _row_scores(self, rows, qv):
+        block = np.asarray(self.vectors[rows], dtype=np.float32) @ qv
+        if self.scales is not None:
+            block *= self.scales[rows]
+        return block
+
+    def score(
+        self,
+        terms: Iterable[str],
+        candidates: Optional[Set[int]] = None,
+        top_k: int = 100,
+    ) -> Dict[int, float]:
+        """chunk_id -> cosine similarity for the ``top_k`` most similar sections."""
+        qv = self.query_vector(terms)
+        if qv is None or self.vectors is None:
+            return {}
+        if candidates is None and self.ann is not None:
+            return {cid: sim for cid, sim in self.ann.search(qv, top_k) if sim >= MIN_SIMILARITY}
+        if candidates is not None:
+            rows = np.asarray(sorted(self._row_of[c] for c in candidates if c in self._row_of), dtype=np.int64)
+            sims = self._row_scores(rows, qv) if len(rows) else np.zeros(0, dtype=np.float32)
+        else:
+            rows = np.arange(self.rows, dtype=np.int64)
+            sims = np.empty(self.rows, dtype=np.float32)
+            for start in range(0, self.rows, SCORE_BLOCK):
+                sims[start:start + SCORE_BLOCK] = self._row_scores(rows[start:start + SCORE_BLOCK], qv)
+        if self._masked and len(rows):
+            sims[np.isin(rows, np.fromiter(self._masked, dtype=np.int64))] = -1.0
+        scores: Dict[int, float] = {}
+        if len(sims):
+            k = min(top_k, len(sims))
+            best = np.argpartition(-sims, k - 1)[:k]
+            for i in best:
+                if sims[i] >= MIN_SIMILARITY:
+                    scores[int(self.chunk_ids[rows[i]])] = float(sims[i])
+        for cid, vec in self._extra.items():
+            if vec is None or (candidates is not None and cid not in candidates):
+                continue
+            sim = float(vec @ qv)
+            if sim >= MIN_SIMILARITY:
+                scores[cid] = sim
+        if len(scores) > top_k:
+            scores = dict(sorted(scores.items(), key=lambda kv: -kv[1])[:top_k])
+        return scores
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "rows": self.rows,
+            "dims": self.dims,
+            "quantize": self.quantize,
+            "folded_in": len(self._extra),
+            "masked": len(self._masked),
+            "ann": {"vectors": len(self.ann), "lists": self.ann.nlist} if self.ann is not None else None,
+        }
+
+
+def reciprocal_rank_fusion(rankings: List[Dict[int, float]], k: int = 60) -> Dict[int, float]:
+    """Fuse score maps by rank: sum of 1 / (k + rank)."""
+    fused: Dict[int, float] = {}
+    for scores in rankings:
+        ordered = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        for rank, (unit_id, _) in enumerate(ordered, start=1):
+            fused[unit_id] = fused.get(unit_id, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+__all__ = [
+    "SemanticIndex",
+    "quantize_int8",
+    "randomized_svd",
+    "reciprocal_rank_fusion",
+    "semantic_available",
+]
@@ -0,0 +1,426 @@
+"""Sharded search over several vaults (or directory subtrees).
+
+Responsibilities:
+- One VaultIndex per shard, shared through get_vault_index(), so every
+  shard keeps its own index file, watcher and lock.
+- Fan a query out to all shards on a thread pool and merge the top hits.
+
+Notes:
+- BM25 scores are only comparable when idf and average lengths are shared.
+  A query therefore runs in two phases: every shard reports its
+  CollectionStats for the query terms, the sums are sent back with the
+  search, and each shard scores against the global statistics.  Semantic
+  (cosine) scores are comparable as they are; link boosts are normalised
+  per shard to [1, 1 + LINK_BOOST].
+- Each shard has a deadline (``shard_timeout_ms``, measured from the start
+  of the query); the statistics phase may use STATS_SHARE of it, so a slow
+  shard cannot hold the others past that point.  A shard that misses it is reported in ``timed_out`` and
+  its hits are dropped; the task keeps running in the background (e.g. a
+  cold build) and the shard is skipped as ``busy`` until it finishes, so a
+  new or slow vault never holds up queries against the others.
+- ``deadline_ms`` caps the whole call (and the shard deadline).  Shards
+  stop ranking at (1 - DEADLINE_MARGIN) of it and return their best hits
+  so far; the results are then ``partial`` and ``coverage`` is the share
+  of notes (weighted by shard size) that was actually searched.
+- A single loaded shard is searched directly on the calling thread; one
+  that is still loading goes through the pool so the deadline holds.
+- With ``mmr_lambda`` (the default) every shard returns MMR_POOL times the
+  requested hits and the merged pool is diversified (see diversity.py), so
+  copies of a note in another vault are collapsed as well.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from .bm25 import CollectionStats
+from .cursors import ResultCursor
+from .diversity import MMR_LAMBDA, MMR_POOL, diversify
+from .index import (
+    MAX_SECTIONS_PER_NOTE,
+    HitStream,
+    SearchDeadline,
+    SearchHit,
+    VaultIndex,
+    get_vault_index,
+    peek_vault_index,
+)
+
+SHARD_TIMEOUT_MS = int(os.getenv("OBSIDIAN_SHARD_TIMEOUT_MS", "2000"))
+STATS_SHARE = 0.5  # fraction of the deadline the statistics phase may take
+DEADLINE_MARGIN = 0.1  # fraction of deadline_ms kept for merging and packing
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class VaultShard:
+    """One searchable vault or subtree.
+
+    Parameters:
+        name: Label reported on hits (``SearchHit.shard``).
+        docs_path: Vault root or sub-directory.
+        index_dir: Index directory (None = default_index_dir(docs_path)).
+    """
+
+    name: str
+    docs_path: str
+    index_dir: Optional[str] = None
+
+    def index(self) -> VaultIndex:
+        return get_vault_index(self.docs_path, self.index_dir)
+
+    def peek(self) -> Optional[VaultIndex]:
+        return peek_vault_index(self.docs_path, self.index_dir)
+
+
+def parse_vaults(spec: str) -> List[VaultShard]:
+    """Parse ``name=path`` entries separated by os.pathsep (like PATH).
+
+    A bare path is named after its directory.
+    """
+    shards = []
+    for entry in spec.split(os.pathsep):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, sep, path = entry.partition("=")
+        if not sep:
+            name, path = Path(entry).name or entry, entry
+        shards.append(VaultShard(name.strip(), os.path.expanduser(path.strip())))
+    return shards
+
+
+@dataclass
+class ShardedResults:
+    groups: List[List[SearchHit]] = field(default_factory=list)  # merged hits per query
+    searched: List[str] = field(default_factory=list)  # shards whose hits were merged
+    timed_out: List[str] = field(default_factory=list)  # missed the deadline
+    busy: List[str] = field(default_factory=list)  # still running an earlier (timed out) task
+    failed: Dict[str, str] = field(default_factory=dict)  # shard -> error
+    elapsed_ms: float = 0.0
+    partial: bool = False  # a deadline cut the search short
+    coverage: float = 1.0  # share of the vaults' notes that was searched
+    cursor: Optional[ResultCursor] = None  # set by stream()
+
+    @property
+    def hits(self) -> List[SearchHit]:
+        """Hits of the first (for search(): the only) query."""
+        return self.groups[0] if self.groups else []
+
+
+def merge_ranked(
+    results: Iterable[List[SearchHit]], max_results: int, mmr_lambda: Optional[float] = None
+) -> List[SearchHit]:
+    """Best ``max_results`` primary hits across lists, then their link expansions.
+
+    Ties are broken by shard name and chunk id so merging is deterministic.
+    With ``mmr_lambda`` the primary hits are picked by diversify() instead.
+    """
+    lists = list(results)
+    primary = sorted(
+        (hit for hits in lists for hit in hits if hit.via is None),
+        key=lambda hit: (-hit.score, hit.shard or "", hit.chunk_id),
+    )
+    if mmr_lambda is None:
+        primary = primary[:max(max_results, 0)]
+    else:
+        primary, _ = diversify(primary, max_results, mmr_lambda)
+    kept = {(hit.shard, hit.path) for hit in primary}
+    expanded = sorted(
+        (hit for hits in lists for hit in hits if hit.via is not None and (hit.shard, hit.via) in kept),
+        key=lambda hit: (-hit.score, hit.shard or "", hit.chunk_id),
+    )
+    return primary + expanded
+
+
+class ShardedSearch:
+    """Concurrent search over several VaultShards with comparable scores.
+
+    Parameters:
+        shards: The vaults to search (names must be unique).
+        shard_timeout_ms: Per-shard deadline of one query.
+        max_workers: Thread-pool size (default: two per shard).
+    """
+
+    def __init__(
+        self,
+        shards: Sequence[VaultShard],
+        shard_timeout_ms: int = SHARD_TIMEOUT_MS,
+        max_workers: Optional[int] = None,
+    ) -> None:
+        names = [shard.name for shard in shards]
+        if len(set(names)) != len(names):
+            raise ValueError(f"duplicate shard names: {names}")
+        self.shards = list(shards)
+        self.shard_timeout_ms = shard_timeout_ms
+        self.max_workers = max_workers or 2 * max(len(self.shards), 1)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_vaults(
+        cls,
+        docs_path: str,
+        index_dir: Optional[str] = None,
+        vaults: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ) -> "ShardedSearch":
+        """Shards from ``vaults`` (name -> path), else $OBSIDIAN_VAULTS, else ``docs_path`` alone.
+
+        With several shards ``index_dir`` is used as a parent directory
+        (one sub-directory per shard name).
+        """
+        if vaults:
+            shards = [VaultShard(name, path) for name, path in vaults.items()]
+        else:
+            shards = parse_vaults(os.getenv("OBSIDIAN_VAULTS", "")) or [
+                VaultShard(Path(docs_path).name or "vault", docs_path)
+            ]
+        if index_dir:
+            if len(shards) == 1:
+                shards = [VaultShard(shards[0].name, shards[0].docs_path, index_dir)]
+            else:
+                shards = [VaultShard(s.name, s.docs_path, str(Path(index_dir) / s.name)) for s in shards]
+        return cls(shards, **kwargs)
+
+    @property
+    def note_count(self) -> int:
+        """Notes in the shards loaded so far."""
+        return sum(index.note_count for index in self.indexes() if index is not None)
+
+    def indexes(self) -> List[Optional[VaultIndex]]:
+        """Registered index of every shard (None until first use; never warms)."""
+        return [shard.peek() for shard in self.shards]
+
+    def search(
+        self,
+        query: str,
+        max_results: int = 5,
+        per_note: int = MAX_SECTIONS_PER_NOTE,
+        expand_links: bool = False,
+        mode: str = "lexical",
+        deadline_ms: Optional[float] = None,
+        mmr_lambda: Optional[float] = MMR_LAMBDA,
+        summaries: bool = False,
+    ) -> ShardedResults:
+        """Search every existing shard; see the module docstring for deadlines and scoring."""
+        return self.search_many(
+            [query], max_results, per_note, expand_links, mode, deadline_ms, mmr_lambda, summaries
+        )
+
+    def search_many(
+        self,
+        queries: Sequence[str],
+        max_results: int = 5,
+        per_note: int = MAX_SECTIONS_PER_NOTE,
+        expand_links: bool = False,
+        mode: str = "lexical",
+        deadline_ms: Optional[float] = None,
+        mmr_lambda: Optional[float] = MMR_LAMBDA,
+        summaries: bool = False,
+    ) -> ShardedResults:
+        """Several queries in one fan-out (one task per shard and phase).
+
+        Each shard runs VaultIndex.search_many(); ``groups`` holds the merged
+        hits of every query, in order.  The deadline covers the whole batch.
+        ``mmr_lambda`` = None disables diversification; ``summaries``
+        returns stored summaries instead of passages.
+        """
+        pool = max_results * MMR_POOL if mmr_lambda is not None else max_results
+
+        def run(index: VaultIndex, stats: Optional[CollectionStats], deadline: SearchDeadline):
+            return index.search_many(queries, pool, per_note, expand_links, mode, stats, deadline, summaries)
+
+        results, per_shard = self._run(queries, run, deadline_ms)
+        for shard, groups in per_shard:
+            for hits in groups:
+                self._label(hits, shard)
+        results.groups = [
+            merge_ranked([groups[i] for _, groups in per_shard], max_results, mmr_lambda)
+            for i in range(len(queries))
+        ]
+        return results
+
+    def stream(
+        self,
+        query: str,
+        per_note: int = MAX_SECTIONS_PER_NOTE,
+        mode: str = "lexical",
+        deadline_ms: Optional[float] = None,
+        summaries: bool = False,
+    ) -> ShardedResults:
+        """Rank ``query`` on every shard without cutting passages yet.
+
+        ``cursor`` of the result yields the merged hits page by page (see
+        cursors.ResultCursor); ``groups`` stays empty.
+        """
+
+        def run(index: VaultIndex, stats: Optional[CollectionStats], deadline: SearchDeadline) -> HitStream:
+            return index.stream(query, per_note, mode, stats, deadline, summaries)
+
+        results, per_shard = self._run([query], run, deadline_ms)
+        for shard, stream in per_shard:
+            stream.shard = shard.name
+        results.cursor = ResultCursor(
+            [stream for _, stream in per_shard], query, results.partial, results.coverage
+        )
+        return results
+
+    def _run(
+        self,
+        queries: Sequence[str],
+        run: Callable[[VaultIndex, Optional[CollectionStats], SearchDeadline], T],
+        deadline_ms: Optional[float],
+    ) -> Tuple[ShardedResults, List[Tuple[VaultShard, T]]]:
+        """Call ``run`` on every existing shard (directly or fanned out); per-shard results in shard order."""
+        started = time.perf_counter()
+        results = ShardedResults(groups=[[] for _ in queries])
+        shards = []
+        for shard in self.shards:
+            if Path(shard.docs_path).is_dir():
+                shards.append(shard)
+            else:
+                results.failed[shard.name] = f"vault not found: {shard.docs_path}"
+        deadlines: Dict[str, SearchDeadline] = {}
+        per_shard: List[Tuple[VaultShard, T]] = []
+        if len(shards) == 1 and (not deadline_ms or self._loaded(shards[0])):
+            shard = shards[0]
+            deadline = deadlines[shard.name] = SearchDeadline.after(
+                deadline_ms * (1 - DEADLINE_MARGIN) if deadline_ms else None
+            )
+            per_shard.append((shard, run(shard.index(), None, deadline)))
+            results.searched.append(shard.name)
+        elif shards:
+            per_shard = self._fan_out(shards, queries, run, started, deadline_ms, deadlines, results)
+        self._account(shards, deadlines, results)
+        results.elapsed_ms = (time.perf_counter() - started) * 1000
+        return results, per_shard
+
+    def _fan_out(
+        self,
+        shards: List[VaultShard],
+        queries: Sequence[str],
+        run: Callable[[VaultIndex, Optional[CollectionStats], SearchDeadline], T],
+        started: float,
+        deadline_ms: Optional[float],
+        deadlines: Dict[str, SearchDeadline],
+        results: ShardedResults,
+    ) -> List[Tuple[VaultShard, T]]:
+        budget = self.shard_timeout_ms / 1000
+        if deadline_ms:
+            budget = min(budget, deadline_ms / 1000)
+        stats: Optional[CollectionStats] = None
+        ready = shards
+        if len(shards) > 1:
+            # phase 1: collection statistics of the query terms
+            futures = self._submit(shards, results, lambda shard: shard.index().collection_stats(*queries))
+            ready = self._collect(futures, started + budget * STATS_SHARE, results)
+            stats = CollectionStats()
+            for shard in ready:
+                stats = stats.merge(futures[shard.name].result())
+        # phase 2: search with the global statistics
+        for shard in ready:
+            deadlines[shard.name] = SearchDeadline(started + budget * (1 - DEADLINE_MARGIN))
+        futures = self._submit(ready, results, lambda shard: run(shard.index(), stats, deadlines[shard.name]))
+        per_shard = []
+        for shard in self._collect(futures, started + budget, results):
+            per_shard.append((shard, futures[shard.name].result()))
+            results.searched.append(shard.name)
+        return per_shard
+
+    @staticmethod
+    def _loaded(shard: VaultShard) -> bool:
+        index = shard.peek()
+        return index is not None and index.ready
+
+    @staticmethod
+    def _account(shards: List[VaultShard], deadlines: Dict[str, SearchDeadline], results: ShardedResults) -> None:
+        """Set ``partial`` and the note-weighted ``coverage`` of the searched shards."""
+        searched = set(results.searched)
+        weights: Dict[str, Optional[int]] = {}
+        for shard in shards:
+            index = shard.peek()
+            if index is None:
+                weights[shard.name] = None
+            else:  # a shard still building knows its size from the file scan
+                weights[shard.name] = index.note_count if index.ready else (index.progress.total or None)
+        known = [w for w in weights.values() if w is not None]
+        fallback = sum(known) / len(known) if known else 1.0
+        total = covered = 0.0
+        for shard in shards:
+            weight = weights[shard.name]
+            weight = fallback if weight is None else weight
+            total += weight
+            if shard.name in searched:
+                covered += weight * deadlines[shard.name].coverage
+        results.coverage = covered / total if total else (1.0 if not shards else 0.0)
+        results.partial = len(searched) < len(shards) or any(
+            deadlines[name].partial for name in searched
+        )
+
+    def _submit(self, shards: List[VaultShard], results: ShardedResults, task) -> Dict[str, Future]:
+        futures: Dict[str, Future] = {}
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="vault-shard")
+            for shard in shards:
+                pending = self._pending.get(shard.name)
+                if pending is not None and not pending.done():
+                    results.busy.append(shard.name)
+                    continue
+                futures[shard.name] = self._pending[shard.name] = self._pool.submit(task, shard)
+        return futures
+
+    def _collect(self, futures: Dict[str, Future], deadline: float, results: ShardedResults) -> List[VaultShard]:
+        """Wait until ``deadline``; return the shards that finished without error."""
+        if futures:
+            wait(list(futures.values()), timeout=max(deadline - time.perf_counter(), 0))
+        finished = []
+        for shard in self.shards:
+            future = futures.get(shard.name)
+            if future is None:
+                continue
+            if not future.done():
+                results.timed_out.append(shard.name)
+            elif future.exception() is not None:
+                results.failed[shard.name] = str(future.exception())
+            else:
+                finished.append(shard)
+        return finished
+
+    @staticmethod
+    def _label(hits: List[SearchHit], shard: VaultShard) -> List[SearchHit]:
+        for hit in hits:
+            hit.shard = shard.name
+        return hits
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            shard.name: {"docs_path": shard.docs_path, "index": index.stats() if index else None}
+            for shard, index in zip(self.shards, self.indexes())
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+
+__all__ = [
+    "SHARD_TIMEOUT_MS",
+    "STATS_SHARE",
+    "DEADLINE_MARGIN",
+    "ShardedResults",
+    "ShardedSearch",
+    "VaultShard",
+    "merge_ranked",
+    "parse_vaults",
+]
@@ -0,0 +1,252 @@
+"""Index snapshots: every artefact of an index directory in one verified file.
+
+A fresh server or container would otherwise build the index (and the
+router vocabulary) from scratch.  A snapshot is a tar archive (gzipped
+when the name ends in ``.gz`` / ``.tgz``) of:
+
+    manifest.json      snapshot format, INDEX_FORMAT_VERSION, analyzer
+                       signature, source vault, creation time, the note
+                       manifest (path -> [mtime, size]) and the size and
+                       SHA-256 of every artefact below
+    vault_index.bin    the index file (see segment.py)
+    semantic/...       section vectors, when built (see semantic.py)
+    router_vocab.json  SmartRouter keyword vocabulary, when persisted
+
+export_snapshot() saves pending changes and archives the index directory
+under the index lock.  import_snapshot() checks the manifest first
+(format, index version, analyzer) and every checksum while extracting
+into a staging directory, so a bad file never replaces a working index.
+It then rebases the index file onto the local vault path and clears the
+stored inodes (they belong to the exporting file system) before swapping
+the artefacts in.  The next warm() maps the index and refresh() re-reads
+only notes whose mtime or size differ from the manifest.
+
+Command line::
+
+    python -m obsidian_assistant.vault_search.snapshot export <vault> <file> [index_dir]
+    python -m obsidian_assistant.vault_search.snapshot import <file> <vault> [index_dir]
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+from .index import INDEX_FILENAME, INDEX_FORMAT_VERSION, VaultIndex, default_index_dir, peek_vault_index
+from .segment import SegmentError, open_segment, replacing, write_segment
+from .semantic import SEMANTIC_DIRNAME
+from .tokenizer import TextPipeline
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snapshot.tar"
+MANIFEST_NAME = "manifest.json"
+ROUTER_VOCAB_FILENAME = "router_vocab.json"
+_COPY_CHUNK = 1 << 20
+
+PathLike = Union[str, Path]
+
+
+class SnapshotError(ValueError):
+    """The snapshot is unreadable, corrupt or does not fit this index configuration."""
+
+
+def _artefacts(index_dir: Path) -> Iterator[Tuple[str, Path]]:
+    """(archive name, path) of the index artefacts, temporary files excluded."""
+    for name in (INDEX_FILENAME, ROUTER_VOCAB_FILENAME):
+        if (index_dir / name).is_file():
+            yield name, index_dir / name
+    semantic = index_dir / SEMANTIC_DIRNAME
+    if semantic.is_dir():
+        for path in sorted(semantic.rglob("*")):
+            if path.is_file() and ".tmp" not in path.name:
+                yield path.relative_to(index_dir).as_posix(), path
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(_COPY_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_snapshot(index: VaultIndex, dest: PathLike) -> Dict[str, object]:
+    """Write a snapshot of ``index`` (warmed) to ``dest``; return its manifest."""
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    mode = "w:gz" if dest.name.endswith((".gz", ".tgz")) else "w"
+    with index.lock:
+        if index.dirty or not index.index_file.exists():
+            index.save()
+        artefacts = list(_artefacts(index.index_dir))
+        manifest = {
+            "format": SNAPSHOT_FORMAT_VERSION,
+            "index_version": INDEX_FORMAT_VERSION,
+            "analyzer": index.pipeline.signature(),
+            "docs_path": str(index.docs_path.resolve()),
+            "created_at": time.time(),
+            "built_at": index.built_at,
+            "notes": {note.path: [note.mtime, note.size] for _, note in index.live_notes()},
+            "files": {name: {"size": path.stat().st_size, "sha256": _sha256(path)} for name, path in artefacts},
+        }
+        blob = json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        with replacing(dest) as tmp, tarfile.open(tmp, mode) as tar:
+            info = tarfile.TarInfo(MANIFEST_NAME)
+            info.size, info.mtime = len(blob), int(manifest["created_at"])
+            tar.addfile(info, io.BytesIO(blob))
+            for name, path in artefacts:
+                tar.add(str(path), arcname=name, recursive=False)
+    return manifest
+
+
+def read_manifest(src: PathLike) -> Dict[str, object]:
+    """The manifest of a snapshot (nothing is extracted or verified)."""
+    try:
+        with tarfile.open(src, "r:*") as tar:
+            return _manifest(tar)
+    except (OSError, tarfile.TarError) as e:
+        raise SnapshotError(f"unreadable snapshot: {e}") from e
+
+
+def _manifest(tar: tarfile.TarFile) -> Dict[str, object]:
+    member = tar.next()
+    if member is None or member.name != MANIFEST_NAME or not member.isfile():
+        raise SnapshotError("snapshot does not start with a manifest")
+    try:
+        manifest = json.loads(tar.extractfile(member).read().decode("utf-8"))
+    except (ValueError, AttributeError) as e:
+        raise SnapshotError(f"invalid manifest: {e}") from e
+    if not isinstance(manifest, dict) or manifest.get("format") != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError("unsupported snapshot format")
+    return manifest
+
+
+def import_snapshot(
+    src: PathLike,
+    docs_path: PathLike,
+    index_dir: Optional[PathLike] = None,
+    pipeline: Optional[TextPipeline] = None,
+) -> Dict[str, object]:
+    """Verify ``src`` and install it as the index of ``docs_path``; return its manifest.
+
+    Call it before the index is opened (a registered, warmed index would
+    keep serving the old file).  Raises SnapshotError without touching the
+    index directory when the snapshot is corrupt or was built with another
+    index format or analyzer.
+    """
+    docs_path = str(docs_path)
+    opened = peek_vault_index(docs_path, str(index_dir) if index_dir else None)
+    if opened is not None and opened.ready:
+        raise SnapshotError("the index of this vault is already open")
+    target = Path(index_dir) if index_dir else default_index_dir(docs_path)
+    analyzer = (pipeline or TextPipeline.from_env()).signature()
+    staging = target.with_name(target.name + ".import")
+    shutil.rmtree(staging, ignore_errors=True)
+    try:
+        try:
+            with tarfile.open(src, "r:*") as tar:
+                manifest = _manifest(tar)
+                if manifest.get("index_version") != INDEX_FORMAT_VERSION:
+                    raise SnapshotError("snapshot was written by another index format version")
+                if manifest.get("analyzer") != analyzer:
+                    raise SnapshotError("snapshot was built with another text analyzer")
+                _extract(tar, manifest.get("files") or {}, staging)
+        except (OSError, tarfile.TarError) as e:
+            raise SnapshotError(f"unreadable snapshot: {e}") from e
+        _rebase(staging / INDEX_FILENAME, docs_path)
+        _install(staging, target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return manifest
+
+
+def _allowed(name: str) -> bool:
+    """Archive names an index directory can hold (never outside it)."""
+    parts = name.split("/")
+    if name in (INDEX_FILENAME, ROUTER_VOCAB_FILENAME):
+        return True
+    return len(parts) > 1 and parts[0] == SEMANTIC_DIRNAME and all(p not in ("", ".", "..") for p in parts)
+
+
+def _extract(tar: tarfile.TarFile, files: Dict[str, Dict[str, object]], staging: Path) -> None:
+    """Extract the listed artefacts into ``staging``, verifying size and checksum."""
+    if INDEX_FILENAME not in files:
+        raise SnapshotError("snapshot holds no index file")
+    found = set()
+    for member in tar:
+        if member.offset == 0:
+            continue  # the manifest, read by _manifest()
+        expected = files.get(member.name)
+        if expected is None or not _allowed(member.name) or not member.isfile() or member.name in found:
+            raise SnapshotError(f"unexpected snapshot member: {member.name}")
+        path = staging / member.name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        with tar.extractfile(member) as fsrc, path.open("wb") as fdst:
+            for block in iter(lambda: fsrc.read(_COPY_CHUNK), b""):
+                digest.update(block)
+                size += len(block)
+                fdst.write(block)
+        if size != expected.get("size") or digest.hexdigest() != expected.get("sha256"):
+            raise SnapshotError(f"checksum mismatch: {member.name}")
+        found.add(member.name)
+    missing = set(files) - found
+    if missing:
+        raise SnapshotError(f"snapshot is missing {sorted(missing)}")
+
+
+def _rebase(path: Path, docs_path: str) -> None:
+    """Point the index file at the local vault and forget the exporting file system's inodes."""
+    try:
+        reader, postings, chunk_terms = open_segment(path)
+        meta = dict(reader.meta)
+        notes = [replace(note, inode=0) if note is not None else None for note in reader.notes()]
+        chunks = reader.chunks()
+    except (OSError, SegmentError, KeyError, TypeError) as e:
+        raise SnapshotError(f"invalid index file in snapshot: {e}") from e
+    meta["docs_path"] = str(Path(docs_path).resolve())
+    with replacing(path) as tmp:
+        write_segment(tmp, meta, notes, chunks, chunk_terms, postings)
+
+
+def _install(staging: Path, target: Path) -> None:
+    target.mkdir(parents=True, exist_ok=True)
+    shutil.rmtree(target / SEMANTIC_DIRNAME, ignore_errors=True)  # vectors of the replaced index
+    for path in sorted(p for p in staging.rglob("*") if p.is_file()):
+        dest = target / path.relative_to(staging)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, dest)
+
+
+__all__ = [
+    "ROUTER_VOCAB_FILENAME",
+    "SNAPSHOT_FORMAT_VERSION",
+    "SNAPSHOT_SUFFIX",
+    "SnapshotError",
+    "export_snapshot",
+    "import_snapshot",
+    "read_manifest",
+]
+
+
+if __name__ == "__main__":
+    import sys
+
+    command, *args = sys.argv[1:] or ["help"]
+    if command == "export" and len(args) in (2, 3):
+        vault_index = VaultIndex.open(args[0], args[2] if len(args) == 3 else None)
+        result = export_snapshot(vault_index, args[1])
+    elif command == "import" and len(args) in (2, 3):
+        result = import_snapshot(args[0], args[1], args[2] if len(args) == 3 else None)
+    else:
+        sys.exit(__doc__.split("Command line::", 1)[1])
+    result.pop("notes", None)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
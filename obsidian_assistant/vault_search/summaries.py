@@ -0,0 +1,152 @@
+"""Extractive note and section summaries, computed at index time.
+
+Every section keeps its SECTION_SENTENCES most central sentences and every
+note the NOTE_SENTENCES most central ones across its sections (both in
+document order and capped in characters).  The search tool can then
+return what a note is about (``summaries=True``) without reading it.
+
+Scoring is TF-ISF centroid scoring over the note's own sentences, each
+sentence counting as a document:
+
+    weight(t) = tf(t in note) * log(1 + sentences / sentences containing t)
+    score(s)  = sum of weight(t) over the distinct terms of s / sqrt(their count)
+
+and the first sentence of a section gets LEAD_BONUS.  It only needs the
+tokens already produced for indexing and no vault-wide statistics, so the
+parallel builder can summarise each note independently.
+
+Headings, code blocks, tables and sentences with fewer than
+MIN_SENTENCE_TERMS terms are never picked; Markdown markup (links, emphasis,
+list markers) is stripped from the picked sentences.
+"""
+from __future__ import annotations
+
+import math
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import List, Sequence, Tuple
+
+from .tokenizer import Token
+
+SECTION_SENTENCES = 2
+NOTE_SENTENCES = 3
+SECTION_SUMMARY_CHARS = 240
+NOTE_SUMMARY_CHARS = 360
+MIN_SENTENCE_TERMS = 3
+LEAD_BONUS = 1.2
+
+# sentence ends: Latin punctuation before whitespace, CJK punctuation, line breaks
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s)|[。！？；]|\n")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_SKIP_LINE_RE = re.compile(r"^\s*(#{1,6}\s|\||<!--|\^[A-Za-z0-9-]+\s*$)")
+_WIKILINK_RE = re.compile(r"!?\[\[([^\]|#]*)(?:#[^\]|]*)?(?:\|([^\]]*))?\]\]")
+_MDLINK_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_MARKUP_RE = re.compile(r"(\*\*|__|==|~~|`|(?<!\w)[*_](?=\S)|(?<=\S)[*_](?!\w))")
+_PREFIX_RE = re.compile(r"^\s*(?:>\s*)*(?:[-*+]\s+(?:\[.\]\s+)?|\d+[.)]\s+)?")
+_BLOCK_ID_RE = re.compile(r"\s\^[A-Za-z0-9-]+\s*$")
+_SPACE_RE = re.compile(r"\s+")
+
+Sentence = Tuple[int, int, int, List[str]]  # (section index, start, end, terms)
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """(start, end) of the candidate sentences of ``text`` (see module docstring)."""
+    spans: List[Tuple[int, int]] = []
+    fence = False
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        line_start = offset
+        offset += len(line)
+        if _FENCE_RE.match(line):
+            fence = not fence
+            continue
+        if fence or _SKIP_LINE_RE.match(line):
+            continue
+        start = line_start
+        for m in _SENTENCE_END_RE.finditer(line):
+            end = line_start + m.end()
+            if text[start:end].strip():
+                spans.append((start, end))
+            start = end
+        if text[start:offset].strip():
+            spans.append((start, offset))
+    return spans
+
+
+def clean_sentence(text: str) -> str:
+    """Sentence text without Markdown markup, on one line."""
+    text = _WIKILINK_RE.sub(lambda m: m.group(2) or m.group(1), text)
+    text = _MDLINK_RE.sub(r"\1", text)
+    text = _BLOCK_ID_RE.sub("", _PREFIX_RE.sub("", text))
+    return _SPACE_RE.sub(" ", _MARKUP_RE.sub("", text)).strip()
+
+
+def _join(sentences: List[str], max_chars: int) -> str:
+    summary = ""
+    for sentence in sentences:
+        joined = f"{summary} {sentence}" if summary and sentence[:1].isascii() else summary + sentence
+        if len(joined) > max_chars:
+            if not summary:
+                summary = sentence[:max_chars - 1].rstrip() + "…"
+            break
+        summary = joined
+    return summary
+
+
+def summarize_note(sections: Sequence[Tuple[str, List[Token]]]) -> Tuple[List[str], str]:
+    """(summary of each section, note summary) for (section text, section tokens) pairs.
+
+    Token offsets are relative to the section text, as produced by
+    TextPipeline.tokens(); sections without a usable sentence get "".
+    """
+    sentences: List[Sentence] = []
+    for index, (text, tokens) in enumerate(sections):
+        starts = [token.start for token in tokens]
+        for start, end in split_sentences(text):
+            terms = [token.term for token in tokens[bisect_left(starts, start):bisect_left(starts, end)]]
+            if len(terms) >= MIN_SENTENCE_TERMS:
+                sentences.append((index, start, end, terms))
+    if not sentences:
+        return [""] * len(sections), ""
+    tf: Counter = Counter()
+    sf: Counter = Counter()
+    for _, _, _, terms in sentences:
+        tf.update(terms)
+        sf.update(set(terms))
+    n = len(sentences)
+    weight = {term: count * math.log(1 + n / sf[term]) for term, count in tf.items()}
+    scored = []
+    lead = set()
+    for position, (index, start, end, terms) in enumerate(sentences):
+        distinct = set(terms)
+        score = sum(weight[t] for t in distinct) / math.sqrt(len(distinct))
+        if index not in lead:
+            lead.add(index)
+            score *= LEAD_BONUS
+        scored.append((score, position))
+
+    def pick(positions: List[int], count: int, max_chars: int) -> str:
+        best = sorted(positions, key=lambda p: -scored[p][0])[:count]
+        texts = []
+        for p in sorted(best):
+            index, start, end, _ = sentences[p]
+            text = clean_sentence(sections[index][0][start:end])
+            if text:
+                texts.append(text)
+        return _join(texts, max_chars)
+
+    by_section: List[List[int]] = [[] for _ in sections]
+    for position, (index, _, _, _) in enumerate(sentences):
+        by_section[index].append(position)
+    summaries = [pick(positions, SECTION_SENTENCES, SECTION_SUMMARY_CHARS) for positions in by_section]
+    return summaries, pick(list(range(n)), NOTE_SENTENCES, NOTE_SUMMARY_CHARS)
+
+
+__all__ = [
+    "NOTE_SENTENCES",
+    "SECTION_SENTENCES",
+    "clean_sentence",
+    "split_sentences",
+    "summarize_note",
+]
@@ -0,0 +1,197 @@
+"""Text analysis pipeline for vault search.
+
+Stages:
+1. Normalisation: NFKC (full-width -> half-width, compatibility forms) and
+   case folding.  Offsets into the original text are preserved so snippets
+   can be cut from the raw note.
+2. Segmentation: word runs (Latin, digits, ...) and CJK runs (Han, kana,
+   Hangul).  Every word and every CJK character occupies one position.
+3. Token emission:
+   - index mode: CJK unigrams *and* overlapping bigrams (bigram at the
+     position of its first character), words as-is;
+   - query mode: CJK bigrams only (a single-character run yields its
+     unigram), so "双向链接" becomes 双向/向链/链接 at consecutive positions
+     and matches inside longer sentences.
+4. Stopwords are dropped but still consume their position, so phrase
+   adjacency stays correct.
+
+The pipeline is deterministic for a given configuration; signature() lets
+the index detect a configuration change and rebuild.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import unicodedata
+from typing import FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+_CJK_RANGES = (
+    "\u3040-\u30ff"  # Hiragana / Katakana
+    "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"  # Han
+    "\uac00-\ud7af"  # Hangul syllables
+)
+_RUN_RE = re.compile(rf"(?:(?![{_CJK_RANGES}])\w)+|[{_CJK_RANGES}]+")
+_CJK_RE = re.compile(rf"[{_CJK_RANGES}]")
+
+PIPELINE_VERSION = 1
+
+DEFAULT_STOPWORDS: FrozenSet[str] = frozenset({
+    # Chinese function words (single characters, matched as unigrams)
+    "的", "了", "是", "在", "和", "有", "就", "不", "也", "都", "与", "及", "或",
+    "之", "而", "着", "吗", "呢", "吧", "啊",
+    # English
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "that", "the", "this", "to", "was", "with",
+})
+
+
+class Token(NamedTuple):
+    term: str
+    position: int
+    start: int  # offsets into the *original* text
+    end: int
+
+
+def is_cjk(term: str) -> bool:
+    """True for CJK n-grams (each character is one position)."""
+    return bool(_CJK_RE.match(term))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (the heuristic of token_counter.estimate_tokens)."""
+    cjk = len(_CJK_RE.findall(text))
+    words = sum(1 for w in text.split() if any(c.isalpha() for c in w))
+    return int(cjk * 1.8 + words * 1.3) or len(text) // 4
+
+
+def load_stopwords(path: str) -> FrozenSet[str]:
+    """Read one stopword per line (blank lines and '#' comments ignored)."""
+    words = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            word = line.strip()
+            if word and not word.startswith("#"):
+                words.add(unicodedata.normalize("NFKC", word).casefold())
+    return frozenset(words)
+
+
+class TextPipeline:
+    """NFKC + casefold + CJK n-gram tokenizer.
+
+    Parameters:
+        stopwords: Terms dropped from both documents and queries.
+        cjk_unigrams: Emit single CJK characters in index mode.
+        cjk_bigrams: Emit overlapping CJK bigrams.
+    """
+
+    def __init__(
+        self,
+        stopwords: Optional[Iterable[str]] = None,
+        cjk_unigrams: bool = True,
+        cjk_bigrams: bool = True,
+    ) -> None:
+        self.stopwords = frozenset(stopwords) if stopwords is not None else DEFAULT_STOPWORDS
+        self.cjk_unigrams = cjk_unigrams
+        self.cjk_bigrams = cjk_bigrams
+
+    @classmethod
+    def from_env(cls) -> "TextPipeline":
+        """Default pipeline; OBSIDIAN_STOPWORDS_FILE replaces the stopword list."""
+        path = os.getenv("OBSIDIAN_STOPWORDS_FILE")
+        return cls(stopwords=load_stopwords(path)) if path else cls()
+
+    def signature(self) -> str:
+        raw = f"{PIPELINE_VERSION}|{self.cjk_unigrams}|{self.cjk_bigrams}|" + "\x1f".join(sorted(self.stopwords))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    # ------------------------------------------------------------------
+    # Normalisation
+    # ------------------------------------------------------------------
+    @staticmethod
+    def normalize(text: str) -> Tuple[str, Optional[List[int]]]:
+        """Return (normalised text, origin map or None when offsets are unchanged)."""
+        if text.isascii():
+            return text.lower(), None
+        norm = unicodedata.normalize("NFKC", text).casefold()
+        if len(norm) == len(text):
+            return norm, None
+        # Length changed (ligatures, "ß" -> "ss", ...): normalise per character
+        # so every output character knows where it came from.
+        parts: List[str] = []
+        origin: List[int] = []
+        for i, ch in enumerate(text):
+            n = unicodedata.normalize("NFKC", ch).casefold()
+            parts.append(n)
+            origin.extend([i] * len(n))
+        origin.append(len(text))
+        return "".join(parts), origin
+
+    # ------------------------------------------------------------------
+    # Tokenisation
+    # ------------------------------------------------------------------
+    def tokens(self, text: str, query: bool = False) -> List[Token]:
+        """Tokens with positions and original-text offsets."""
+        norm, origin = self.normalize(text)
+        out: List[Token] = []
+        stop = self.stopwords
+        unigrams = self.cjk_unigrams
+        bigrams = self.cjk_bigrams
+        pos = 0
+        for m in _RUN_RE.finditer(norm):
+            run = m.group()
+            base = m.start()
+            if not _CJK_RE.match(run):
+                if run not in stop:
+                    out.append(_token(run, pos, base, m.end(), origin))
+                pos += 1
+                continue
+            n = len(run)
+            # query mode: bigrams carry the phrase, unigrams only for 1-char runs
+            emit_unigrams = (unigrams and not query) or n == 1 or not bigrams
+            for i in range(n):
+                ch = run[i]
+                if emit_unigrams and ch not in stop:
+                    out.append(_token(ch, pos + i, base + i, base + i + 1, origin))
+                if bigrams and i + 1 < n:
+                    out.append(_token(run[i:i + 2], pos + i, base + i, base + i + 2, origin))
+            pos += n
+        return out
+
+    def positioned(self, text: str) -> List[Tuple[str, int]]:
+        """(term, position) pairs in index mode (what the postings store)."""
+        return [(t.term, t.position) for t in self.tokens(text)]
+
+    def terms(self, text: str, query: bool = False) -> List[str]:
+        return [t.term for t in self.tokens(text, query=query)]
+
+
+def _token(term: str, position: int, start: int, end: int, origin: Optional[List[int]]) -> Token:
+    if origin is not None:
+        start, end = origin[start], origin[end - 1] + 1
+    return Token(term, position, start, end)
+
+
+_DEFAULT_PIPELINE = TextPipeline()
+
+
+def tokenize_with_offsets(text: str) -> List[Tuple[str, int, int]]:
+    """(term, start, end) triples from the default pipeline (index mode)."""
+    return [(t.term, t.start, t.end) for t in _DEFAULT_PIPELINE.tokens(text)]
+
+
+def tokenize(text: str) -> List[str]:
+    """Terms from the default pipeline (index mode)."""
+    return _DEFAULT_PIPELINE.terms(text)
+
+
+__all__ = [
+    "DEFAULT_STOPWORDS",
+    "TextPipeline",
+    "Token",
+    "estimate_tokens",
+    "is_cjk",
+    "load_stopwords",
+    "tokenize",
+    "tokenize_with_offsets",
+]
@@ -0,0 +1,218 @@
+"""Trigram index over the term dictionary: substring, regex and fuzzy lookups.
+
+The postings only answer whole-term lookups.  TermTrigrams maps every
+padded trigram (``"\\x02\\x02s"``, ``"\\x02sy"``, ``"syn"``, ...) to the
+terms that contain it, so that:
+
+- a substring (``plug`` inside ``plugins``) resolves to the terms that
+  contain it, and their postings give the candidate notes;
+- a regex is reduced to the literal runs it requires (required_literals).
+  Each run is split like the tokenizer splits text: word pieces inside the
+  run must be whole terms, pieces at its edges must be substrings of a
+  term, and CJK pieces must contain their bigrams.  The intersection of
+  those notes is the candidate set.  Only candidates are read and matched
+  against the regex (VaultIndex does the verification);
+- a misspelt term finds its neighbours within ``k`` edits.  By the q-gram
+  lemma they share at least ``len + 2 - 4k`` padded trigrams with it (one
+  edit or transposition touches at most 4).  Only those are compared with
+  edit_distance().
+
+Indexing terms instead of note text keeps the structure at a few bytes per
+distinct term (one ``array("i")`` of term ids per trigram).  It is built
+from the vocabulary on first use; add() is idempotent, so new terms are
+appended as notes are indexed.  Terms whose postings are gone stay listed
+and are filtered out by the caller.
+"""
+from __future__ import annotations
+
+import re
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover - older interpreters
+    import sre_parse as _sre_parse  # type: ignore[no-redef]
+
+from .tokenizer import _RUN_RE, TextPipeline, is_cjk
+
+_PAD_START = "\x02"
+_PAD_END = "\x03"
+MAX_SUBSTRING_TERMS = 500  # a piece matching more terms than this does not narrow enough
+MAX_FUZZY_EDITS = 2
+
+
+def _padded(term: str) -> str:
+    return _PAD_START * 2 + term + _PAD_END * 2
+
+
+def _grams(text: str) -> List[str]:
+    return list(dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2)))
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal-string-alignment distance, or ``limit + 1`` once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def fuzzy_budget(term: str, requested: Optional[int] = None) -> int:
+    """Edits allowed for ``term``: 1 up to 7 characters, 2 beyond (capped by length)."""
+    edits = requested if requested is not None else (1 if len(term) <= 7 else 2)
+    return max(0, min(edits, MAX_FUZZY_EDITS, (len(term) + 1) // 4))
+
+
+class TermTrigrams:
+    """Padded-trigram -> term ids over a growing term list (see module docstring)."""
+
+    def __init__(self) -> None:
+        self.terms: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._grams: Dict[str, array] = {}
+
+    @classmethod
+    def build(cls, terms: Iterable[str]) -> "TermTrigrams":
+        index = cls()
+        for term in terms:
+            index.add(term)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def add(self, term: str) -> None:
+        if term in self._ids or is_cjk(term):
+            return
+        term_id = self._ids[term] = len(self.terms)
+        self.terms.append(term)
+        for gram in _grams(_padded(term)):
+            ids = self._grams.get(gram)
+            if ids is None:
+                self._grams[gram] = array("i", [term_id])
+            else:
+                ids.append(term_id)
+
+    def containing(self, piece: str) -> Optional[List[str]]:
+        """Terms that contain ``piece`` (None if it is too short or too common to narrow)."""
+        grams = _grams(piece)
+        if not grams:
+            return None
+        lists = sorted((self._grams.get(g, array("i")) for g in grams), key=len)
+        ids = set(lists[0])
+        for other in lists[1:]:
+            ids.intersection_update(other)
+            if not ids:
+                break
+        terms = [self.terms[i] for i in ids if piece in self.terms[i]]
+        return terms if len(terms) <= MAX_SUBSTRING_TERMS else None
+
+    def similar(self, term: str, max_edits: int) -> List[Tuple[str, int]]:
+        """(term, distance) pairs within ``max_edits`` of ``term``, closest first."""
+        grams = _grams(_padded(term))
+        need = len(grams) - 4 * max_edits
+        if max_edits <= 0 or need <= 0:
+            return []
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for term_id in self._grams.get(gram, ()):
+                shared[term_id] = shared.get(term_id, 0) + 1
+        found = []
+        for term_id, count in shared.items():
+            if count < need:
+                continue
+            candidate = self.terms[term_id]
+            distance = edit_distance(term, candidate, max_edits)
+            if distance <= max_edits:
+                found.append((candidate, distance))
+        found.sort(key=lambda pair: (pair[1], pair[0]))
+        return found
+
+
+def required_literals(pattern: str) -> List[str]:
+    """Literal runs every match of ``pattern`` must contain (empty if none)."""
+    try:
+        parsed = _sre_parse.parse(pattern)
+    except (re.error, OverflowError, RecursionError):
+        return []
+    runs: List[str] = []
+    current: List[str] = []
+
+    def flush() -> None:
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    def walk(items) -> None:
+        for op, av in items:
+            if op is _sre_parse.LITERAL:
+                current.append(chr(av))
+            elif op is _sre_parse.AT:
+                continue  # anchors are zero-width
+            elif op is _sre_parse.SUBPATTERN:
+                walk(av[-1])
+            elif op in (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT):
+                low, _, sub = av
+                flush()
+                if low >= 1:
+                    walk(sub)
+                    flush()
+            else:
+                flush()
+
+    walk(parsed)
+    flush()
+    return runs
+
+
+def literal_constraints(literal: str, pipeline: TextPipeline) -> Tuple[List[str], List[str]]:
+    """Split one literal run into (whole terms, term substrings) it implies."""
+    stopwords = pipeline.stopwords
+    norm, _ = pipeline.normalize(literal)
+    exact: List[str] = []
+    partial: List[str] = []
+    for m in _RUN_RE.finditer(norm):
+        piece = m.group()
+        if is_cjk(piece):
+            exact.extend(pipeline.terms(piece))  # every indexed uni/bigram of the run
+        elif m.start() > 0 and m.end() < len(norm):
+            if piece not in stopwords:
+                exact.append(piece)
+        elif len(piece) >= 3 and not any(piece in word for word in stopwords):
+            partial.append(piece)
+    return exact, partial
+
+
+def wildcard_pattern(text: str) -> str:
+    """``plug*`` -> regex for a word starting with "plug"; ``*sync*`` -> substring."""
+    parts = [re.escape(p) for p in text.split("*")]
+    body = r"\w*".join(parts)
+    if not text.startswith("*"):
+        body = r"\b" + body
+    if not text.endswith("*"):
+        body += r"\b"
+    return body
+
+
+__all__ = [
+    "MAX_SUBSTRING_TERMS",
+    "TermTrigrams",
+    "edit_distance",
+    "fuzzy_budget",
+    "literal_constraints",
+    "required_literals",
+    "wildcard_pattern",
+]
@@ -0,0 +1,272 @@
+"""Background watcher that keeps a VaultIndex in sync with the vault.
+
+Backends:
+- inotify (Linux, via ctypes): one watch per directory; changed note paths
+  are batched and applied with VaultIndex.update_paths(), so a few edits
+  cost a few stat + tokenize calls instead of a rescan.
+- polling (everywhere else, or when inotify is unavailable):
+  VaultIndex.refresh() every ``poll_interval`` seconds, which only stats
+  files and re-reads the ones whose (mtime, size, inode) changed.
+
+Directory-level events (new/moved/deleted folders) and queue overflows fall
+back to one full refresh().  The index is saved at most once per
+``save_interval`` seconds after a change, so bursts of edits do not rewrite
+the index file each time.
+
+A failed update or save is recorded in ``last_error`` (see stats()) and the
+thread keeps watching: polling retries on the next interval, inotify
+retries the batch as a full refresh after ``poll_interval`` seconds.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .extractors import is_indexed
+from .index import RefreshReport, VaultIndex, get_vault_index
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _Inotify:
+    """Minimal ctypes wrapper around the Linux inotify API."""
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._add_watch.restype = ctypes.c_int
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.dirs: Dict[int, Path] = {}
+
+    def watch_tree(self, root: Path) -> None:
+        for dirpath, _dirnames, _filenames in os.walk(root):
+            wd = self._add_watch(self.fd, os.fsencode(dirpath), _WATCH_MASK)
+            if wd >= 0:
+                self.dirs[wd] = Path(dirpath)
+
+    def read_events(self, timeout: float) -> List[Tuple[Optional[Path], int]]:
+        """Return (path, mask) pairs; path is None for queue-level events."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events: List[Tuple[Optional[Path], int]] = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            directory = self.dirs.get(wd)
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            if directory is None:
+                events.append((None, mask))
+                continue
+            events.append((directory / os.fsdecode(name) if name else directory, mask))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class VaultWatcher:
+    """Keep the shared index of ``docs_path`` fresh from a daemon thread.
+
+    Parameters:
+        docs_path: Vault root.
+        index_dir: Index directory (see get_vault_index).
+        use_inotify: Force (True) / disable (False) inotify; None = auto.
+        poll_interval: Seconds between refresh() calls in polling mode.
+        debounce: Quiet period (seconds) before applying a batch of inotify events.
+        save_interval: Minimum seconds between index saves.
+    """
+
+    def __init__(
+        self,
+        docs_path: str,
+        index_dir: Optional[str] = None,
+        use_inotify: Optional[bool] = None,
+        poll_interval: float = 5.0,
+        debounce: float = 0.5,
+        save_interval: float = 30.0,
+    ) -> None:
+        self.docs_path = Path(docs_path)
+        self.index_dir = index_dir
+        self.use_inotify = use_inotify
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.save_interval = save_interval
+        self.backend: Optional[str] = None
+        self.last_report: Optional[RefreshReport] = None
+        self.last_error: Optional[str] = None
+        self.updates = 0
+        self._index: Optional[VaultIndex] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_save = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vault-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._index is not None and self._index.dirty:
+            self._index.save()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def stats(self) -> Dict[str, object]:
+        report = self.last_report
+        return {
+            "running": self.running,
+            "backend": self.backend,
+            "updates": self.updates,
+            "last_update_ms": round(report.elapsed_ms, 3) if report else None,
+            "last_error": self.last_error,
+        }
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def _run(self) -> None:
+        try:
+            self._index = get_vault_index(str(self.docs_path), self.index_dir)
+        except Exception as e:  # keep the server alive; search falls back to lazy open
+            self.last_error = f"open_failed: {e}"
+            return
+        inotify = self._open_inotify()
+        try:
+            if inotify is not None:
+                self.backend = "inotify"
+                ok = self._update(self._index.refresh)  # catch edits made before the watch existed
+                self._inotify_loop(inotify, full_refresh=not ok)
+            else:
+                self.backend = "polling"
+                self._poll_loop()
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def _open_inotify(self) -> Optional[_Inotify]:
+        if self.use_inotify is False or not hasattr(select, "select") or os.name != "posix":
+            return None
+        try:
+            inotify = _Inotify()
+            inotify.watch_tree(self.docs_path)
+            return inotify
+        except (OSError, AttributeError) as e:
+            self.last_error = f"inotify_unavailable: {e}"
+            return None
+
+    def _poll_loop(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self._update(self._index.refresh)
+
+    def _inotify_loop(self, inotify: _Inotify, full_refresh: bool = False) -> None:
+        pending: Set[str] = set()
+        first_pending = time.monotonic() if full_refresh else 0.0
+        retry_at = first_pending + self.poll_interval if full_refresh else 0.0  # retry of a failed batch
+        while not self._stop.is_set():
+            try:
+                events = inotify.read_events(self.debounce)
+            except OSError as e:
+                self.last_error = f"watch_failed: {e}"
+                full_refresh, first_pending = True, first_pending or time.monotonic()
+                self._stop.wait(self.poll_interval)
+                continue
+            for path, mask in events:
+                if path is None or mask & (IN_ISDIR | IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF):
+                    full_refresh = True
+                    if path is not None and mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                        inotify.watch_tree(path)
+                elif is_indexed(path):
+                    pending.add(str(path))
+            if (pending or full_refresh) and not first_pending:
+                first_pending = time.monotonic()
+            quiet = not events
+            overdue = first_pending and time.monotonic() - first_pending > 4 * self.debounce
+            if first_pending and (quiet or overdue) and time.monotonic() >= retry_at:
+                paths = list(pending)
+                ok = self._update(self._index.refresh if full_refresh else lambda: self._index.update_paths(paths))
+                pending.clear()
+                full_refresh = not ok
+                first_pending = 0.0 if ok else time.monotonic()
+                retry_at = 0.0 if ok else time.monotonic() + self.poll_interval
+            self._maybe_save()
+
+    def _update(self, action: Callable[[], RefreshReport]) -> bool:
+        """Run one index update; record (not raise) a failure so the thread keeps watching."""
+        try:
+            self._apply(action())
+            return True
+        except Exception as e:
+            self.last_error = f"update_failed: {e}"
+            return False
+
+    def _apply(self, report: RefreshReport) -> None:
+        if report.changed:
+            self.updates += 1
+            self.last_report = report
+        self._maybe_save()
+
+    def _maybe_save(self) -> None:
+        index = self._index
+        if index is None or not index.dirty:
+            return
+        if time.monotonic() - self._last_save < self.save_interval:
+            return
+        try:
+            index.save()
+        except Exception as e:
+            self.last_error = f"save_failed: {e}"
+        self._last_save = time.monotonic()
+
+
+__all__ = ["VaultWatcher"]